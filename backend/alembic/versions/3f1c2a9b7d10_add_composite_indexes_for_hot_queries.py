@@ -0,0 +1,33 @@
+"""Add composite indexes for hot query shapes
+
+Revision ID: 3f1c2a9b7d10
+Revises: 
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a9b7d10'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_category_list_id_parent_category_id_order",
+        "category",
+        ["list_id", "parent_category_id", "order"],
+    )
+    op.create_index("ix_category_parent_category_id", "category", ["parent_category_id"])
+    op.create_index("ix_project_list_id_category_id", "project", ["list_id", "category_id"])
+    op.create_index("ix_project_category_id", "project", ["category_id"])
+
+
+def downgrade():
+    op.drop_index("ix_project_category_id", table_name="project")
+    op.drop_index("ix_project_list_id_category_id", table_name="project")
+    op.drop_index("ix_category_parent_category_id", table_name="category")
+    op.drop_index("ix_category_list_id_parent_category_id_order", table_name="category")
@@ -0,0 +1,35 @@
+"""Add URL metadata cache table
+
+Revision ID: 8b2e4d6f1a37
+Revises: 3f1c2a9b7d10
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b2e4d6f1a37'
+down_revision = '3f1c2a9b7d10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "urlmetadata",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("url", sa.String(), nullable=False),
+        sa.Column("site_metadata", sa.JSON(), nullable=False),
+        sa.Column("fetched_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_urlmetadata_id", "urlmetadata", ["id"])
+    op.create_index("ix_urlmetadata_url", "urlmetadata", ["url"], unique=True)
+
+
+def downgrade():
+    op.drop_index("ix_urlmetadata_url", table_name="urlmetadata")
+    op.drop_index("ix_urlmetadata_id", table_name="urlmetadata")
+    op.drop_table("urlmetadata")
@@ -0,0 +1,38 @@
+"""Add failure backoff to the URL metadata cache
+
+Revision ID: c5d7e9a1b3f2
+Revises: 8b2e4d6f1a37
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5d7e9a1b3f2'
+down_revision = '8b2e4d6f1a37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Batch mode so SQLite can relax the NOT NULL constraints
+    with op.batch_alter_table("urlmetadata") as batch_op:
+        batch_op.alter_column("site_metadata", existing_type=sa.JSON(), nullable=True)
+        batch_op.alter_column("fetched_at", existing_type=sa.DateTime(timezone=True), nullable=True)
+        batch_op.add_column(sa.Column("error_metadata", sa.JSON(), nullable=True))
+        batch_op.add_column(sa.Column("error_class", sa.String(), nullable=True))
+        batch_op.add_column(sa.Column("failure_count", sa.Integer(), nullable=False, server_default="0"))
+        batch_op.add_column(sa.Column("retry_at", sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade():
+    op.execute("DELETE FROM urlmetadata WHERE site_metadata IS NULL")
+    with op.batch_alter_table("urlmetadata") as batch_op:
+        batch_op.drop_column("retry_at")
+        batch_op.drop_column("failure_count")
+        batch_op.drop_column("error_class")
+        batch_op.drop_column("error_metadata")
+        batch_op.alter_column("fetched_at", existing_type=sa.DateTime(timezone=True), nullable=False)
+        batch_op.alter_column("site_metadata", existing_type=sa.JSON(), nullable=False)
@@ -0,0 +1,47 @@
+"""Add background job queue table
+
+Revision ID: d8f2a4c6e1b9
+Revises: c5d7e9a1b3f2
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8f2a4c6e1b9'
+down_revision = 'c5d7e9a1b3f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "backgroundjob",
+        sa.Column("id", sa.String(length=32), nullable=False),
+        sa.Column("kind", sa.String(), nullable=False),
+        sa.Column("payload", sa.JSON(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False, server_default="pending"),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("max_attempts", sa.Integer(), nullable=False),
+        sa.Column("run_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("lease_owner", sa.String(), nullable=True),
+        sa.Column("lease_expires_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("progress", sa.JSON(), nullable=True),
+        sa.Column("progress_seq", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("result", sa.JSON(), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_backgroundjob_status_run_at", "backgroundjob", ["status", "run_at"])
+    op.create_index("ix_backgroundjob_status_lease_expires_at", "backgroundjob", ["status", "lease_expires_at"])
+
+
+def downgrade():
+    op.drop_index("ix_backgroundjob_status_lease_expires_at", table_name="backgroundjob")
+    op.drop_index("ix_backgroundjob_status_run_at", table_name="backgroundjob")
+    op.drop_table("backgroundjob")
@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from app.api.endpoints import awesome_lists, categories, projects, health, github, metadata
+from app.api.endpoints import awesome_lists, categories, projects, health, github, metadata, jobs
 
 api_router = APIRouter()
 api_router.include_router(health.router, tags=["health"])
@@ -9,3 +9,4 @@ api_router.include_router(categories.router, prefix="/categories", tags=["catego
 api_router.include_router(projects.router, prefix="/projects", tags=["projects"])
 api_router.include_router(github.router, prefix="/github", tags=["github"])
 api_router.include_router(metadata.router, prefix="/metadata", tags=["metadata"])
+api_router.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
@@ -1,5 +1,6 @@
 from typing import List, Any, Dict
-from fastapi import APIRouter, Depends, HTTPException, status, Body
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Response, status, Body
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 
 from app.db.session import get_db
@@ -17,9 +18,13 @@ from app.services.awesome_list_service import (
     create_awesome_list,
     update_awesome_list,
     delete_awesome_list,
+    delete_awesome_list_in_chunks,
     import_awesome_list,
     export_awesome_list,
 )
+from app.services.job_handlers import IMPORT_JOB
+from app.services.job_progress import job_reference
+from app.services.job_queue import enqueue_job
 
 router = APIRouter()
 
@@ -75,9 +80,15 @@ def update_existing_awesome_list(
 
 
 @router.delete("/{list_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_existing_awesome_list(list_id: int, db: Session = Depends(get_db)) -> None:
+def delete_existing_awesome_list(
+    list_id: int,
+    background_tasks: BackgroundTasks,
+    background: bool = False,
+    db: Session = Depends(get_db),
+) -> Response:
     """
     Delete an awesome list.
+    With background=true, very large lists are deleted in chunks after the response (202).
     """
     awesome_list = get_awesome_list(db=db, list_id=list_id)
     if not awesome_list:
@@ -85,16 +96,30 @@ def delete_existing_awesome_list(list_id: int, db: Session = Depends(get_db)) ->
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Awesome list with ID {list_id} not found",
         )
+
+    if background:
+        background_tasks.add_task(delete_awesome_list_in_chunks, list_id)
+        return Response(status_code=status.HTTP_202_ACCEPTED)
+
     delete_awesome_list(db=db, list_id=list_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
 @router.post("/import", response_model=AwesomeListSchema)
 def import_from_github(
-    import_data: AwesomeListImport, db: Session = Depends(get_db)
+    import_data: AwesomeListImport,
+    background: bool = False,
+    db: Session = Depends(get_db),
 ) -> Any:
     """
     Import an awesome list from GitHub.
+    With background=true, the import is queued for a worker and the response
+    (202) names the job to follow at /jobs/{job_id}/events.
     """
+    if background:
+        job = enqueue_job(db, IMPORT_JOB, {"repository_url": str(import_data.repository_url)})
+        return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=job_reference(job))
+
     try:
         print(f"Import request received for: {import_data.repository_url}")
         return import_awesome_list(db=db, repository_url=import_data.repository_url)
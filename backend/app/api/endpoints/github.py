@@ -1,9 +1,13 @@
 from typing import Any, Dict
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 
 from app.db.session import get_db
+from app.services.job_handlers import CHECK_LINKS_JOB
+from app.services.job_progress import job_reference
+from app.services.job_queue import enqueue_job
 from app.services.github_service import (
     validate_repository,
     check_links,
@@ -32,11 +36,17 @@ def validate_github_repository(
 
 @router.get("/check-links/{owner}/{repo}", response_model=Dict[str, Any])
 def check_repository_links(
-    owner: str, repo: str, db: Session = Depends(get_db)
+    owner: str, repo: str, background: bool = False, db: Session = Depends(get_db)
 ) -> Any:
     """
     Check all links in a repository's README using awesome_bot.
+    With background=true, the check is queued for a worker and the response
+    (202) names the job to follow at /jobs/{job_id}/events.
     """
+    if background:
+        job = enqueue_job(db, CHECK_LINKS_JOB, {"owner": owner, "repo": repo}, total=1)
+        return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=job_reference(job))
+
     try:
         result = check_links(owner=owner, repo=repo)
         return {"success": True, "results": result}
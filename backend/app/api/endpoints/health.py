@@ -1,8 +1,15 @@
 from fastapi import APIRouter
 
+from app.db.session import get_database_status
+from app.utils.host_scheduler import host_scheduler
+
 router = APIRouter()
 
 @router.get("/health", status_code=200)
 def health_check():
     """Health check endpoint for monitoring and Docker healthcheck."""
-    return {"status": "ok"}
+    try:
+        database = get_database_status()
+    except Exception as e:
+        database = {"error": str(e)}
+    return {"status": "ok", "database": database, "outbound_hosts": host_scheduler.stats()}
@@ -0,0 +1,66 @@
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+
+from app.services.job_progress import PENDING, get_job
+from app.services.job_queue import follow_job_events, get_job_row, job_row_snapshot
+
+router = APIRouter()
+
+SSE_MEDIA_TYPE = "text/event-stream"
+
+
+@router.get("/{job_id}")
+async def read_job(job_id: str) -> Dict[str, Any]:
+    """
+    Progress of a background job, with its result once finished.
+    """
+    # A job running in this process has fresher progress than its row
+    job = get_job(job_id)
+    if job is not None and job.status != PENDING:
+        return job.snapshot()
+    row = await get_job_row(job_id)
+    if row is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Job {job_id} not found",
+        )
+    return job_row_snapshot(row)
+
+
+@router.get("/{job_id}/events")
+async def stream_job_events(
+    job_id: str,
+    last_event_id: Optional[int] = Query(None, description="Resume after this event ID"),
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID"),
+) -> StreamingResponse:
+    """
+    Server-Sent Events with a background job's progress.
+
+    Events are named after the stage items reached (fetched, parsed, categorized,
+    inserted, failed, not_attempted) or "status" when the job starts or finishes; each carries
+    the job's counts and ETA. The stream ends once the job has finished.
+    Disconnecting does not stop the job: reconnect with the Last-Event-ID header
+    (sent by EventSource automatically) or ?last_event_id= to resume.
+
+    Jobs run by another process (a separate worker) are followed through their
+    row instead: "progress" events with the same fields arrive whenever the
+    worker saves progress, and reconnecting starts with the current state.
+    """
+    if get_job(job_id) is None and await get_job_row(job_id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Job {job_id} not found",
+        )
+
+    resume_after = last_event_id
+    if resume_after is None and last_event_id_header and last_event_id_header.isdigit():
+        resume_after = int(last_event_id_header)
+
+    return StreamingResponse(
+        follow_job_events(job_id, resume_after or 0),
+        media_type=SSE_MEDIA_TYPE,
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,33 +1,46 @@
-from fastapi import APIRouter, HTTPException, status, Query, Body, Depends
-from pydantic import HttpUrl, BaseModel
+from fastapi import APIRouter, HTTPException, status, Query, Body, Depends, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import HttpUrl, BaseModel, Field
 from typing import Dict, Any, Optional, List
-import asyncio
 import httpx
-from sqlalchemy.orm import Session
-
-from app.utils.site_metadata import fetch_site_metadata, suggest_category
-from app.db.session import get_db
-from app.services.ai_categorization_service import AICategorization
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.utils.site_metadata import get_category_suggester_async, suggest_category_async
+from app.db.session import get_async_db
+from app.services.ai_categorization_service import AICategorization, ai_routing_stats
+from app.services.job_handlers import AI_BATCH_CATEGORIZE_JOB, BATCH_CHARACTERIZE_JOB
+from app.services.job_progress import job_reference
+from app.services.job_queue import enqueue_job_async
+from app.services.metadata_cache import get_cached_site_metadata, metadata_cache_stats
+from app.services.url_characterization import UrlAnalysisResult, characterize_urls
+from app.utils.category_index import category_index_cache
+from app.utils.project_classifier import project_classifier_cache
+from app.utils.singleflight import singleflight_stats
 
 router = APIRouter()
 
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
 
 @router.get("/site/")
 async def get_site_metadata(
     url: HttpUrl = Query(..., description="URL to fetch metadata from"),
+    refresh: bool = Query(False, description="Fetch now, bypassing the cache and failure backoff"),
 ) -> Dict[str, Any]:
     """
     Fetch metadata from a website including title, description, and keywords.
     This endpoint can be used when adding new links to prefill form fields.
     """
     try:
-        metadata = await fetch_site_metadata(str(url))
+        metadata = await get_cached_site_metadata(str(url), force_refresh=refresh)
         if metadata.get("error"):
             raise HTTPException(
                 status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
                 detail=f"Failed to fetch metadata: {metadata['error']}"
             )
         return metadata
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -35,12 +48,29 @@ async def get_site_metadata(
         )
 
 
+@router.get("/stats")
+async def get_metadata_stats() -> Dict[str, Any]:
+    """
+    Counters of the metadata cache, the category suggesters, AI tier routing
+    and request coalescing.
+    """
+    return {
+        "metadata_cache": metadata_cache_stats(),
+        "category_index": dict(category_index_cache.stats),
+        "classifier": dict(project_classifier_cache.stats),
+        "ai_routing": ai_routing_stats(),
+        # Calls that waited for an identical call already in flight
+        "coalescing": singleflight_stats(),
+    }
+
+
 @router.get("/category-suggestion/")
 async def suggest_category_for_url(
     list_id: int,
     url: HttpUrl = Query(..., description="URL to analyze for category suggestion"),
     description: Optional[str] = None,
-    db: Session = Depends(get_db),
+    refresh: bool = Query(False, description="Fetch now, bypassing the cache and failure backoff"),
+    db: AsyncSession = Depends(get_async_db),
 ) -> Dict[str, Any]:
     """
     Suggests a category for a URL based on its content and optional description.
@@ -49,11 +79,11 @@ async def suggest_category_for_url(
     try:
         # First fetch site metadata if description is not provided
         if not description:
-            metadata = await fetch_site_metadata(str(url))
+            metadata = await get_cached_site_metadata(str(url), force_refresh=refresh)
             description = metadata.get("description")
 
         # Suggest a category
-        category_id, confidence = suggest_category(
+        category_id, confidence = await suggest_category_async(
             db=db,
             list_id=list_id,
             url=str(url),
@@ -75,83 +105,64 @@ async def suggest_category_for_url(
 class BatchUrlRequest(BaseModel):
     list_id: int
     urls: List[str]
-
-
-class UrlAnalysisResult(BaseModel):
-    url: str
-    title: Optional[str] = None
-    description: Optional[str] = None
-    category_id: Optional[int] = None
-    confidence: Optional[float] = None
-    error: Optional[str] = None
+    # Fetch every URL now, bypassing the cache and failure backoff
+    refresh: bool = False
+    # Seconds to spend on the batch; URLs left over come back as "not_attempted"
+    budget_seconds: Optional[float] = Field(None, gt=0)
 
 
 @router.post("/batch-characterize/", response_model=List[UrlAnalysisResult])
 async def batch_characterize_urls(
+    http_request: Request,
     request: BatchUrlRequest = Body(...),
-    db: Session = Depends(get_db),
+    stream: bool = Query(False, description="Stream results as NDJSON as each URL finishes"),
+    background: bool = Query(False, description="Run as a background job and return its ID (202)"),
+    db: AsyncSession = Depends(get_async_db),
 ) -> List[UrlAnalysisResult]:
     """
     Process multiple URLs simultaneously, fetching metadata and suggesting categories.
     This endpoint is useful for batch characterization of multiple links at once.
+
+    With `stream=true` or `Accept: application/x-ndjson`, each result is written
+    as one JSON line as soon as it is ready, in completion order.
+
+    With `background=true`, the batch is queued for a worker and the response
+    (202) names the job to follow at /jobs/{job_id}/events.
+
+    With `budget_seconds`, each fetch gets the time left as its timeout. URLs
+    unfinished when the budget runs out are returned with status
+    "not_attempted", to send again in a follow-up request. A background job's
+    budget starts when a worker picks it up.
     """
-    results = []
-
-    # Use an async function
-    async def process_url(url: str) -> UrlAnalysisResult:
-        try:
-            # Validate URL format
-            try:
-                # Basic URL validation
-                if not url.startswith(('http://', 'https://')):
-                    return UrlAnalysisResult(
-                        url=url,
-                        error="Invalid URL format. URL must start with http:// or https://"
-                    )
-
-                # Fetch metadata
-                metadata = await fetch_site_metadata(url)
-
-                if metadata.get("error"):
-                    return UrlAnalysisResult(
-                        url=url,
-                        error=f"Failed to fetch metadata: {metadata['error']}"
-                    )
-
-                # Get category suggestion
-                category_id, confidence = suggest_category(
-                    db=db,
-                    list_id=request.list_id,
-                    url=url,
-                    description=metadata.get("description")
-                )
-
-                return UrlAnalysisResult(
-                    url=url,
-                    title=metadata.get("title"),
-                    description=metadata.get("description"),
-                    category_id=category_id,
-                    confidence=confidence
-                )
-
-            except Exception as e:
-                return UrlAnalysisResult(
-                    url=url,
-                    error=f"Failed to process URL: {str(e)}"
-                )
-        except Exception as e:
-            return UrlAnalysisResult(
-                url=url,
-                error=f"Unexpected error: {str(e)}"
-            )
+    if background:
+        job = await enqueue_job_async(BATCH_CHARACTERIZE_JOB, request.model_dump(), total=len(request.urls))
+        return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=job_reference(job))
+
+    results = [None] * len(request.urls)
+
+    # Load the list's suggester once; the concurrent tasks below must not share the session
+    suggester = await get_category_suggester_async(db, request.list_id)
 
-    # Process URLs in batches (but not all at once to avoid overwhelming the system)
-    batch_size = 5  # Process 5 URLs at a time
-    for i in range(0, len(request.urls), batch_size):
-        batch = request.urls[i:i+batch_size]
-        # Process URLs concurrently
-        batch_results = await asyncio.gather(*[process_url(url) for url in batch])
-        results.extend(batch_results)
+    if stream or NDJSON_MEDIA_TYPE in http_request.headers.get("accept", ""):
+        async def ndjson_lines():
+            async for _, result in characterize_urls(
+                request.urls, request.refresh, budget_seconds=request.budget_seconds
+            ):
+                if result.error is None:
+                    result.category_id, result.confidence = suggester.score(result.url, result.description)
+                yield result.model_dump_json() + "\n"
+
+        return StreamingResponse(ndjson_lines(), media_type=NDJSON_MEDIA_TYPE)
+
+    async for index, result in characterize_urls(request.urls, request.refresh, budget_seconds=request.budget_seconds):
+        results[index] = result
+
+    # Score every fetched URL against every category at once
+    fetched = [result for result in results if result.error is None]
+    suggestions = suggester.score_batch([(result.url, result.description) for result in fetched])
+    for result, (category_id, confidence) in zip(fetched, suggestions):
+        result.category_id = category_id
+        result.confidence = confidence
 
     return results
 
@@ -160,17 +171,21 @@ class AIBatchUrlRequest(BaseModel):
     """Request for batch AI categorization of URLs."""
     urls: List[str]
     use_ollama: bool = False
+    refresh: bool = False
+    # Seconds to spend on the batch; URLs left over come back as "not_attempted"
+    budget_seconds: Optional[float] = Field(None, gt=0)
 
 class SingleUrlAIRequest(BaseModel):
     """Request for AI categorization of a single URL."""
     url: str
     use_ollama: bool = False
+    refresh: bool = False
 
 @router.post("/ai-categorize", response_model=Dict[str, Any])
 async def ai_categorize_url(
     list_id: int,
     request: SingleUrlAIRequest = Body(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> Dict[str, Any]:
     """
     AI-powered categorization for a single URL.
@@ -188,7 +203,8 @@ async def ai_categorize_url(
         result = await categorization_service.process_url(
             request.url,
             list_id,
-            request.use_ollama
+            request.use_ollama,
+            refresh=request.refresh
         )
         return result
     except Exception as e:
@@ -198,7 +214,8 @@ async def ai_categorize_url(
 async def ai_batch_categorize_urls(
     list_id: int,
     request: AIBatchUrlRequest = Body(...),
-    db: Session = Depends(get_db)
+    background: bool = Query(False, description="Run as a background job and return its ID (202)"),
+    db: AsyncSession = Depends(get_async_db)
 ) -> List[Dict[str, Any]]:
     """
     AI-powered batch categorization for multiple URLs.
@@ -207,16 +224,28 @@ async def ai_batch_categorize_urls(
     Args:
         list_id: ID of the awesome list
         request: Request with URLs and AI backend preference
+        background: Queue the batch for a worker; the response (202) names
+            the job to follow at /jobs/{job_id}/events
 
     Returns:
-        List of dictionaries with metadata, suggested categories, and summaries
+        List of dictionaries with metadata, suggested categories, and summaries.
+        With `budget_seconds`, fetches and LLM calls get the time left as their
+        timeout, and URLs unfinished when it runs out have status "not_attempted".
     """
     try:
+        if background:
+            job = await enqueue_job_async(
+                AI_BATCH_CATEGORIZE_JOB, {"list_id": list_id, **request.model_dump()}, total=len(request.urls)
+            )
+            return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=job_reference(job))
+
         categorization_service = AICategorization(db)
         results = await categorization_service.process_batch_urls(
             request.urls,
             list_id,
-            request.use_ollama
+            request.use_ollama,
+            refresh=request.refresh,
+            budget_seconds=request.budget_seconds
         )
         return results
     except Exception as e:
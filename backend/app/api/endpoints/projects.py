@@ -1,5 +1,7 @@
 from typing import List, Any, Dict
+from anyio import from_thread
 from fastapi import APIRouter, Depends, HTTPException, status, Body
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 
 from app.db.session import get_db
@@ -8,6 +10,7 @@ from app.schemas.project import (
     Project as ProjectSchema,
     ProjectCreate,
     ProjectUpdate,
+    ProjectSummary,
 )
 from app.services.project_service import (
     get_projects,
@@ -16,25 +19,41 @@ from app.services.project_service import (
     update_project,
     delete_project,
 )
-from app.utils.site_metadata import fetch_site_metadata, suggest_category
+from app.services.metadata_cache import get_cached_site_metadata
+from app.utils.site_metadata import suggest_category
 
 router = APIRouter()
 
 
-@router.get("/", response_model=List[ProjectSchema])
+@router.get("/", response_model=List[ProjectSummary])
 def read_projects(
     list_id: int = None,
     category_id: int = None,
     skip: int = 0,
     limit: int = 100,
+    include_metadata: bool = False,
     db: Session = Depends(get_db),
 ) -> Any:
     """
     Retrieve projects with optional filtering by list_id and category_id.
+    The project_metadata payload is only loaded, and returned, when include_metadata
+    is set; the response then holds full projects instead of ProjectSummary rows.
     """
-    return get_projects(
-        db=db, list_id=list_id, category_id=category_id, skip=skip, limit=limit
+    projects = get_projects(
+        db=db,
+        list_id=list_id,
+        category_id=category_id,
+        skip=skip,
+        limit=limit,
+        include_metadata=include_metadata,
     )
+    if include_metadata:
+        # Full projects are serialized here; the summary response model would drop the metadata
+        return JSONResponse([ProjectSchema.model_validate(project).model_dump(mode="json") for project in projects])
+
+    # Serialize without touching the deferred column, which would otherwise
+    # trigger a lazy load per row.
+    return [ProjectSummary.model_validate(project) for project in projects]
 
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
@@ -57,7 +76,8 @@ def create_new_project(
         # If no description is provided or description is empty, try to fetch from site
         if not project_in.get("description") and project_in.get("url"):
             try:
-                metadata = fetch_site_metadata(project_in["url"])
+                # Sync handlers run in a worker thread; run the lookup on the event loop
+                metadata = from_thread.run(get_cached_site_metadata, project_in["url"])
                 if metadata.get("description"):
                     project_in["description"] = metadata["description"]
                 
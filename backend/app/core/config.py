@@ -1,6 +1,6 @@
 import os
 import json
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from pydantic import AnyHttpUrl, validator
 from pydantic_settings import BaseSettings
@@ -30,13 +30,133 @@ class Settings(BaseSettings):
 
     # Database
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./app.db")
+    # Optional read replica; sessions read from it until their first write, which moves them to DATABASE_URL
+    DATABASE_READ_REPLICA_URL: Optional[str] = os.getenv("DATABASE_READ_REPLICA_URL", "")
+
+    # Storage layout: "single" database, or "sharded" with one SQLite file per
+    # awesome list under SHARD_DIR (DATABASE_URL then holds the list catalog)
+    STORAGE_MODE: str = "single"
+    SHARD_DIR: str = "./shards"
+
+    # SQLite tuning, applied to every connection when DATABASE_URL is SQLite
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_MMAP_SIZE: int = 268435456  # 256 MiB
+    SQLITE_CACHE_SIZE: int = -65536  # negative values are KiB, i.e. 64 MiB
+    SQLITE_TEMP_STORE: str = "MEMORY"
+    SQLITE_ANALYSIS_LIMIT: int = 1000
+    SQLITE_MAINTENANCE_INTERVAL_SECONDS: int = 3600
+
+    # SQLite connection layout: one writer connection plus a read-only pool
+    SQLITE_READ_POOL_SIZE: int = 5
+    SQLITE_WRITER_TIMEOUT_SECONDS: int = 30
+
+    # Connection pool and timeouts for server databases (PostgreSQL).
+    # Each worker process opens up to DB_POOL_SIZE + DB_MAX_OVERFLOW connections
+    # per engine (sync and async), so size these against max_connections.
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: int = 30
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT_MS: int = 30000
+    # Rows fetched per round trip when streaming large reads via server-side cursors
+    DB_STREAM_BATCH_SIZE: int = 1000
+
+    # Rows removed per transaction by background (chunked) list deletion
+    DELETE_CHUNK_SIZE: int = 1000
+    # Category suggestion indexes are rebuilt on local changes; the TTL covers
+    # changes committed by other processes
+    CATEGORY_INDEX_TTL_SECONDS: int = 300
+    # URLs fetched at once by /metadata/batch-characterize/
+    BATCH_CHARACTERIZE_CONCURRENCY: int = 10
+    # Naive Bayes categorizer per list: used once a list has CLASSIFIER_MIN_PROJECTS
+    # projects, updated in place as projects change and retrained after the TTL
+    CLASSIFIER_MIN_PROJECTS: int = 20
+    CLASSIFIER_ALPHA: float = 0.5
+    CLASSIFIER_CALIBRATION_SAMPLES: int = 100
+    CLASSIFIER_TTL_SECONDS: int = 3600
+    # Background jobs (?background=true): progress events kept per job for
+    # clients reattaching with Last-Event-ID, and how long finished jobs are kept
+    JOB_EVENT_HISTORY: int = 1000
+    JOB_RETENTION_SECONDS: int = 3600
+    JOB_KEEPALIVE_SECONDS: float = 15.0
+    # Durable job queue: workers lease jobs for JOB_LEASE_SECONDS (renewed while
+    # they run) and retry failures with exponential backoff. The API process runs
+    # a worker too unless JOB_WORKER_IN_PROCESS is off (then run `python worker.py`)
+    JOB_WORKER_IN_PROCESS: bool = True
+    JOB_WORKER_CONCURRENCY: int = 2
+    JOB_POLL_INTERVAL_SECONDS: float = 1.0
+    JOB_LEASE_SECONDS: int = 60
+    # How often a running job's progress is saved for streams in other processes
+    JOB_PROGRESS_SAVE_SECONDS: float = 2.0
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_BASE_SECONDS: float = 30.0
+    JOB_RETRY_MAX_SECONDS: float = 900.0
+
+    # Write queue: small writes submitted together share one commit
+    WRITE_QUEUE_MAX_BATCH_SIZE: int = 64
+    WRITE_QUEUE_MAX_WAIT_MS: int = 5
+
+    # Shared outbound HTTP clients (keep-alive pools, HTTP/2 when h2 is installed)
+    HTTP2_ENABLED: bool = True
+    HTTP_TIMEOUT_SECONDS: float = 10.0
+    HTTP_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    # Per-host scheduling: token bucket rate/burst, and an AIMD concurrency
+    # limit that starts at HTTP_HOST_INITIAL_CONCURRENCY and never exceeds
+    # HTTP_MAX_CONNECTIONS_PER_HOST
+    HTTP_MAX_CONNECTIONS_PER_HOST: int = 10
+    HTTP_HOST_INITIAL_CONCURRENCY: int = 4
+    HTTP_HOST_RATE_PER_SECOND: float = 5.0
+    HTTP_HOST_BURST: int = 10
+    # JSON object of host -> requests per second, e.g. {"github.com": 2}
+    HTTP_HOST_RATE_OVERRIDES: Dict[str, float] = {}
+    # Limit multipliers on 429/5xx/errors and on responses HTTP_HOST_SLOW_FACTOR x slower than usual
+    HTTP_HOST_DECREASE_FACTOR: float = 0.5
+    HTTP_HOST_SLOW_FACTOR: float = 3.0
+    HTTP_HOST_SLOW_DECREASE_FACTOR: float = 0.9
+    # Throttled requests are retried when Retry-After is at most this long
+    HTTP_MAX_RETRIES: int = 2
+    HTTP_MAX_RETRY_AFTER_SECONDS: float = 30.0
+    # LLM completions take far longer than page fetches
+    HTTP_LLM_TIMEOUT_SECONDS: float = 120.0
+
+    # Site metadata cache: entries are fresh for the TTL, then served stale
+    # (and refreshed in the background) for the stale window
+    METADATA_CACHE_TTL_SECONDS: int = 86400
+    METADATA_CACHE_STALE_SECONDS: int = 604800
+    METADATA_CACHE_LRU_SIZE: int = 4096
+    # Most of a page read when looking for metadata; the head is usually far smaller
+    METADATA_MAX_BYTES: int = 524288
+    # Failed fetches: the next attempt waits base * 2^(failures - 1), capped;
+    # 404/410 back off NEGATIVE_CACHE_PERSISTENT_FACTOR times longer
+    NEGATIVE_CACHE_BASE_SECONDS: float = 60.0
+    NEGATIVE_CACHE_MAX_SECONDS: float = 86400.0
+    NEGATIVE_CACHE_PERSISTENT_FACTOR: float = 10.0
 
     # GitHub
     GITHUB_ACCESS_TOKEN: str = os.getenv("GITHUB_ACCESS_TOKEN", "")
+    # Repository URLs are resolved through the GraphQL API when a token is set;
+    # lookups arriving within the wait window share one query of up to the batch size
+    GITHUB_GRAPHQL_ENABLED: bool = True
+    GITHUB_GRAPHQL_URL: str = "https://api.github.com/graphql"
+    GITHUB_GRAPHQL_BATCH_SIZE: int = 100
+    GITHUB_GRAPHQL_BATCH_WAIT_MS: int = 20
 
     # AI Categorization
     OPENAI_API_KEY: Optional[str] = os.getenv("OPENAI_API_KEY", "")
     OLLAMA_BASE_URL: Optional[str] = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+    # Categorization tiers, cheapest first; a tier answers when its confidence
+    # reaches its threshold, otherwise the URL escalates to the next one
+    AI_ROUTING_TIERS: List[str] = ["local", "ollama", "openai"]
+    AI_LOCAL_CONFIDENCE_THRESHOLD: float = 0.7
+    AI_OLLAMA_CONFIDENCE_THRESHOLD: float = 0.6
+    # URLs categorized at once by /metadata/ai-batch-categorize
+    AI_BATCH_CONCURRENCY: int = 10
     GITHUB_TOKEN: Optional[str] = os.getenv("GITHUB_TOKEN", "")
 
     class Config:
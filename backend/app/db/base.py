@@ -4,3 +4,5 @@ from app.db.base_class import Base  # noqa
 from app.models.awesome_list import AwesomeList  # noqa
 from app.models.category import Category  # noqa
 from app.models.project import Project  # noqa
+from app.models.url_metadata import UrlMetadata  # noqa
+from app.models.background_job import BackgroundJob  # noqa
@@ -0,0 +1,140 @@
+"""
+Backend-aware engine factory for the sync and async database engines.
+"""
+from typing import Any, Dict, Optional
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine, URL, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from app.core.config import settings
+from app.db.pool import InstrumentedAsyncAdaptedQueuePool, InstrumentedQueuePool
+from app.db.sqlite import configure_sqlite_engine
+
+# Async drivers used for the AsyncEngine, keyed by backend name
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def async_database_url(database_url: str) -> URL:
+    """
+    Map a sync database URL onto the matching async driver.
+    """
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for database backend '{backend}'")
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+def supports_read_pool(database_url: str) -> bool:
+    """
+    Check whether a separate read pool can share the database with the writer.
+
+    In-memory SQLite databases are private to each connection, so they cannot.
+    """
+    url = make_url(database_url)
+    if url.get_backend_name() != "sqlite":
+        return False
+    return url.database not in (None, "", ":memory:")
+
+
+def _pool_options(backend: str, read_only: bool, pool_size: Optional[int] = None) -> Dict[str, Any]:
+    if backend == "sqlite":
+        # One writer connection: concurrent writers queue on the pool instead
+        # of spinning on SQLite's file lock. Only the sync engine writes; the
+        # async engine is created read-only (see app.db.session)
+        if pool_size is None:
+            pool_size = settings.SQLITE_READ_POOL_SIZE if read_only else 1
+        return {
+            "pool_size": pool_size,
+            "max_overflow": 0,
+            "pool_timeout": settings.SQLITE_WRITER_TIMEOUT_SECONDS,
+        }
+
+    return {
+        "pool_size": pool_size or settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def create_db_engine(
+    database_url: str, read_only: bool = False, pool_size: Optional[int] = None
+) -> Engine:
+    """
+    Create a sync engine tuned for the database backend.
+
+    Args:
+        database_url: SQLAlchemy database URL
+        read_only: Configure the engine for read-only use
+        pool_size: Override the backend's default pool size
+
+    Returns:
+        Configured engine
+    """
+    backend = make_url(database_url).get_backend_name()
+    options = _pool_options(backend, read_only, pool_size)
+
+    if backend == "sqlite":
+        engine = create_engine(
+            database_url,
+            poolclass=InstrumentedQueuePool,
+            connect_args={"check_same_thread": False},
+            **options,
+        )
+        configure_sqlite_engine(engine, read_only=read_only)
+        return engine
+
+    connect_args = {}
+    if backend == "postgresql":
+        server_options = f"-c statement_timeout={int(settings.DB_STATEMENT_TIMEOUT_MS)}"
+        if read_only:
+            server_options += " -c default_transaction_read_only=on"
+        connect_args["options"] = server_options
+
+    return create_engine(
+        database_url,
+        poolclass=InstrumentedQueuePool,
+        connect_args=connect_args,
+        **options,
+    )
+
+
+def create_async_db_engine(
+    database_url: str, read_only: bool = False, pool_size: Optional[int] = None
+) -> AsyncEngine:
+    """
+    Create an async engine tuned for the database backend.
+
+    Args:
+        database_url: SQLAlchemy database URL (sync form; the async driver is chosen here)
+        read_only: Configure the engine for read-only use
+        pool_size: Override the backend's default pool size
+
+    Returns:
+        Configured async engine
+    """
+    backend = make_url(database_url).get_backend_name()
+    options = _pool_options(backend, read_only, pool_size)
+
+    connect_args = {}
+    if backend == "postgresql":
+        server_settings = {"statement_timeout": str(int(settings.DB_STATEMENT_TIMEOUT_MS))}
+        if read_only:
+            server_settings["default_transaction_read_only"] = "on"
+        connect_args["server_settings"] = server_settings
+
+    engine = create_async_engine(
+        async_database_url(database_url),
+        poolclass=InstrumentedAsyncAdaptedQueuePool,
+        connect_args=connect_args,
+        **options,
+    )
+    if backend == "sqlite":
+        configure_sqlite_engine(engine.sync_engine, read_only=read_only)
+    return engine
@@ -1,15 +1,28 @@
+import os
+
+from alembic import command
+from alembic.config import Config
 from sqlalchemy.orm import Session
 
 from app.db.base import Base
 from app.db.session import engine
 
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 
 def init_db() -> None:
     """
     Initialize the database by creating all tables.
+
+    A freshly created schema already matches the latest migration, so it is
+    stamped at head to keep later `alembic upgrade` runs from replaying it.
     """
     Base.metadata.create_all(bind=engine)
 
+    alembic_cfg = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    alembic_cfg.set_main_option("script_location", os.path.join(BACKEND_DIR, "alembic"))
+    command.stamp(alembic_cfg, "head")
+
 
 if __name__ == "__main__":
     init_db()
@@ -0,0 +1,76 @@
+"""
+Connection pools that record checkout wait time and saturation.
+"""
+import threading
+import time
+from typing import Any, Dict
+
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+class CheckoutTimingMixin:
+    """
+    Times every checkout from the pool, including waits for a free connection.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._metrics_lock = threading.Lock()
+        self._checkouts = 0
+        self._timeouts = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            with self._metrics_lock:
+                self._timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            with self._metrics_lock:
+                self._checkouts += 1
+                self._total_wait += waited
+                self._max_wait = max(self._max_wait, waited)
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Report pool usage and checkout wait statistics.
+
+        Returns:
+            Dictionary with pool size, checked out connections, saturation and wait
+            times; saturation is None when overflow is unlimited (max_overflow < 0)
+        """
+        capacity = self.size() + self._max_overflow if self._max_overflow >= 0 else 0
+        checked_out = self.checkedout()
+        with self._metrics_lock:
+            return {
+                "size": self.size(),
+                "max_overflow": self._max_overflow,
+                "checked_out": checked_out,
+                "saturation": round(checked_out / capacity, 3) if capacity else None,
+                "checkouts": self._checkouts,
+                "checkout_timeouts": self._timeouts,
+                "avg_checkout_wait_ms": round(self._total_wait / self._checkouts * 1000, 3) if self._checkouts else 0.0,
+                "max_checkout_wait_ms": round(self._max_wait * 1000, 3),
+            }
+
+
+class InstrumentedQueuePool(CheckoutTimingMixin, QueuePool):
+    """QueuePool with checkout metrics."""
+
+
+class InstrumentedAsyncAdaptedQueuePool(CheckoutTimingMixin, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool with checkout metrics."""
+
+
+def pool_metrics(pool: Any) -> Dict[str, Any]:
+    """
+    Report metrics for any pool, falling back to its status line when uninstrumented.
+    """
+    if isinstance(pool, CheckoutTimingMixin):
+        return pool.metrics()
+    return {"status": pool.status()}
@@ -0,0 +1,49 @@
+"""
+Session that routes reads and writes to different engines.
+"""
+from typing import Optional
+
+from sqlalchemy import Delete, Insert, Update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+
+class RoutingSession(Session):
+    """
+    Session that sends reads to a reader engine and writes to the writer engine.
+
+    The reader is either a read replica or, on SQLite, a read-only pool on the
+    same file. Once the session has written, every later statement stays on
+    the writer, so a request always reads its own writes even when the
+    replica lags.
+    """
+
+    def __init__(self, writer: Engine, reader: Optional[Engine] = None, **kwargs):
+        """
+        Initialize the session.
+
+        Args:
+            writer: Engine that receives all writes
+            reader: Engine for reads; reads use the writer when not set
+            **kwargs: Passed through to Session
+        """
+        super().__init__(**kwargs)
+        self.writer = writer
+        self.reader = reader
+        self.pinned_to_writer = False
+
+    def use_writer(self) -> None:
+        """
+        Send every following statement of this session to the writer.
+        """
+        self.pinned_to_writer = True
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self.reader is None or self.pinned_to_writer:
+            return self.writer
+
+        if self._flushing or isinstance(clause, (Insert, Update, Delete)):
+            self.pinned_to_writer = True
+            return self.writer
+
+        return self.reader
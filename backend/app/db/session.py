@@ -1,15 +1,174 @@
-from sqlalchemy import create_engine
+import asyncio
+from typing import Any, Dict, Optional
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
 
 from app.core.config import settings
+from app.db.engines import create_async_db_engine, create_db_engine, supports_read_pool
+from app.db.pool import pool_metrics
+from app.db.routing import RoutingSession
+from app.db.sharding import ListShardedSession, ShardRegistry, is_sharded
+from app.db.sqlite import is_sqlite_url, sqlite_pragma_state
+from app.db.write_queue import WriteJob, WriteQueue
+
+# SQLite has one writer connection, the sync engine's, shared by sessions and
+# the write queue. The async engine only reads there; async code writes with run_write.
+serialize_writes = is_sqlite_url(settings.DATABASE_URL)
+
+engine = create_db_engine(settings.DATABASE_URL)
+async_engine = create_async_db_engine(settings.DATABASE_URL, read_only=serialize_writes)
+
+# Reads go to the replica when one is configured, otherwise SQLite file
+# databases get a pool of read-only connections next to the writer
+read_engine: Optional[Engine] = None
+async_read_engine: Optional[AsyncEngine] = None
+if settings.DATABASE_READ_REPLICA_URL:
+    read_engine = create_db_engine(settings.DATABASE_READ_REPLICA_URL, read_only=True)
+    async_read_engine = create_async_db_engine(settings.DATABASE_READ_REPLICA_URL, read_only=True)
+elif supports_read_pool(settings.DATABASE_URL):
+    read_engine = create_db_engine(settings.DATABASE_URL, read_only=True)
+
+SessionLocal = sessionmaker(
+    class_=RoutingSession,
+    writer=engine,
+    reader=read_engine,
+    autocommit=False,
+    autoflush=False,
+)
+
+AsyncSessionLocal = async_sessionmaker(
+    class_=AsyncSession,
+    sync_session_class=RoutingSession,
+    writer=async_engine.sync_engine,
+    reader=async_read_engine.sync_engine if async_read_engine is not None else None,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+# In sharded mode the same factories route list content to per-list SQLite
+# files; the read pool and replica above only serve the catalog there
+shard_registry: Optional[ShardRegistry] = None
+if is_sharded():
+    if not is_sqlite_url(settings.DATABASE_URL):
+        raise ValueError("STORAGE_MODE=sharded requires a SQLite DATABASE_URL")
+    shard_registry = ShardRegistry(engine, async_engine, settings.SHARD_DIR)
 
-engine = create_engine(settings.DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    SessionLocal = sessionmaker(
+        class_=ListShardedSession,
+        registry=shard_registry,
+        autocommit=False,
+        autoflush=False,
+    )
+
+    AsyncSessionLocal = async_sessionmaker(
+        class_=AsyncSession,
+        sync_session_class=ListShardedSession,
+        registry=shard_registry,
+        use_async=True,
+        autoflush=False,
+        expire_on_commit=False,
+    )
+
+# Sessions used by the write queue; objects stay readable after the batch commits
+WriterSessionLocal = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+write_queue = WriteQueue(
+    WriterSessionLocal,
+    max_batch_size=settings.WRITE_QUEUE_MAX_BATCH_SIZE,
+    max_wait_ms=settings.WRITE_QUEUE_MAX_WAIT_MS,
+    begin_immediate=serialize_writes,
+)
 
 
 def get_db():
+    # Reads use the reader until the session's first write pins it to the writer
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """
+    Async counterpart of get_db for async handlers.
+
+    An AsyncSession must not be shared by concurrent tasks; handlers that fan
+    out should load what they need first and then run the tasks. On SQLite
+    the session can only read; write with run_write.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def get_write_queue(list_id: Optional[int] = None) -> WriteQueue:
+    """
+    Get the write queue for batched writes.
+
+    In sharded mode, writes of a list's categories and projects must pass
+    `list_id` to get the queue of that list's shard.
+    """
+    if shard_registry is not None and list_id is not None:
+        return shard_registry.write_queue_for(list_id)
+    return write_queue
+
+
+async def run_write(job: WriteJob, list_id: Optional[int] = None) -> Any:
+    """
+    Run a write from async code and wait until it is committed.
+
+    On SQLite the job goes through the write queue, so it shares the single
+    writer connection with every other write; elsewhere it runs on a session
+    pinned to the primary.
+
+    Args:
+        job: Called with a sync session; must not commit
+        list_id: List whose shard the job writes to, in sharded mode
+
+    Returns:
+        The job's return value
+    """
+    if serialize_writes:
+        return await asyncio.wrap_future(get_write_queue(list_id).submit(job))
+    async with AsyncSessionLocal() as db:
+        db.sync_session.use_writer()
+        result = await db.run_sync(job)
+        await db.commit()
+        return result
+
+
+def get_shard_registry() -> Optional[ShardRegistry]:
+    """
+    Get the shard registry, or None when storage is not sharded.
+    """
+    return shard_registry
+
+
+def get_database_status() -> Dict[str, Any]:
+    """
+    Describe the database backend, connection pool usage and, for SQLite, the effective pragmas.
+    """
+    pools = {
+        "writer": pool_metrics(engine.pool),
+    }
+    # On SQLite the async engine is read-only
+    pools["async_reader" if serialize_writes else "async_writer"] = pool_metrics(async_engine.sync_engine.pool)
+    if read_engine is not None:
+        pools["reader"] = pool_metrics(read_engine.pool)
+    if async_read_engine is not None:
+        pools["async_reader"] = pool_metrics(async_read_engine.sync_engine.pool)
+
+    status = {
+        "backend": engine.dialect.name,
+        "storage_mode": settings.STORAGE_MODE,
+        "read_replica": bool(settings.DATABASE_READ_REPLICA_URL),
+        "pools": pools,
+    }
+    if shard_registry is not None:
+        status["shards"] = len(shard_registry.list_shard_ids())
+    if serialize_writes:
+        # Prefer a reader so the health check never waits on the writer
+        status.update(sqlite_pragma_state(read_engine or engine))
+    return status
@@ -0,0 +1,348 @@
+"""
+Optional storage mode that keeps each awesome list in its own SQLite file.
+
+The catalog database (DATABASE_URL) holds the awesome list index plus every
+other table. Each list's categories and projects live in `<SHARD_DIR>/list_<id>.db`,
+next to a mirror of the list row that their foreign keys cascade from. Rows in
+a shard get IDs starting at `list_id << SHARD_ID_BITS`, so any category or
+project ID identifies its shard without a lookup.
+
+Switching an existing database to STORAGE_MODE=sharded does not move its lists:
+categories and projects already in the catalog are no longer found, so
+export and re-import those lists (or start from an empty catalog). Alembic
+migrations run against the catalog database only; shard files are created
+from the current models, and schema changes to categories or projects have to
+be applied to existing shard files separately.
+"""
+import logging
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import MetaData, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.ext.horizontal_shard import ShardedSession
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.sql import operators, visitors
+from sqlalchemy.sql.elements import BinaryExpression, BindParameter
+
+from app.core.config import settings
+from app.db.engines import create_async_db_engine, create_db_engine
+from app.db.write_queue import WriteQueue
+from app.models.awesome_list import AwesomeList
+from app.models.category import Category
+from app.models.project import Project
+
+logger = logging.getLogger(__name__)
+
+CATALOG_SHARD = "catalog"
+SHARD_ID_BITS = 32
+
+# Tables stored in list shards; everything else lives in the catalog
+SHARDED_TABLES = {Category.__tablename__, Project.__tablename__}
+
+# Columns whose values identify a shard: list IDs directly, row IDs via their high bits
+LIST_ID_COLUMNS = {("category", "list_id"), ("project", "list_id")}
+ROW_ID_COLUMNS = {
+    ("category", "id"),
+    ("category", "parent_category_id"),
+    ("project", "id"),
+    ("project", "category_id"),
+}
+
+
+def is_sharded() -> bool:
+    """
+    Check whether per-list storage is enabled.
+    """
+    return settings.STORAGE_MODE == "sharded"
+
+
+def shard_for_list(list_id: int) -> str:
+    """
+    Shard ID holding the categories and projects of a list.
+    """
+    return f"list_{int(list_id)}"
+
+
+def shard_for_row_id(row_id: int) -> str:
+    """
+    Shard ID holding a category or project, derived from its ID.
+    """
+    return shard_for_list(int(row_id) >> SHARD_ID_BITS)
+
+
+def _shard_metadata() -> MetaData:
+    # Shard tables use AUTOINCREMENT so their ID sequence can start at the list's range
+    metadata = MetaData()
+    for table in (AwesomeList.__table__, Category.__table__, Project.__table__):
+        shard_table = table.to_metadata(metadata)
+        if table.name in SHARDED_TABLES:
+            shard_table.dialect_kwargs["sqlite_autoincrement"] = True
+    return metadata
+
+
+class ShardRegistry:
+    """
+    Creates, caches and drops the per-list shard databases.
+    """
+
+    def __init__(self, catalog_engine: Engine, catalog_async_engine: AsyncEngine, shard_dir: str):
+        """
+        Initialize the registry.
+
+        Args:
+            catalog_engine: Engine of the catalog database
+            catalog_async_engine: Async engine of the catalog database
+            shard_dir: Directory holding the shard files
+        """
+        self.catalog_engine = catalog_engine
+        self.catalog_async_engine = catalog_async_engine
+        self.shard_dir = shard_dir
+        self.shard_metadata = _shard_metadata()
+        self._engines: Dict[str, Engine] = {}
+        self._async_engines: Dict[str, AsyncEngine] = {}
+        self._write_queues: Dict[str, WriteQueue] = {}
+        self._lock = threading.RLock()
+        os.makedirs(shard_dir, exist_ok=True)
+
+    def shard_path(self, shard_id: str) -> str:
+        return os.path.join(self.shard_dir, f"{shard_id}.db")
+
+    def _list_id(self, shard_id: str) -> int:
+        return int(shard_id.split("_", 1)[1])
+
+    def _load_list(self, list_id: int) -> Optional[Any]:
+        with self.catalog_engine.connect() as connection:
+            return connection.execute(
+                select(AwesomeList.__table__).where(AwesomeList.__table__.c.id == list_id)
+            ).first()
+
+    def _create_shard(self, shard_id: str) -> bool:
+        """
+        Create the shard file for a list that exists in the catalog.
+
+        Returns:
+            False when the list does not exist, so there is nothing to create
+        """
+        if os.path.exists(self.shard_path(shard_id)):
+            return True
+
+        list_id = self._list_id(shard_id)
+        list_row = self._load_list(list_id)
+        if list_row is None:
+            return False
+
+        engine = create_db_engine(f"sqlite:///{self.shard_path(shard_id)}")
+        try:
+            self.shard_metadata.create_all(bind=engine)
+            id_base = list_id << SHARD_ID_BITS
+            with engine.begin() as connection:
+                connection.execute(self.shard_metadata.tables["awesomelist"].insert(), dict(list_row._mapping))
+                for table_name in SHARDED_TABLES:
+                    connection.exec_driver_sql(
+                        "INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (table_name, id_base)
+                    )
+        finally:
+            engine.dispose()
+        logger.info(f"Created shard {shard_id} for awesome list {list_id}")
+        return True
+
+    def engine_for(self, shard_id: str, use_async: bool = False) -> Engine:
+        """
+        Get the (sync view of the) engine for a shard, creating the shard if needed.
+
+        Lists that do not exist route to the catalog, whose category and project
+        tables are empty, so reads return nothing and inserts fail their foreign key.
+        """
+        if shard_id == CATALOG_SHARD:
+            return self.catalog_async_engine.sync_engine if use_async else self.catalog_engine
+
+        engines = self._async_engines if use_async else self._engines
+        engine = engines.get(shard_id)
+        if engine is not None:
+            return engine.sync_engine if use_async else engine
+
+        with self._lock:
+            if shard_id not in engines:
+                if not self._create_shard(shard_id):
+                    return self.engine_for(CATALOG_SHARD, use_async)
+                url = f"sqlite:///{self.shard_path(shard_id)}"
+                # Reads and writes share the pool; writers to one list still serialize
+                # on that file's lock, but never block other lists. Async sessions
+                # only read, as on the catalog; async writes go through run_write
+                if use_async:
+                    engines[shard_id] = create_async_db_engine(
+                        url, read_only=True, pool_size=settings.SQLITE_READ_POOL_SIZE
+                    )
+                else:
+                    engines[shard_id] = create_db_engine(url, pool_size=settings.SQLITE_READ_POOL_SIZE)
+            engine = engines[shard_id]
+        return engine.sync_engine if use_async else engine
+
+    def list_shard_ids(self) -> List[str]:
+        """
+        IDs of every list shard that exists on disk.
+        """
+        with self.catalog_engine.connect() as connection:
+            list_ids = connection.execute(select(AwesomeList.__table__.c.id)).scalars().all()
+        return [
+            shard_for_list(list_id) for list_id in list_ids
+            if os.path.exists(self.shard_path(shard_for_list(list_id)))
+        ]
+
+    def write_queue_for(self, list_id: int) -> WriteQueue:
+        """
+        Get the write queue of a list's shard.
+        """
+        shard_id = shard_for_list(list_id)
+        with self._lock:
+            if shard_id not in self._write_queues:
+                shard_sessions = sessionmaker(
+                    bind=self.engine_for(shard_id), autoflush=False, expire_on_commit=False
+                )
+                self._write_queues[shard_id] = WriteQueue(
+                    shard_sessions,
+                    max_batch_size=settings.WRITE_QUEUE_MAX_BATCH_SIZE,
+                    max_wait_ms=settings.WRITE_QUEUE_MAX_WAIT_MS,
+                    begin_immediate=True,
+                )
+            return self._write_queues[shard_id]
+
+    def drop_list(self, list_id: int) -> None:
+        """
+        Delete a list's shard file, closing its engines and write queue first.
+        """
+        shard_id = shard_for_list(list_id)
+        with self._lock:
+            write_queue = self._write_queues.pop(shard_id, None)
+            engine = self._engines.pop(shard_id, None)
+            async_engine = self._async_engines.pop(shard_id, None)
+        if write_queue is not None:
+            write_queue.close()
+        if engine is not None:
+            engine.dispose()
+        if async_engine is not None:
+            # Async pools close their connections when garbage collected
+            async_engine.sync_engine.dispose(close=False)
+
+        for suffix in ("", "-wal", "-shm"):
+            path = self.shard_path(shard_id) + suffix
+            if os.path.exists(path):
+                os.remove(path)
+        logger.info(f"Dropped shard {shard_id}")
+
+    async def aclose(self) -> None:
+        """
+        Close every write queue and shard engine.
+        """
+        with self._lock:
+            write_queues = list(self._write_queues.values())
+            engines = list(self._engines.values())
+            async_engines = list(self._async_engines.values())
+            self._write_queues.clear()
+            self._engines.clear()
+            self._async_engines.clear()
+        for write_queue in write_queues:
+            write_queue.close()
+        for engine in engines:
+            engine.dispose()
+        for async_engine in async_engines:
+            await async_engine.dispose()
+
+
+def _shard_comparisons(statement: Any) -> Iterable[str]:
+    """
+    Yield the shard IDs implied by list and row ID comparisons in a statement.
+    """
+    where = getattr(statement, "whereclause", None)
+    if where is None:
+        return
+
+    for element in visitors.iterate(where):
+        if not isinstance(element, BinaryExpression) or not isinstance(element.right, BindParameter):
+            continue
+        if element.operator not in (operators.eq, operators.in_op):
+            continue
+
+        table = getattr(element.left, "table", None)
+        key = (getattr(table, "name", None), getattr(element.left, "key", None))
+        if key in LIST_ID_COLUMNS:
+            to_shard = shard_for_list
+        elif key in ROW_ID_COLUMNS:
+            to_shard = shard_for_row_id
+        else:
+            continue
+
+        value = element.right.effective_value
+        values = value if isinstance(value, (list, tuple, set)) else [value]
+        for item in values:
+            if item is not None:
+                yield to_shard(item)
+
+
+class ListShardedSession(ShardedSession):
+    """
+    Session that routes list content to its shard and everything else to the catalog.
+    """
+
+    def __init__(self, registry: ShardRegistry, use_async: bool = False, **kwargs):
+        """
+        Initialize the session.
+
+        Args:
+            registry: Registry providing shard engines
+            use_async: Bind to async engines (when used as an AsyncSession's sync session)
+            **kwargs: Passed through to Session
+        """
+        self.registry = registry
+        self.use_async = use_async
+        super().__init__(
+            shard_chooser=self._choose_shard,
+            identity_chooser=self._choose_identity_shards,
+            execute_chooser=self._choose_execute_shards,
+            **kwargs,
+        )
+
+    def use_writer(self) -> None:
+        """
+        Shards have no separate readers; kept for parity with RoutingSession.
+        """
+
+    def get_bind(self, mapper=None, *, shard_id=None, instance=None, clause=None, **kwargs):
+        if shard_id is None:
+            shard_id = self._choose_shard_and_assign(mapper, instance=instance, clause=clause)
+        # Shards are bound lazily as lists are first touched
+        self.bind_shard(shard_id, self.registry.engine_for(shard_id, self.use_async))
+        return super().get_bind(mapper, shard_id=shard_id, instance=instance, clause=clause, **kwargs)
+
+    def _choose_shard(self, mapper, instance, clause=None, **kwargs) -> str:
+        if mapper is None or mapper.local_table.name not in SHARDED_TABLES:
+            return CATALOG_SHARD
+        if instance is not None and instance.list_id is not None:
+            return shard_for_list(instance.list_id)
+        if clause is not None:
+            for shard_id in _shard_comparisons(clause):
+                return shard_id
+        raise ValueError(f"Cannot choose a shard for {mapper.class_.__name__} without a list_id")
+
+    def _choose_identity_shards(self, mapper, primary_key, **kwargs) -> List[str]:
+        if mapper.local_table.name not in SHARDED_TABLES:
+            return [CATALOG_SHARD]
+        return [shard_for_row_id(primary_key[0])]
+
+    def _choose_execute_shards(self, orm_context) -> List[str]:
+        if orm_context.is_select and orm_context.lazy_loaded_from is not None:
+            return [orm_context.lazy_loaded_from.identity_token]
+
+        mapper = orm_context.bind_mapper
+        if mapper is None or mapper.local_table.name not in SHARDED_TABLES:
+            return [CATALOG_SHARD]
+
+        shard_ids = list(dict.fromkeys(_shard_comparisons(orm_context.statement)))
+        if shard_ids:
+            return shard_ids
+
+        # No list or row ID in the criteria: query every list
+        return self.registry.list_shard_ids()
@@ -0,0 +1,116 @@
+"""
+SQLite production profile: connect-time pragmas and periodic maintenance.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Pragmas reported by the health endpoint
+REPORTED_PRAGMAS = (
+    "journal_mode",
+    "synchronous",
+    "busy_timeout",
+    "mmap_size",
+    "cache_size",
+    "temp_store",
+    "foreign_keys",
+)
+
+_last_maintenance: Dict[str, Optional[float]] = {"started_at": None, "finished_at": None}
+
+
+def is_sqlite_url(url: str) -> bool:
+    """
+    Check whether a database URL points at SQLite.
+    """
+    return url.startswith("sqlite")
+
+
+def configure_sqlite_engine(engine: Engine, read_only: bool = False) -> None:
+    """
+    Register a connect hook that applies the tuning pragmas to every new connection.
+
+    Args:
+        engine: SQLite engine to configure
+        read_only: Reject writes on this engine's connections (PRAGMA query_only)
+    """
+    @event.listens_for(engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            # busy_timeout first so the journal_mode switch can wait on other writers
+            cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+            cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+            cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+            cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+            cursor.execute(f"PRAGMA cache_size={int(settings.SQLITE_CACHE_SIZE)}")
+            cursor.execute(f"PRAGMA temp_store={settings.SQLITE_TEMP_STORE}")
+            # Deletes rely on ON DELETE CASCADE, which SQLite only enforces with foreign keys on
+            cursor.execute("PRAGMA foreign_keys=ON")
+            if read_only:
+                cursor.execute("PRAGMA query_only=ON")
+        finally:
+            cursor.close()
+
+
+def run_sqlite_maintenance(engine: Engine) -> None:
+    """
+    Refresh planner statistics with a bounded ANALYZE followed by PRAGMA optimize.
+
+    Args:
+        engine: SQLite engine to maintain
+    """
+    _last_maintenance["started_at"] = time.time()
+    with engine.connect() as connection:
+        # analysis_limit keeps ANALYZE cheap on large tables
+        connection.exec_driver_sql(f"PRAGMA analysis_limit={int(settings.SQLITE_ANALYSIS_LIMIT)}")
+        connection.exec_driver_sql("ANALYZE")
+        connection.exec_driver_sql("PRAGMA optimize")
+        connection.commit()
+    _last_maintenance["finished_at"] = time.time()
+
+
+async def sqlite_maintenance_loop(engine: Engine, interval: Optional[int] = None) -> None:
+    """
+    Run SQLite maintenance at startup and then every `interval` seconds.
+
+    Args:
+        engine: SQLite engine to maintain
+        interval: Seconds between runs (defaults to SQLITE_MAINTENANCE_INTERVAL_SECONDS)
+    """
+    interval = interval or settings.SQLITE_MAINTENANCE_INTERVAL_SECONDS
+    while True:
+        try:
+            await asyncio.to_thread(run_sqlite_maintenance, engine)
+        except Exception as e:
+            logger.error(f"SQLite maintenance failed: {str(e)}")
+        await asyncio.sleep(interval)
+
+
+def sqlite_pragma_state(engine: Engine) -> Dict[str, Any]:
+    """
+    Read the effective pragma values from a pooled connection.
+
+    Args:
+        engine: SQLite engine to inspect
+
+    Returns:
+        Dictionary with the pragma values and the last maintenance run
+    """
+    pragmas = {}
+    with engine.connect() as connection:
+        for pragma in REPORTED_PRAGMAS:
+            pragmas[pragma] = connection.exec_driver_sql(f"PRAGMA {pragma}").scalar()
+
+    return {
+        "pragmas": pragmas,
+        "last_maintenance": dict(_last_maintenance),
+    }
@@ -0,0 +1,148 @@
+"""
+Single-writer queue that batches small write jobs into shared commits.
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+WriteJob = Callable[[Session], Any]
+
+_STOP = object()
+
+
+class WriteQueue:
+    """
+    Runs write jobs on one dedicated thread and commits them in batches.
+
+    Jobs submitted within `max_wait_ms` of each other share one transaction and
+    one commit. Each job runs in its own SAVEPOINT, so a failing job is rolled
+    back and reported to its caller without affecting the rest of the batch.
+    Jobs must only add and flush; the queue owns the commit.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        max_batch_size: int = 64,
+        max_wait_ms: int = 5,
+        begin_immediate: bool = False,
+    ):
+        """
+        Initialize the queue.
+
+        Args:
+            session_factory: Factory for sessions bound to the writer engine
+            max_batch_size: Maximum number of jobs committed together
+            max_wait_ms: How long to wait for more jobs before committing
+            begin_immediate: Start each batch with BEGIN IMMEDIATE (SQLite)
+        """
+        self.session_factory = session_factory
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.begin_immediate = begin_immediate
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, job: WriteJob) -> Future:
+        """
+        Queue a write job.
+
+        Args:
+            job: Callable receiving the writer session
+
+        Returns:
+            Future resolved with the job's return value once its batch commits
+        """
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((job, future))
+        return future
+
+    def run(self, job: WriteJob, timeout: Optional[float] = None) -> Any:
+        """
+        Queue a write job and wait for its batch to commit.
+        """
+        return self.submit(job).result(timeout)
+
+    def close(self) -> None:
+        """
+        Commit any queued jobs and stop the writer thread.
+        """
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._worker, name="db-write-queue", daemon=True)
+                self._thread.start()
+
+    def _worker(self) -> None:
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._run_batch(batch)
+
+    def _run_batch(self, batch: List[Tuple[WriteJob, Future]]) -> None:
+        outcomes = []
+        session = self.session_factory()
+        try:
+            if self.begin_immediate:
+                # Take the write lock up front; pysqlite otherwise defers BEGIN
+                # and the first SAVEPOINT would open (and RELEASE commit) the transaction
+                session.connection().exec_driver_sql("BEGIN IMMEDIATE")
+
+            for job, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    with session.begin_nested():
+                        outcomes.append((future, job(session), None))
+                except Exception as e:
+                    outcomes.append((future, None, e))
+
+            session.commit()
+        except Exception as e:
+            logger.error(f"Write batch of {len(batch)} jobs failed: {str(e)}")
+            session.rollback()
+            job_errors = {future: error for future, _, error in outcomes}
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(job_errors.get(future) or e)
+            return
+        finally:
+            session.close()
+
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
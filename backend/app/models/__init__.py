@@ -2,3 +2,5 @@
 from app.models.awesome_list import AwesomeList
 from app.models.category import Category
 from app.models.project import Project
+from app.models.url_metadata import UrlMetadata
+from app.models.background_job import BackgroundJob
@@ -13,6 +13,7 @@ class AwesomeList(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
-    # Relationships
-    categories = relationship("Category", back_populates="awesome_list", cascade="all, delete-orphan")
-    projects = relationship("Project", cascade="all, delete-orphan")
+    # Relationships. Children are removed by ON DELETE CASCADE in the database,
+    # so deleting a list never loads its categories and projects.
+    categories = relationship("Category", back_populates="awesome_list", cascade="all, delete-orphan", passive_deletes=True)
+    projects = relationship("Project", cascade="all, delete-orphan", passive_deletes=True)
@@ -0,0 +1,37 @@
+from sqlalchemy import Column, DateTime, Index, Integer, JSON, String, Text
+
+from app.db.base_class import Base
+
+
+class BackgroundJob(Base):
+    """
+    A queued unit of background work (an import, a batch categorization, ...).
+
+    Workers claim a job by taking a lease on it; a job whose lease expires
+    without being renewed is claimed again by another worker. Failed attempts
+    are retried with backoff until max_attempts is reached.
+    """
+    id = Column(String(32), primary_key=True)
+    kind = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False)
+    status = Column(String, nullable=False, default="pending", server_default="pending")
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    max_attempts = Column(Integer, nullable=False)
+    run_at = Column(DateTime(timezone=True), nullable=False)
+    lease_owner = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    # Last progress reported by the worker, and the event ID it corresponds to
+    progress = Column(JSON(none_as_null=True), nullable=True)
+    progress_seq = Column(Integer, nullable=False, default=0, server_default="0")
+    # Result once succeeded; an import records the list it created here first
+    result = Column(JSON(none_as_null=True), nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # Claiming looks for due pending jobs and expired running ones
+        Index("ix_backgroundjob_status_run_at", "status", "run_at"),
+        Index("ix_backgroundjob_status_lease_expires_at", "status", "lease_expires_at"),
+    )
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, ForeignKey, Index
+from sqlalchemy.orm import relationship, backref
 
 from app.db.base_class import Base
 
@@ -10,8 +10,18 @@ class Category(Base):
     name = Column(String, nullable=False)
     parent_category_id = Column(Integer, ForeignKey("category.id", ondelete="CASCADE"), nullable=True)
     order = Column(Integer, default=0)
+
+    # Category trees are always read per list and parent, in display order
+    __table_args__ = (
+        Index("ix_category_list_id_parent_category_id_order", "list_id", "parent_category_id", "order"),
+        Index("ix_category_parent_category_id", "parent_category_id"),
+    )
     
-    # Relationships
+    # Relationships. Subcategories and projects are removed by ON DELETE CASCADE
     awesome_list = relationship("AwesomeList", back_populates="categories")
-    parent_category = relationship("Category", backref="subcategories", remote_side=[id])
-    projects = relationship("Project", back_populates="category", cascade="all, delete-orphan")
+    parent_category = relationship(
+        "Category",
+        backref=backref("subcategories", cascade="all, delete-orphan", passive_deletes=True),
+        remote_side=[id],
+    )
+    projects = relationship("Project", back_populates="category", cascade="all, delete-orphan", passive_deletes=True)
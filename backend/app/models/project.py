@@ -1,6 +1,6 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, JSON
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, JSON, Index
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 
 from app.db.base_class import Base
 
@@ -12,9 +12,17 @@ class Project(Base):
     title = Column(String, nullable=False)
     url = Column(String, nullable=False)
     description = Column(Text, nullable=True)
-    project_metadata = Column(JSON, nullable=True)
+    # Site metadata and suggestion payloads are only needed on the detail
+    # view, so keep them out of list/tree/README queries unless undeferred.
+    project_metadata = deferred(Column(JSON, nullable=True))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    # Projects are listed per list and category; category_id alone backs the FK
+    __table_args__ = (
+        Index("ix_project_list_id_category_id", "list_id", "category_id"),
+        Index("ix_project_category_id", "category_id"),
+    )
     
     # Relationships
     awesome_list = relationship("AwesomeList")
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, String, DateTime, JSON
+
+from app.db.base_class import Base
+
+
+class UrlMetadata(Base):
+    """
+    Cached site metadata, keyed by normalized URL.
+
+    Holds the last successful fetch and, while the URL keeps failing, the last
+    error and when the next fetch may be attempted.
+    """
+    id = Column(Integer, primary_key=True, index=True)
+    url = Column(String, nullable=False, unique=True, index=True)
+    site_metadata = Column(JSON(none_as_null=True), nullable=True)
+    fetched_at = Column(DateTime(timezone=True), nullable=True)
+    error_metadata = Column(JSON(none_as_null=True), nullable=True)
+    error_class = Column(String, nullable=True)
+    failure_count = Column(Integer, nullable=False, default=0, server_default="0")
+    retry_at = Column(DateTime(timezone=True), nullable=True)
@@ -35,3 +35,18 @@ class ProjectInDBBase(ProjectBase):
 
 class Project(ProjectInDBBase):
     pass
+
+
+class ProjectSummary(BaseModel):
+    """Project row as returned by list endpoints, without ``project_metadata``."""
+    id: int
+    list_id: int
+    category_id: int
+    title: str
+    url: HttpUrl
+    description: Optional[str] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -1,71 +1,300 @@
 """
 Service for AI-powered categorization of repositories.
+
+Categorization is routed through tiers from cheapest to most expensive: the
+list's local suggester, then Ollama, then OpenAI. A tier's answer is used when
+its confidence reaches the tier's threshold; otherwise the URL escalates to the
+next tier. The README is only fetched once an LLM tier is needed.
+
+Concurrent README fetches of one repository, and concurrent LLM calls with
+the same prompt, are coalesced into one call whose result every caller gets.
+
+Batches may carry a time budget: calls inherit the deadline as their timeout,
+and URLs that did not finish in time are returned as "not_attempted".
 """
 import os
 import logging
-from typing import List, Dict, Any, Optional, Union
+import time
+from typing import List, Dict, Any, Optional, Tuple, Union
 import json
 import asyncio
-import concurrent.futures
 
+from app.core.config import settings
 from app.utils.ai_categorizer import AICategorizer
-from app.utils.site_metadata import fetch_site_metadata
+from app.utils.category_index import CategoryIndex
+from app.utils.deadline import DeadlineExceeded, deadline_at, deadline_in
+from app.utils.project_classifier import ProjectClassifier
+from app.utils.singleflight import SingleFlight
+from app.utils.site_metadata import get_category_suggester_async
+from app.services.job_progress import CATEGORIZED, FAILED, FETCHED, NOT_ATTEMPTED, Job
+from app.services.metadata_cache import get_cached_site_metadata
+from app.services.url_characterization import COMPLETED, FAILED_STATUS, NOT_ATTEMPTED_STATUS
 from app.models.category import Category
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 logger = logging.getLogger(__name__)
 
+LOCAL_TIER = "local"
+OLLAMA_TIER = "ollama"
+OPENAI_TIER = "openai"
+
+# Confidence assumed for LLM answers that do not report one
+DEFAULT_LLM_CONFIDENCE = 0.5
+
+_readme_fetches = SingleFlight("readme")
+_llm_calls = SingleFlight("llm")
+
+_tier_stats: Dict[str, Dict[str, float]] = {}
+_routing_stats = {"requests": 0, "unresolved": 0}
+
+
+def _record_tier(tier: str, latency: float, answered: bool) -> None:
+    stats = _tier_stats.setdefault(tier, {"attempts": 0, "answered": 0, "escalated": 0, "total_latency_ms": 0.0})
+    stats["attempts"] += 1
+    stats["answered" if answered else "escalated"] += 1
+    stats["total_latency_ms"] += latency * 1000
+
+
+def ai_routing_stats() -> Dict[str, Any]:
+    """
+    Attempts, answers, escalations and latency per categorization tier.
+    """
+    tiers = {
+        tier: {
+            **{key: value for key, value in stats.items() if key != "total_latency_ms"},
+            "avg_latency_ms": round(stats["total_latency_ms"] / stats["attempts"], 1),
+        }
+        for tier, stats in _tier_stats.items()
+    }
+    return {
+        **_routing_stats,
+        # Requests answered without calling an LLM
+        "llm_calls_avoided": _tier_stats.get(LOCAL_TIER, {}).get("answered", 0),
+        "tiers": tiers,
+    }
+
+
+class CategorizationContext:
+    """
+    What routing needs to know about a list, loaded once per request.
+
+    Attributes:
+        structure: Category names mapped to their subcategory names
+        placements: Category ID -> (category name, subcategory name or None)
+        suggester: The list's local category suggester
+    """
+
+    def __init__(self, structure: Dict[str, List[str]], placements: Dict[int, Tuple[str, Optional[str]]],
+                 suggester: Union[ProjectClassifier, CategoryIndex]):
+        self.structure = structure
+        self.placements = placements
+        self.suggester = suggester
+
+
 class AICategorization:
     """
     Service for AI-powered categorization operations.
     """
 
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         """
         Initialize the service.
 
         Args:
-            db: Database session
+            db: Async database session
         """
         self.db = db
+        # LLM clients are created on first use, so local answers need no API key
+        self._categorizers: Dict[str, AICategorizer] = {}
 
-        # Initialize AI categorizer with OpenAI by default
-        # Users can switch to Ollama in the API
-        self.ai_categorizer = AICategorizer(
-            api_key=os.environ.get("OPENAI_API_KEY"),
-            model=os.environ.get("OPENAI_MODEL", "gpt-3.5-turbo")
-        )
+    def _get_categorizer(self, tier: str) -> AICategorizer:
+        categorizer = self._categorizers.get(tier)
+        if categorizer is None:
+            if tier == OLLAMA_TIER:
+                categorizer = AICategorizer(
+                    use_ollama=True,
+                    ollama_base_url=os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434"),
+                    ollama_model=os.environ.get("OLLAMA_MODEL", "llama3")
+                )
+            else:
+                categorizer = AICategorizer(
+                    api_key=os.environ.get("OPENAI_API_KEY"),
+                    model=os.environ.get("OPENAI_MODEL", "gpt-3.5-turbo")
+                )
+            self._categorizers[tier] = categorizer
+        return categorizer
 
-    def _get_category_structure(self, awesome_list_id: int) -> Dict[str, List[str]]:
+    async def get_context(self, awesome_list_id: int) -> CategorizationContext:
         """
-        Get the category structure for an awesome list.
+        Load the category tree and local suggester of an awesome list.
 
         Args:
             awesome_list_id: ID of the awesome list
 
         Returns:
-            Dictionary mapping category names to lists of subcategory names
+            The list's categorization context
         """
-        # Get all main categories for this awesome list
-        main_categories = self.db.query(Category).filter(
-            Category.list_id == awesome_list_id,
-            Category.parent_category_id == None
-        ).all()
+        # Load the whole tree in one query and group subcategories in memory
+        result = await self.db.execute(
+            select(Category).where(Category.list_id == awesome_list_id).order_by(Category.id)
+        )
+        categories = result.scalars().all()
+        suggester = await get_category_suggester_async(self.db, awesome_list_id)
 
         category_structure = {}
+        names_by_id = {}
+        placements = {}
+
+        for category in categories:
+            if category.parent_category_id is None:
+                category_structure[category.name] = []
+                names_by_id[category.id] = category.name
+                placements[category.id] = (category.name, None)
+
+        for category in categories:
+            parent_name = names_by_id.get(category.parent_category_id)
+            if parent_name is not None:
+                category_structure[parent_name].append(category.name)
+                placements[category.id] = (parent_name, category.name)
+
+        return CategorizationContext(category_structure, placements, suggester)
+
+    def _tiers(self, use_ollama: bool) -> List[str]:
+        """
+        Tiers to try in order; use_ollama keeps the request away from OpenAI.
+        """
+        tiers = [tier for tier in settings.AI_ROUTING_TIERS if tier in (LOCAL_TIER, OLLAMA_TIER, OPENAI_TIER)]
+        if use_ollama:
+            tiers = [tier for tier in tiers if tier != OPENAI_TIER]
+            if OLLAMA_TIER not in tiers:
+                tiers.append(OLLAMA_TIER)
+        elif not (settings.OPENAI_API_KEY or os.environ.get("OPENAI_API_KEY")):
+            tiers = [tier for tier in tiers if tier != OPENAI_TIER]
+        return tiers
+
+    @staticmethod
+    def _threshold(tier: str) -> float:
+        if tier == LOCAL_TIER:
+            return settings.AI_LOCAL_CONFIDENCE_THRESHOLD
+        if tier == OLLAMA_TIER:
+            return settings.AI_OLLAMA_CONFIDENCE_THRESHOLD
+        # The last resort answers whatever its confidence
+        return 0.0
+
+    def _local_answer(self, url: str, metadata: Dict[str, Any], context: CategorizationContext) -> Dict[str, Any]:
+        text = " ".join(part for part in (metadata.get("title"), metadata.get("description")) if part)
+        category_id, confidence = context.suggester.score(url, text or None)
+        category, subcategory = context.placements.get(category_id, (None, None))
+        return {
+            "category": category,
+            "subcategory": subcategory,
+            # Without an LLM the page description stands in for a summary
+            "summary": metadata.get("description"),
+            "confidence": confidence if category else 0.0,
+        }
+
+    @staticmethod
+    def _llm_answer(ai_result: Dict[str, Any], context: CategorizationContext) -> Dict[str, Any]:
+        category = ai_result.get("category")
+        subcategory = ai_result.get("subcategory")
+        try:
+            confidence = float(ai_result.get("confidence", DEFAULT_LLM_CONFIDENCE))
+        except (TypeError, ValueError):
+            confidence = DEFAULT_LLM_CONFIDENCE
+        # An answer outside the list's structure is no answer
+        if category not in context.structure:
+            confidence = 0.0
+        elif subcategory not in context.structure[category]:
+            subcategory = None
+        return {
+            "category": category,
+            "subcategory": subcategory,
+            "summary": ai_result.get("summary"),
+            "confidence": min(max(confidence, 0.0), 1.0),
+        }
+
+    async def _route(self, url: str, metadata: Dict[str, Any], context: CategorizationContext,
+                     use_ollama: bool) -> Dict[str, Any]:
+        """
+        Ask each tier in turn until one is confident enough.
+
+        Returns:
+            The accepted answer with its tier, plus the trace of tiers tried;
+            `deadline_exceeded` is set when the deadline stopped the escalation
+        """
+        trace = []
+        best = None
+        readme = None
+        accepted = False
+        deadline_exceeded = False
+
+        for tier in self._tiers(use_ollama):
+            started = time.monotonic()
+            try:
+                if tier == LOCAL_TIER:
+                    answer = self._local_answer(url, metadata, context)
+                else:
+                    categorizer = self._get_categorizer(tier)
+                    if readme is None:
+                        # Fetched once; a failure fails every LLM tier the same way
+                        readme = asyncio.ensure_future(_readme_fetches.do(
+                            categorizer.readme_key(url),
+                            lambda: categorizer.fetch_github_readme(url),
+                        ))
+                    readme_content = await readme
+                    ai_result = await _llm_calls.do(
+                        categorizer.prompt_key(readme_content, context.structure),
+                        lambda: categorizer.categorize_readme(readme_content, context.structure),
+                    )
+                    answer = self._llm_answer(ai_result, context)
+            except DeadlineExceeded:
+                # Keep the best answer so far; the URL can be retried with a larger budget
+                deadline_exceeded = True
+                break
+            except Exception as e:
+                logger.error(f"Categorization tier {tier} failed for {url}: {str(e)}")
+                answer = {"category": None, "subcategory": None, "summary": None, "confidence": 0.0, "error": str(e)}
+            latency = time.monotonic() - started
 
-        for main_category in main_categories:
-            # Get subcategories for this main category
-            subcategories = self.db.query(Category).filter(
-                Category.parent_category_id == main_category.id
-            ).all()
+            answer["tier"] = tier
+            accepted = answer["category"] is not None and answer["confidence"] >= self._threshold(tier)
+            _record_tier(tier, latency, accepted)
+            trace.append({"tier": tier, "confidence": answer["confidence"], "latency_ms": round(latency * 1000, 1)})
 
-            # Add to structure
-            category_structure[main_category.name] = [sub.name for sub in subcategories]
+            if accepted:
+                best = answer
+                break
+            # Remember the most confident answer in case no tier is sure enough
+            if best is None or answer["confidence"] > best["confidence"]:
+                best = answer
 
-        return category_structure
+        _routing_stats["requests"] += 1
+        if not accepted:
+            _routing_stats["unresolved"] += 1
+        best = best or {"category": None, "subcategory": None, "summary": None, "confidence": 0.0, "tier": None}
+        best["tiers"] = trace
+        best["deadline_exceeded"] = deadline_exceeded
+        return best
 
-    async def process_url(self, url: str, awesome_list_id: int, use_ollama: bool = False) -> Dict[str, Any]:
+    @staticmethod
+    def _unanswered_result(url: str, error: str, status: str, started: float) -> Dict[str, Any]:
+        return {
+            "url": url,
+            "status": status,
+            "error": error,
+            "metadata": {"title": url, "description": "Failed to fetch metadata"},
+            "category": None,
+            "subcategory": None,
+            "summary": None,
+            "tier": None,
+            "confidence": 0.0,
+            "latency_ms": round((time.monotonic() - started) * 1000, 1),
+        }
+
+    async def process_url(self, url: str, awesome_list_id: int, use_ollama: bool = False,
+                          context: Optional[CategorizationContext] = None,
+                          refresh: bool = False, progress: Optional[Job] = None) -> Dict[str, Any]:
         """
         Process a single URL with AI categorization.
 
@@ -73,80 +302,117 @@ class AICategorization:
             url: URL to process
             awesome_list_id: ID of the awesome list
             use_ollama: Whether to use Ollama instead of OpenAI
+            context: Preloaded categorization context (loaded when not given)
+            refresh: Fetch metadata now, bypassing the cache and failure backoff
+            progress: Background job to report the URL's progress to
 
         Returns:
-            Dictionary with metadata, suggested category, and summary
+            Dictionary with metadata, suggested category, and summary, plus the
+            answering tier, its confidence and the total latency. `status` is
+            "completed", "failed", or "not_attempted" when the deadline cut the
+            URL short (any answer found until then is kept).
         """
+        started = time.monotonic()
         try:
-            # Get category structure
-            category_structure = self._get_category_structure(awesome_list_id)
+            # Get category structure and local suggester
+            if context is None:
+                context = await self.get_context(awesome_list_id)
 
             # Get metadata
-            metadata = await fetch_site_metadata(url)
-
-            # Configure AI categorizer based on preference
-            if use_ollama != self.ai_categorizer.use_ollama:
-                # Reconfigure if the setting changed
-                if use_ollama:
-                    self.ai_categorizer = AICategorizer(
-                        use_ollama=True,
-                        ollama_base_url=os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434"),
-                        ollama_model=os.environ.get("OLLAMA_MODEL", "llama3")
-                    )
-                else:
-                    self.ai_categorizer = AICategorizer(
-                        api_key=os.environ.get("OPENAI_API_KEY"),
-                        model=os.environ.get("OPENAI_MODEL", "gpt-3.5-turbo")
-                    )
+            metadata = await get_cached_site_metadata(url, force_refresh=refresh)
+            if progress:
+                progress.emit(FETCHED, url=url)
 
-            # Run AI categorization in a thread pool to avoid blocking
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                ai_result = await asyncio.get_event_loop().run_in_executor(
-                    executor,
-                    self.ai_categorizer.categorize_repository,
-                    url,
-                    category_structure
-                )
+            answer = await self._route(url, metadata, context, use_ollama)
+            status = NOT_ATTEMPTED_STATUS if answer["deadline_exceeded"] else COMPLETED
+            if progress and status == COMPLETED:
+                progress.emit(CATEGORIZED, url=url, category=answer.get("category"), tier=answer.get("tier"))
+            elif progress:
+                progress.emit(NOT_ATTEMPTED, url=url)
 
             # Combine metadata and AI results
             result = {
                 "url": url,
+                "status": status,
                 "metadata": metadata,
-                "category": ai_result.get("category"),
-                "subcategory": ai_result.get("subcategory"),
-                "summary": ai_result.get("summary")
+                "category": answer.get("category"),
+                "subcategory": answer.get("subcategory"),
+                "summary": answer.get("summary"),
+                "tier": answer.get("tier"),
+                "confidence": answer.get("confidence"),
+                "tiers": answer.get("tiers"),
+                "latency_ms": round((time.monotonic() - started) * 1000, 1),
             }
 
             return result
+        except DeadlineExceeded as e:
+            if progress:
+                progress.emit(NOT_ATTEMPTED, url=url)
+            return self._unanswered_result(url, str(e), NOT_ATTEMPTED_STATUS, started)
         except Exception as e:
             logger.error(f"Error processing URL {url}: {str(e)}")
-            return {
-                "url": url,
-                "error": str(e),
-                "metadata": {"title": url, "description": "Failed to fetch metadata"},
-                "category": None,
-                "subcategory": None,
-                "summary": None
-            }
+            if progress:
+                progress.emit(FAILED, url=url, error=str(e))
+            return self._unanswered_result(url, str(e), FAILED_STATUS, started)
 
-    async def process_batch_urls(self, urls: List[str], awesome_list_id: int, use_ollama: bool = False) -> List[Dict[str, Any]]:
+    async def process_batch_urls(self, urls: List[str], awesome_list_id: int, use_ollama: bool = False,
+                                 refresh: bool = False, context: Optional[CategorizationContext] = None,
+                                 progress: Optional[Job] = None,
+                                 budget_seconds: Optional[float] = None) -> List[Dict[str, Any]]:
         """
-        Process multiple URLs with AI categorization.
+        Process multiple URLs with AI categorization, at most
+        AI_BATCH_CONCURRENCY at a time.
+
+        With a budget, every fetch and LLM call is given the time left as its
+        timeout; URLs still unfinished when it runs out are cancelled and
+        returned with status "not_attempted".
 
         Args:
             urls: List of URLs to process
             awesome_list_id: ID of the awesome list
             use_ollama: Whether to use Ollama instead of OpenAI
+            refresh: Fetch metadata now, bypassing the cache and failure backoff
+            context: Preloaded categorization context (loaded when not given)
+            progress: Background job to report each URL's progress to
+            budget_seconds: Time budget for the whole batch
 
         Returns:
-            List of dictionaries with metadata, suggested categories, and summaries
+            List of dictionaries with metadata, suggested categories, and summaries,
+            in the order of urls
         """
-        # Process URLs concurrently
-        tasks = []
-        for url in urls:
-            tasks.append(self.process_url(url, awesome_list_id, use_ollama))
+        started = time.monotonic()
+        deadline = deadline_in(budget_seconds)
+
+        # Load the context once; concurrent tasks must not share the session
+        if context is None:
+            context = await self.get_context(awesome_list_id)
+
+        semaphore = asyncio.Semaphore(settings.AI_BATCH_CONCURRENCY)
+
+        async def run(url: str) -> Dict[str, Any]:
+            with deadline_at(deadline):
+                async with semaphore:
+                    return await self.process_url(url, awesome_list_id, use_ollama, context, refresh, progress)
 
-        # Wait for all tasks to complete
-        results = await asyncio.gather(*tasks)
+        # Process URLs concurrently, all on the event loop
+        tasks = [asyncio.create_task(run(url)) for url in urls]
+        if deadline is None:
+            return list(await asyncio.gather(*tasks))
 
+        try:
+            if tasks:
+                await asyncio.wait(tasks, timeout=max(deadline - time.monotonic(), 0))
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        results = []
+        for url, task in zip(urls, tasks):
+            if task.done() and not task.cancelled():
+                results.append(task.result())
+                continue
+            if progress:
+                progress.emit(NOT_ATTEMPTED, url=url)
+            results.append(self._unanswered_result(url, str(DeadlineExceeded()), NOT_ATTEMPTED_STATUS, started))
         return results
+
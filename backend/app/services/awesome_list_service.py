@@ -1,18 +1,27 @@
+import threading
+from concurrent.futures import wait
+from functools import partial
 from typing import List, Optional
 from fastapi import HTTPException
+from sqlalchemy import delete, select, update
 from sqlalchemy.orm import Session
-import httpx
 from urllib.parse import urlparse
-try:
-    from github import Github
-except ImportError:
-    # Github module might not be available during testing
-    pass
 
 from app.models.awesome_list import AwesomeList
-from app.schemas.awesome_list import AwesomeListCreate, AwesomeListUpdate
+from app.models.background_job import BackgroundJob
+from app.schemas.awesome_list import AwesomeList as AwesomeListSchema, AwesomeListCreate, AwesomeListUpdate
 from app.services.markdown_parser import parse_awesome_list
+from app.services.job_progress import FAILED, FETCHED, INSERTED, PARSED, Job
 from app.core.config import settings
+from app.db.session import SessionLocal, get_shard_registry, get_write_queue
+from app.utils.category_index import LIST_ID_OPTION
+from app.utils.http_client import GITHUB_AVAILABLE, get_github_client, sync_request
+
+
+class ImportCancelled(Exception):
+    """
+    The import was asked to stop, e.g. because its job lost its lease.
+    """
 
 
 def get_awesome_lists(db: Session, skip: int = 0, limit: int = 100) -> List[AwesomeList]:
@@ -111,11 +120,63 @@ def update_awesome_list(
 def delete_awesome_list(db: Session, list_id: int) -> None:
     """
     Delete an awesome list.
+
+    Categories and projects are removed by ON DELETE CASCADE in the database,
+    so this is a single statement regardless of the list size. In sharded
+    storage they live in the list's own file, which is removed instead.
     """
-    db_awesome_list = db.query(AwesomeList).filter(AwesomeList.id == list_id).first()
-    db.delete(db_awesome_list)
+    db.execute(delete(AwesomeList).where(AwesomeList.id == list_id).execution_options(**{LIST_ID_OPTION: list_id}))
     db.commit()
 
+    shard_registry = get_shard_registry()
+    if shard_registry is not None:
+        shard_registry.drop_list(list_id)
+
+
+def delete_awesome_list_in_chunks(list_id: int, chunk_size: Optional[int] = None) -> None:
+    """
+    Delete a large awesome list in small transactions.
+
+    Projects and categories are removed `chunk_size` rows at a time, committing
+    between chunks so other writers get the database in between. Intended to
+    run as a background task; it opens its own session.
+    """
+    from app.models.category import Category
+    from app.models.project import Project
+
+    chunk_size = chunk_size or settings.DELETE_CHUNK_SIZE
+    db = SessionLocal()
+    try:
+        if get_shard_registry() is not None:
+            # Dropping the list's shard file is already cheap
+            delete_awesome_list(db, list_id)
+            return
+
+        chunked_deletes = [
+            (Project, Project.list_id == list_id),
+            # Subcategories first so each chunk cascades to as few rows as possible
+            (Category, (Category.list_id == list_id) & (Category.parent_category_id.isnot(None))),
+            (Category, Category.list_id == list_id),
+        ]
+        for model, condition in chunked_deletes:
+            while True:
+                chunk = select(model.id).where(condition).limit(chunk_size)
+                result = db.execute(
+                    delete(model).where(model.id.in_(chunk)).execution_options(**{LIST_ID_OPTION: list_id})
+                )
+                db.commit()
+                if result.rowcount < chunk_size:
+                    break
+
+        db.execute(delete(AwesomeList).where(AwesomeList.id == list_id).execution_options(**{LIST_ID_OPTION: list_id}))
+        db.commit()
+        print(f"Deleted awesome list {list_id} in chunks of {chunk_size}")
+    except Exception as e:
+        db.rollback()
+        print(f"Chunked delete of awesome list {list_id} failed: {str(e)}")
+    finally:
+        db.close()
+
 
 def extract_repo_info(repository_url: str) -> tuple:
     """
@@ -131,9 +192,23 @@ def extract_repo_info(repository_url: str) -> tuple:
     return owner, repo
 
 
-def import_awesome_list(db: Session, repository_url: str) -> AwesomeList:
+def import_awesome_list(db: Session, repository_url: str, progress: Optional[Job] = None,
+                        job_id: Optional[str] = None,
+                        cancelled: Optional[threading.Event] = None) -> AwesomeList:
     """
     Import an awesome list from GitHub by directly accessing the README.md file.
+
+    Args:
+        db: Database session
+        repository_url: URL of the awesome list's GitHub repository
+        progress: Background job to report fetched, parsed and inserted projects to
+        job_id: Background job row to record the new list's ID on, in the
+            transaction that creates the list
+        cancelled: Set to stop the import between categories and projects
+
+    Raises:
+        ImportCancelled: When `cancelled` was set; inserts already queued are
+            committed first, so nothing is written after this returns
     """
     try:
         print(f"Starting import from: {repository_url}")
@@ -145,13 +220,13 @@ def import_awesome_list(db: Session, repository_url: str) -> AwesomeList:
         print(f"Trying to fetch README from: {readme_url}")
 
         # Get README content via HTTP request
-        response = httpx.get(readme_url)
+        response = sync_request("GET", readme_url)
         if response.status_code != 200:
             print(f"Failed to fetch from master branch with status: {response.status_code}")
             # Try with 'main' branch if 'master' doesn't work
             readme_url = f"https://raw.githubusercontent.com/{owner}/{repo}/main/README.md"
             print(f"Trying alternate branch: {readme_url}")
-            response = httpx.get(readme_url)
+            response = sync_request("GET", readme_url)
 
             if response.status_code != 200:
                 error_msg = f"README not found at {repository_url}. Status code: {response.status_code}"
@@ -160,6 +235,8 @@ def import_awesome_list(db: Session, repository_url: str) -> AwesomeList:
 
         readme_content = response.text
         print(f"Successfully fetched README. Content length: {len(readme_content)}")
+        if progress:
+            progress.emit(FETCHED, url=readme_url, bytes=len(readme_content))
 
         # Parse the README content
         print("Parsing README content")
@@ -180,102 +257,147 @@ def import_awesome_list(db: Session, repository_url: str) -> AwesomeList:
             for idx, cat in enumerate(parsed_data.get('categories', [])):
                 print(f"Category {idx+1}: {cat.get('name')} - Subcategories: {len(cat.get('subcategories', []))} - Projects: {len(cat.get('projects', []))}")
 
-        # Create awesome list in database
+        if progress:
+            project_count = sum(
+                len(cat.get("projects", [])) + sum(len(sub.get("projects", [])) for sub in cat.get("subcategories", []))
+                for cat in parsed_data["categories"]
+            )
+            progress.set_total(project_count)
+            progress.emit(PARSED, categories=len(parsed_data["categories"]), projects=project_count)
+
+        # Create awesome list in database. Import writes go through the write
+        # queue so the many small inserts share commits with other writers.
         print("Creating awesome list in database")
-        db_awesome_list = AwesomeList(
-            title=parsed_data["title"] or "Untitled Awesome List",
-            description=parsed_data["description"] or f"Imported from {repository_url}",
-            repository_url=str(repository_url),
-        )
-        db.add(db_awesome_list)
-        db.commit()
-        db.refresh(db_awesome_list)
+        write_queue = get_write_queue()
+
+        def add_awesome_list(session: Session) -> AwesomeList:
+            db_awesome_list = AwesomeList(
+                title=parsed_data["title"] or "Untitled Awesome List",
+                description=parsed_data["description"] or f"Imported from {repository_url}",
+                repository_url=str(repository_url),
+            )
+            session.add(db_awesome_list)
+            session.flush()
+            session.refresh(db_awesome_list)
+            if job_id is not None:
+                # Lets a retry of the job find the list this attempt started
+                session.execute(
+                    update(BackgroundJob)
+                    .where(BackgroundJob.id == job_id)
+                    .values(result={"list_id": db_awesome_list.id})
+                    .execution_options(synchronize_session=False)
+                )
+            return db_awesome_list
+
+        db_awesome_list = write_queue.run(add_awesome_list)
         print(f"Created awesome list with ID: {db_awesome_list.id}")
 
-        # Import categories and projects
+        # Import categories and projects. With sharded storage they go to
+        # the new list's own file, through that file's write queue.
         print("Importing categories and projects")
-        from app.services.category_service import create_category_from_import
-        from app.services.project_service import create_project_from_import
+        write_queue = get_write_queue(list_id=db_awesome_list.id)
+        from app.services.category_service import add_category_from_import
+        from app.services.project_service import add_project_from_import
 
         # Ensure we have at least one category
         if not parsed_data["categories"]:
             print("No categories found, creating a default category")
-            default_category = create_category_from_import(
-                db=db,
+            default_category = write_queue.run(partial(
+                add_category_from_import,
                 list_id=db_awesome_list.id,
                 name="Uncategorized",
                 parent_id=None
-            )
+            ))
             print(f"Created default category with ID: {default_category.id}")
             return db_awesome_list
 
+        # Category IDs are needed right away, project inserts are only awaited at the end
+        pending_projects = []
+
+        def stop_if_cancelled() -> None:
+            if cancelled is not None and cancelled.is_set():
+                wait(pending_projects)
+                raise ImportCancelled(f"Import of {repository_url} was cancelled")
+
         for category_idx, category_data in enumerate(parsed_data["categories"]):
+            stop_if_cancelled()
             # Create category
             try:
                 category_name = category_data.get("name", f"Category {category_idx+1}")
                 print(f"Creating category: {category_name}")
-                db_category = create_category_from_import(
-                    db=db,
+                db_category = write_queue.run(partial(
+                    add_category_from_import,
                     list_id=db_awesome_list.id,
                     name=category_name,
                     parent_id=None
-                )
+                ))
                 print(f"Created category with ID: {db_category.id}")
 
                 # Create subcategories if any
                 for subcategory_idx, subcategory_data in enumerate(category_data.get("subcategories", [])):
+                    stop_if_cancelled()
                     try:
                         subcategory_name = subcategory_data.get("name", f"Subcategory {subcategory_idx+1}")
                         print(f"Creating subcategory: {subcategory_name} under {category_name}")
-                        db_subcategory = create_category_from_import(
-                            db=db,
+                        db_subcategory = write_queue.run(partial(
+                            add_category_from_import,
                             list_id=db_awesome_list.id,
                             name=subcategory_name,
                             parent_id=db_category.id
-                        )
+                        ))
                         print(f"Created subcategory with ID: {db_subcategory.id}")
 
                         # Create projects in subcategory
                         for project_idx, project_data in enumerate(subcategory_data.get("projects", [])):
-                            try:
-                                print(f"Creating project in subcategory: {project_data.get('title', f'Project {project_idx+1}')}")
-                                create_project_from_import(
-                                    db=db,
-                                    list_id=db_awesome_list.id,
-                                    category_id=db_subcategory.id,
-                                    title=project_data.get("title", f"Project {project_idx+1}"),
-                                    url=project_data.get("url", ""),
-                                    description=project_data.get("description", "")
-                                )
-                            except Exception as e:
-                                print(f"Error creating project in subcategory: {str(e)}")
-                                # Continue with next project
+                            pending_projects.append(write_queue.submit(partial(
+                                add_project_from_import,
+                                list_id=db_awesome_list.id,
+                                category_id=db_subcategory.id,
+                                title=project_data.get("title", f"Project {project_idx+1}"),
+                                url=project_data.get("url", ""),
+                                description=project_data.get("description", "")
+                            )))
+                    except ImportCancelled:
+                        raise
                     except Exception as e:
                         print(f"Error creating subcategory: {str(e)}")
                         # Continue with next subcategory
 
                 # Create projects directly in the category
                 for project_idx, project_data in enumerate(category_data.get("projects", [])):
-                    try:
-                        print(f"Creating project in category: {project_data.get('title', f'Project {project_idx+1}')}")
-                        create_project_from_import(
-                            db=db,
-                            list_id=db_awesome_list.id,
-                            category_id=db_category.id,
-                            title=project_data.get("title", f"Project {project_idx+1}"),
-                            url=project_data.get("url", ""),
-                            description=project_data.get("description", "")
-                        )
-                    except Exception as e:
-                        print(f"Error creating project in category: {str(e)}")
-                        # Continue with next project
+                    pending_projects.append(write_queue.submit(partial(
+                        add_project_from_import,
+                        list_id=db_awesome_list.id,
+                        category_id=db_category.id,
+                        title=project_data.get("title", f"Project {project_idx+1}"),
+                        url=project_data.get("url", ""),
+                        description=project_data.get("description", "")
+                    )))
+            except ImportCancelled:
+                raise
             except Exception as e:
                 print(f"Error creating category: {str(e)}")
                 # Continue with next category
 
+        # Wait for the queued project inserts to be committed
+        print(f"Waiting for {len(pending_projects)} queued projects to be committed")
+        for future in pending_projects:
+            try:
+                future.result()
+                if progress:
+                    progress.emit(INSERTED)
+            except Exception as e:
+                print(f"Error creating project: {str(e)}")
+                if progress:
+                    progress.emit(FAILED, error=str(e))
+                # Continue with next project
+
         print(f"Import completed successfully for awesome list ID: {db_awesome_list.id}")
         return db_awesome_list
 
+    except ImportCancelled:
+        print(f"Import of {repository_url} stopped: cancelled")
+        raise
     except Exception as e:
         db.rollback()
         import traceback
@@ -305,7 +427,7 @@ def export_awesome_list(db: Session, list_id: int) -> str:
         # Push to GitHub if we have a valid token
         try:
             # Check if Github is available
-            if 'Github' not in globals():
+            if not GITHUB_AVAILABLE:
                 print("Github module not available, skipping GitHub operations")
                 return readme_content
 
@@ -315,7 +437,7 @@ def export_awesome_list(db: Session, list_id: int) -> str:
             if not settings.GITHUB_ACCESS_TOKEN:
                 raise ValueError("GitHub access token not provided. Cannot push to repository.")
 
-            g = Github(settings.GITHUB_ACCESS_TOKEN)
+            g = get_github_client(settings.GITHUB_ACCESS_TOKEN)
             repository = g.get_repo(f"{owner}/{repo}")
 
             # Get README file if it exists
@@ -344,3 +466,38 @@ def export_awesome_list(db: Session, list_id: int) -> str:
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Export failed: {str(e)}")
+
+
+def _delete_earlier_attempt(db: Session, job_id: str) -> None:
+    job = db.get(BackgroundJob, job_id)
+    list_id = (job.result or {}).get("list_id") if job is not None else None
+    if list_id is not None and db.get(AwesomeList, list_id) is not None:
+        print(f"Deleting awesome list {list_id} left by an earlier attempt of job {job_id}")
+        delete_awesome_list(db, list_id)
+
+
+def import_awesome_list_job(progress: Job, repository_url: str,
+                            cancelled: Optional[threading.Event] = None) -> dict:
+    """
+    Import an awesome list for a background job, reporting progress to the job.
+
+    Runs in a worker thread; it opens its own session. Retrying the job is
+    safe: a list left behind by an earlier attempt that crashed or lost its
+    lease is deleted before the import starts again. An attempt that is
+    stopped through `cancelled` writes nothing more once it raises
+    ImportCancelled, so it never overlaps its retry.
+
+    Returns:
+        The imported list, as returned by the import endpoint
+    """
+    db = SessionLocal()
+    try:
+        _delete_earlier_attempt(db, progress.id)
+        awesome_list = import_awesome_list(db, repository_url, progress=progress, job_id=progress.id,
+                                           cancelled=cancelled)
+        return AwesomeListSchema.model_validate(awesome_list, from_attributes=True).model_dump(mode="json")
+    except HTTPException as e:
+        # Jobs report the message, not the HTTP error
+        raise RuntimeError(str(e.detail)) from e
+    finally:
+        db.close()
@@ -1,8 +1,10 @@
 from typing import List, Optional, Any
+from sqlalchemy import delete
 from sqlalchemy.orm import Session
 
 from app.models.category import Category
 from app.schemas.category import CategoryCreate, CategoryUpdate
+from app.utils.category_index import LIST_ID_OPTION
 
 
 def get_categories(
@@ -52,11 +54,11 @@ def create_category(db: Session, category_in: CategoryCreate) -> Category:
     return db_category
 
 
-def create_category_from_import(
+def add_category_from_import(
     db: Session, list_id: int, name: str, parent_id: Optional[int]
 ) -> Category:
     """
-    Create a new category during import process.
+    Add a category during import and flush it to assign its ID, without committing.
     """
     db_category = Category(
         list_id=list_id,
@@ -64,6 +66,17 @@ def create_category_from_import(
         parent_category_id=parent_id,
     )
     db.add(db_category)
+    db.flush()
+    return db_category
+
+
+def create_category_from_import(
+    db: Session, list_id: int, name: str, parent_id: Optional[int]
+) -> Category:
+    """
+    Create a new category during import process.
+    """
+    db_category = add_category_from_import(db, list_id=list_id, name=name, parent_id=parent_id)
     db.commit()
     db.refresh(db_category)
     return db_category
@@ -88,9 +101,17 @@ def update_category(
 def delete_category(db: Session, category_id: int) -> None:
     """
     Delete a category.
+
+    Subcategories and projects are removed by ON DELETE CASCADE in the database.
     """
-    db_category = db.query(Category).filter(Category.id == category_id).first()
-    db.delete(db_category)
+    category = db.get(Category, category_id)
+    if category is None:
+        return
+    # Only this list's cached category models are invalidated
+    db.execute(
+        delete(Category).where(Category.id == category_id)
+        .execution_options(**{LIST_ID_OPTION: category.list_id})
+    )
     db.commit()
 
 
@@ -2,10 +2,10 @@ from typing import Dict, Any, List
 import os
 import tempfile
 import subprocess
-from github import Github
 from github.GithubException import GithubException
 
 from app.core.config import settings
+from app.utils.http_client import get_github_client
 
 
 def validate_repository(owner: str, repo: str) -> Dict[str, Any]:
@@ -13,7 +13,7 @@ def validate_repository(owner: str, repo: str) -> Dict[str, Any]:
     Validate if a GitHub repository exists and can be accessed.
     """
     try:
-        g = Github(settings.GITHUB_ACCESS_TOKEN) if settings.GITHUB_ACCESS_TOKEN else Github()
+        g = get_github_client(settings.GITHUB_ACCESS_TOKEN)
         repository = g.get_repo(f"{owner}/{repo}")
         
         return {
@@ -0,0 +1,76 @@
+"""
+Handlers of the background job kinds.
+
+Importing this module registers them with the job queue; the API process and
+`worker.py` both do so before running a worker.
+"""
+import asyncio
+import threading
+from typing import Any, Dict, List
+
+from app.db.session import AsyncSessionLocal
+from app.services.ai_categorization_service import AICategorization
+from app.services.awesome_list_service import import_awesome_list_job
+from app.services.github_service import check_links
+from app.services.job_progress import CATEGORIZED, FETCHED, INSERTED, Job
+from app.services.job_queue import job_handler
+from app.services.url_characterization import characterize_batch
+from app.utils.site_metadata import get_category_suggester_async
+
+IMPORT_JOB = "import"
+BATCH_CHARACTERIZE_JOB = "batch-characterize"
+AI_BATCH_CATEGORIZE_JOB = "ai-batch-categorize"
+CHECK_LINKS_JOB = "check-links"
+
+
+@job_handler(IMPORT_JOB, INSERTED)
+async def run_import(progress: Job, payload: Dict[str, Any]) -> Dict[str, Any]:
+    # The import is synchronous; keep it off the event loop
+    cancelled = threading.Event()
+    attempt = asyncio.ensure_future(
+        asyncio.to_thread(import_awesome_list_job, progress, payload["repository_url"], cancelled)
+    )
+    try:
+        return await asyncio.shield(attempt)
+    except asyncio.CancelledError:
+        # Lost lease or worker stop: the thread would keep writing. Stop it and
+        # wait, so the job is released (and retried) only once it has stopped.
+        cancelled.set()
+        await asyncio.wait([attempt])
+        # Retrieve the outcome (ImportCancelled), so it is not logged as unhandled
+        attempt.exception()
+        raise
+
+
+@job_handler(BATCH_CHARACTERIZE_JOB, CATEGORIZED)
+async def run_batch_characterize(progress: Job, payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    async with AsyncSessionLocal() as db:
+        suggester = await get_category_suggester_async(db, payload["list_id"])
+    return await characterize_batch(
+        payload["urls"], payload.get("refresh", False), suggester, progress, payload.get("budget_seconds")
+    )
+
+
+@job_handler(AI_BATCH_CATEGORIZE_JOB, CATEGORIZED)
+async def run_ai_batch_categorize(progress: Job, payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    async with AsyncSessionLocal() as db:
+        service = AICategorization(db)
+        # Loaded once; the concurrent URL tasks do not touch the session
+        context = await service.get_context(payload["list_id"])
+        return await service.process_batch_urls(
+            payload["urls"],
+            payload["list_id"],
+            payload.get("use_ollama", False),
+            payload.get("refresh", False),
+            context=context,
+            progress=progress,
+            budget_seconds=payload.get("budget_seconds"),
+        )
+
+
+@job_handler(CHECK_LINKS_JOB, FETCHED)
+async def run_check_links(progress: Job, payload: Dict[str, Any]) -> Dict[str, Any]:
+    # Clones the repository and runs awesome_bot; both block
+    result = await asyncio.to_thread(check_links, payload["owner"], payload["repo"])
+    progress.emit(FETCHED, url=f"https://github.com/{payload['owner']}/{payload['repo']}")
+    return result
@@ -0,0 +1,306 @@
+"""
+Progress tracking for long-running jobs (imports and batch categorizations).
+
+The worker running a job (see job_queue) records structured progress events
+as it goes. Clients follow a job over Server-Sent Events; each event carries
+an increasing ID, so a client that disconnects can reattach with Last-Event-ID
+and continue where it left off while the job keeps running. Finished jobs are
+kept in memory for JOB_RETENTION_SECONDS.
+
+Events may be emitted from worker threads (imports are synchronous), so every
+job is guarded by a lock and wakes its subscribers on their own event loops.
+"""
+import asyncio
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+# Item stages reported by jobs
+FETCHED = "fetched"
+PARSED = "parsed"
+CATEGORIZED = "categorized"
+INSERTED = "inserted"
+FAILED = "failed"
+# Left undone when the job's time budget ran out
+NOT_ATTEMPTED = "not_attempted"
+STAGES = (FETCHED, PARSED, CATEGORIZED, INSERTED, FAILED, NOT_ATTEMPTED)
+
+# Event sent when a job's status changes
+STATUS_EVENT = "status"
+# Event sent first on reattach when the events since Last-Event-ID were dropped
+SNAPSHOT_EVENT = "snapshot"
+
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+ERROR = "error"
+FINISHED_STATUSES = (SUCCEEDED, ERROR)
+
+
+class Job:
+    """
+    One background job and its progress.
+
+    Attributes:
+        id: Job ID handed to the client
+        kind: What the job does, e.g. "import"
+        total: Items to process, once known
+        final_stage: Stage that completes an item; "failed" and "not_attempted" complete it too
+        counts: Stage -> items that reached it
+        status: pending, running, succeeded or error
+        result: Job output once succeeded
+        error: Failure message once errored
+    """
+
+    def __init__(self, kind: str, final_stage: str, total: Optional[int] = None, job_id: Optional[str] = None):
+        self.id = job_id or uuid.uuid4().hex
+        self.kind = kind
+        self.final_stage = final_stage
+        self.total = total
+        self.counts = {stage: 0 for stage in STAGES}
+        self.status = PENDING
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._events: deque = deque(maxlen=settings.JOB_EVENT_HISTORY)
+        self._last_event_id = 0
+        self._subscribers: List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    def _completed(self) -> int:
+        return self.counts[self.final_stage] + self.counts[FAILED] + self.counts[NOT_ATTEMPTED]
+
+    def _eta_seconds(self) -> Optional[float]:
+        # Time left at the average rate so far
+        completed = self._completed()
+        if self.finished:
+            return 0.0
+        if not self.total or not completed or self.started_at is None:
+            return None
+        elapsed = time.time() - self.started_at
+        return round(elapsed / completed * max(self.total - completed, 0), 1)
+
+    def _progress(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "total": self.total,
+            "completed": self._completed(),
+            "counts": dict(self.counts),
+            "eta_seconds": self._eta_seconds(),
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Current progress of the job, with its result or error once finished.
+        """
+        with self._lock:
+            data = self._progress()
+            data["created_at"] = self.created_at
+            data["started_at"] = self.started_at
+            data["finished_at"] = self.finished_at
+            data["last_event_id"] = self._last_event_id
+            if self.finished:
+                data["result"] = self.result
+                data["error"] = self.error
+            return data
+
+    def _record(self, event: str, detail: Dict[str, Any]) -> None:
+        # Called with the lock held
+        self._last_event_id += 1
+        data = self._progress()
+        data.update(detail)
+        self._events.append((self._last_event_id, event, data))
+        for loop, wake in self._subscribers:
+            try:
+                loop.call_soon_threadsafe(wake.set)
+            except RuntimeError:
+                # The subscriber's loop is closed; it unsubscribes when cancelled
+                pass
+
+    def set_total(self, total: int) -> None:
+        with self._lock:
+            self.total = total
+
+    def emit(self, stage: str, count: int = 1, **detail: Any) -> None:
+        """
+        Record that `count` items reached a stage.
+
+        Args:
+            stage: One of STAGES
+            count: Items that reached it
+            detail: Extra event fields, e.g. the item's URL
+        """
+        with self._lock:
+            self.counts[stage] += count
+            self._record(stage, detail)
+
+    def progress_state(self) -> Tuple[int, Dict[str, Any]]:
+        """
+        ID of the latest event and the progress as of that event, for persisting.
+        """
+        with self._lock:
+            return self._last_event_id, self._progress()
+
+    def start(self, attempt: int = 1) -> None:
+        with self._lock:
+            # A retried job starts counting from scratch
+            self.counts = {stage: 0 for stage in STAGES}
+            self.status = RUNNING
+            self.started_at = time.time()
+            self._record(STATUS_EVENT, {"attempt": attempt})
+
+    def retry(self, error: str, retry_in: float) -> None:
+        """
+        Mark a failed attempt that will be retried after retry_in seconds.
+        """
+        with self._lock:
+            self.status = PENDING
+            self._record(STATUS_EVENT, {"error": error, "retry_in_seconds": round(retry_in, 1)})
+
+    def succeed(self, result: Any = None) -> None:
+        with self._lock:
+            self.status = SUCCEEDED
+            self.result = result
+            self.finished_at = time.time()
+            self._record(STATUS_EVENT, {})
+
+    def fail(self, error: str) -> None:
+        with self._lock:
+            self.status = ERROR
+            self.error = error
+            self.finished_at = time.time()
+            self._record(STATUS_EVENT, {"error": error})
+
+    def events_after(self, last_event_id: int) -> Tuple[bool, List[Tuple[int, str, Dict[str, Any]]]]:
+        """
+        Buffered events newer than last_event_id.
+
+        Returns:
+            (whether events in between were dropped from the buffer, events)
+        """
+        with self._lock:
+            events = [event for event in self._events if event[0] > last_event_id]
+            first_kept = self._events[0][0] if self._events else self._last_event_id + 1
+            return first_kept > last_event_id + 1, events
+
+    def subscribe(self, wake: asyncio.Event) -> None:
+        with self._lock:
+            self._subscribers.append((asyncio.get_running_loop(), wake))
+
+    def unsubscribe(self, wake: asyncio.Event) -> None:
+        with self._lock:
+            self._subscribers = [(loop, event) for loop, event in self._subscribers if event is not wake]
+
+
+_jobs: Dict[str, Job] = {}
+_jobs_lock = threading.Lock()
+
+
+def _prune_jobs() -> None:
+    # Called with _jobs_lock held
+    cutoff = time.time() - settings.JOB_RETENTION_SECONDS
+    for job_id in [job_id for job_id, job in _jobs.items() if job.finished and job.finished_at < cutoff]:
+        del _jobs[job_id]
+
+
+def create_job(kind: str, final_stage: str, total: Optional[int] = None, job_id: Optional[str] = None) -> Job:
+    """
+    Register a job's progress, or get it when job_id is already registered.
+
+    Args:
+        kind: What the job does
+        final_stage: Stage that completes an item
+        total: Items to process, if already known
+        job_id: ID of a queued job (a new one is generated otherwise)
+
+    Returns:
+        The job's progress
+    """
+    with _jobs_lock:
+        _prune_jobs()
+        if job_id in _jobs:
+            return _jobs[job_id]
+        job = Job(kind, final_stage, total, job_id)
+        _jobs[job.id] = job
+    return job
+
+
+def get_job(job_id: str) -> Optional[Job]:
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+
+def job_reference(job: Any) -> Dict[str, Any]:
+    """
+    Response body for a request that queued a job: its ID and where to follow it.
+
+    Args:
+        job: A Job or a queued BackgroundJob
+    """
+    job_url = f"{settings.API_V1_STR}/jobs/{job.id}"
+    return {
+        "job_id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "status_url": job_url,
+        "events_url": f"{job_url}/events",
+    }
+
+
+def sse_message(event_id: Optional[Any], event: str, data: Dict[str, Any]) -> str:
+    lines = [] if event_id is None else [f"id: {event_id}"]
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def job_event_stream(job: Job, last_event_id: int = 0) -> AsyncIterator[str]:
+    """
+    Server-Sent Events for a job: buffered events after last_event_id, then
+    live ones until the job finishes.
+
+    A comment line is sent every JOB_KEEPALIVE_SECONDS without events, so
+    proxies do not close an idle stream.
+
+    Args:
+        job: The job to follow
+        last_event_id: ID of the last event the client has seen
+
+    Yields:
+        SSE messages
+    """
+    wake = asyncio.Event()
+    job.subscribe(wake)
+    try:
+        while True:
+            wake.clear()
+            dropped, events = job.events_after(last_event_id)
+            if dropped:
+                # The client missed events that are no longer buffered
+                yield sse_message(None, SNAPSHOT_EVENT, job.snapshot())
+            for event_id, event, data in events:
+                yield sse_message(event_id, event, data)
+                last_event_id = event_id
+            if not events and (job.finished or (job.status == PENDING and job.started_at is not None)):
+                # Finished, or waiting for a retry that may run in another process
+                return
+            if not events:
+                try:
+                    await asyncio.wait_for(wake.wait(), settings.JOB_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+    finally:
+        job.unsubscribe(wake)
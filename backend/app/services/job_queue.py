@@ -0,0 +1,570 @@
+"""
+Durable background job queue.
+
+Jobs are rows in the backgroundjob table, so queued work survives restarts and
+can be consumed by several worker processes (`python worker.py`) as well as by
+the API process itself when JOB_WORKER_IN_PROCESS is set. A worker claims a
+job by taking a lease on it and renews the lease while the job runs; when a
+worker dies its leases expire and other workers claim those jobs again.
+
+On PostgreSQL the claim selects with FOR UPDATE SKIP LOCKED, so workers never
+wait on each other's candidates. SQLite has a single writer and ignores the
+locking clause; there the claiming UPDATE re-checks that the job is still
+claimable, so only one worker wins it. All queue writes go through run_write,
+so on SQLite they share the writer connection with the rest of the process.
+
+A failed attempt is retried after JOB_RETRY_BASE_SECONDS * 2^(attempt - 1),
+capped at JOB_RETRY_MAX_SECONDS, until the job has had JOB_MAX_ATTEMPTS.
+"""
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, delete, or_, select, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal, run_write
+from app.models.background_job import BackgroundJob
+from app.services.job_progress import (
+    ERROR,
+    FINISHED_STATUSES,
+    PENDING,
+    RUNNING,
+    STAGES,
+    STATUS_EVENT,
+    SUCCEEDED,
+    Job,
+    create_job,
+    get_job,
+    job_event_stream,
+    sse_message,
+)
+
+logger = logging.getLogger(__name__)
+
+# Event sent by streams that follow a job run by another process
+PROGRESS_EVENT = "progress"
+
+# IDs of events polled from a job's row, apart from live event IDs
+ROW_EVENT_ID_PREFIX = "row-"
+
+# Progress fields persisted with the job
+PROGRESS_FIELDS = ("total", "completed", "counts", "eta_seconds")
+
+JobHandler = Callable[[Job, Dict[str, Any]], Awaitable[Any]]
+
+# Job kind -> (handler, stage that completes an item)
+_handlers: Dict[str, Tuple[JobHandler, str]] = {}
+
+# Workers running in this process, woken when a job is enqueued here
+_local_workers: List["JobWorker"] = []
+
+
+def job_handler(kind: str, final_stage: str) -> Callable[[JobHandler], JobHandler]:
+    """
+    Register the coroutine that runs jobs of a kind.
+
+    The handler gets the job's progress and payload, reports progress as it
+    goes and returns the job's JSON-serializable result; raising fails the attempt.
+    """
+    def register(function: JobHandler) -> JobHandler:
+        _handlers[kind] = (function, final_stage)
+        return function
+    return register
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _timestamp(value: Optional[datetime]) -> Optional[float]:
+    if value is None:
+        return None
+    # SQLite hands back naive datetimes; they were stored as UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def retry_delay_seconds(attempts: int) -> float:
+    """
+    Backoff before the next attempt of a job that has failed `attempts` times.
+    """
+    return min(settings.JOB_RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0), settings.JOB_RETRY_MAX_SECONDS)
+
+
+def _new_job(kind: str, payload: Dict[str, Any], total: Optional[int]) -> BackgroundJob:
+    now = _now()
+    return BackgroundJob(
+        id=uuid.uuid4().hex,
+        kind=kind,
+        payload=payload,
+        status=PENDING,
+        attempts=0,
+        max_attempts=settings.JOB_MAX_ATTEMPTS,
+        run_at=now,
+        progress={"total": total, "completed": 0, "counts": {stage: 0 for stage in STAGES}, "eta_seconds": None},
+        created_at=now,
+    )
+
+
+def _notify_local_workers() -> None:
+    for worker in list(_local_workers):
+        worker.notify()
+
+
+def enqueue_job(db: Session, kind: str, payload: Dict[str, Any], total: Optional[int] = None) -> BackgroundJob:
+    """
+    Queue a job.
+
+    Args:
+        db: Database session; it is committed
+        kind: Job kind, as registered with job_handler
+        payload: JSON-serializable arguments of the handler
+        total: Items the job will process, if known
+
+    Returns:
+        The queued job
+    """
+    job = _new_job(kind, payload, total)
+    db.add(job)
+    db.commit()
+    _notify_local_workers()
+    return job
+
+
+async def enqueue_job_async(kind: str, payload: Dict[str, Any], total: Optional[int] = None) -> BackgroundJob:
+    """
+    Async variant of enqueue_job for use inside async handlers.
+    """
+    def add_job(session: Session) -> BackgroundJob:
+        job = _new_job(kind, payload, total)
+        session.add(job)
+        session.flush()
+        return job
+
+    job = await run_write(add_job)
+    _notify_local_workers()
+    return job
+
+
+def _claimable(now: datetime):
+    return or_(
+        and_(BackgroundJob.status == PENDING, BackgroundJob.run_at <= now),
+        # The worker running it stopped renewing its lease
+        and_(
+            BackgroundJob.status == RUNNING,
+            BackgroundJob.lease_expires_at < now,
+            BackgroundJob.attempts < BackgroundJob.max_attempts,
+        ),
+    )
+
+
+def next_job_query(now: datetime):
+    """
+    The job a worker should claim next: the longest due one.
+    """
+    return (
+        select(BackgroundJob)
+        .where(_claimable(now))
+        .order_by(BackgroundJob.run_at)
+        .limit(1)
+        # PostgreSQL skips jobs other workers are claiming; SQLite ignores this
+        .with_for_update(skip_locked=True)
+    )
+
+
+class ClaimedJob:
+    """
+    A job leased by a worker.
+    """
+
+    def __init__(self, job: BackgroundJob):
+        self.id = job.id
+        self.kind = job.kind
+        self.payload = job.payload
+        self.attempts = job.attempts + 1
+        self.max_attempts = job.max_attempts
+        self.total = (job.progress or {}).get("total")
+
+
+def _claim_next(worker_id: str, now: datetime, session: Session) -> Tuple[Optional[ClaimedJob], bool]:
+    # The due job, and whether this worker's claim on it won
+    job = session.execute(next_job_query(now)).scalar_one_or_none()
+    if job is None:
+        return None, False
+    claimed = ClaimedJob(job)
+    result = session.execute(
+        update(BackgroundJob)
+        .where(BackgroundJob.id == job.id, _claimable(now))
+        .values(
+            status=RUNNING,
+            lease_owner=worker_id,
+            lease_expires_at=now + timedelta(seconds=settings.JOB_LEASE_SECONDS),
+            attempts=BackgroundJob.attempts + 1,
+            started_at=now,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return claimed, result.rowcount == 1
+
+
+async def claim_job(worker_id: str) -> Optional[ClaimedJob]:
+    """
+    Lease the next due job for a worker.
+
+    Args:
+        worker_id: Lease owner
+
+    Returns:
+        The claimed job, or None when nothing is due
+    """
+    for _ in range(3):
+        now = _now()
+        try:
+            claimed, won = await run_write(partial(_claim_next, worker_id, now))
+            if claimed is None:
+                return None
+            if won:
+                return claimed
+            # Another worker claimed it first; look for the next one
+        except OperationalError as e:
+            # SQLite reports a claim racing another process's write as locked
+            logger.warning(f"Claiming a job failed, retrying: {str(e)}")
+    return None
+
+
+def _persisted_progress(progress: Job) -> Dict[str, Any]:
+    _, state = progress.progress_state()
+    return {field: state[field] for field in PROGRESS_FIELDS}
+
+
+async def _update_leased(job_id: str, worker_id: str, **values: Any) -> bool:
+    # Only the lease owner may update a running job
+    def update_job(session: Session) -> bool:
+        result = session.execute(
+            update(BackgroundJob)
+            .where(
+                BackgroundJob.id == job_id,
+                BackgroundJob.lease_owner == worker_id,
+                BackgroundJob.status == RUNNING,
+            )
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+    return await run_write(update_job)
+
+
+async def renew_lease(job_id: str, worker_id: str, progress: Optional[Job] = None) -> bool:
+    """
+    Extend a job's lease, saving its progress when given.
+
+    Returns:
+        False when the worker no longer holds the lease
+    """
+    values: Dict[str, Any] = {"lease_expires_at": _now() + timedelta(seconds=settings.JOB_LEASE_SECONDS)}
+    if progress is not None:
+        values["progress"] = _persisted_progress(progress)
+        values["progress_seq"] = BackgroundJob.progress_seq + 1
+    return await _update_leased(job_id, worker_id, **values)
+
+
+async def complete_job(job_id: str, worker_id: str, result: Any, progress: Job) -> bool:
+    """
+    Store a job's result and mark it succeeded.
+    """
+    return await _update_leased(
+        job_id, worker_id,
+        status=SUCCEEDED,
+        result=result,
+        error=None,
+        progress=_persisted_progress(progress),
+        progress_seq=BackgroundJob.progress_seq + 1,
+        lease_owner=None,
+        lease_expires_at=None,
+        finished_at=_now(),
+    )
+
+
+async def fail_job(claimed: ClaimedJob, worker_id: str, error: str, progress: Optional[Job] = None,
+                   retry: bool = True) -> Optional[float]:
+    """
+    Record a failed attempt, queueing a retry unless attempts are used up.
+
+    Returns:
+        Seconds until the retry, or None when the job has failed for good
+    """
+    values: Dict[str, Any] = {
+        "error": error,
+        "lease_owner": None,
+        "lease_expires_at": None,
+        "progress_seq": BackgroundJob.progress_seq + 1,
+    }
+    if progress is not None:
+        values["progress"] = _persisted_progress(progress)
+    delay = None
+    if retry and claimed.attempts < claimed.max_attempts:
+        delay = retry_delay_seconds(claimed.attempts)
+        values.update(status=PENDING, run_at=_now() + timedelta(seconds=delay))
+    else:
+        values.update(status=ERROR, finished_at=_now())
+    await _update_leased(claimed.id, worker_id, **values)
+    return delay
+
+
+async def release_job(claimed: ClaimedJob, worker_id: str) -> None:
+    """
+    Hand a job back to the queue without counting the attempt (worker shutdown).
+    """
+    await _update_leased(
+        claimed.id, worker_id,
+        status=PENDING,
+        attempts=BackgroundJob.attempts - 1,
+        run_at=_now(),
+        lease_owner=None,
+        lease_expires_at=None,
+        progress_seq=BackgroundJob.progress_seq + 1,
+    )
+
+
+async def reap_jobs() -> None:
+    """
+    Fail jobs whose last attempt's lease expired and drop old finished jobs.
+    """
+    now = _now()
+
+    def reap(session: Session) -> None:
+        session.execute(
+            update(BackgroundJob)
+            .where(
+                BackgroundJob.status == RUNNING,
+                BackgroundJob.lease_expires_at < now,
+                BackgroundJob.attempts >= BackgroundJob.max_attempts,
+            )
+            .values(
+                status=ERROR,
+                error="The worker running the job's last attempt stopped responding",
+                lease_owner=None,
+                lease_expires_at=None,
+                progress_seq=BackgroundJob.progress_seq + 1,
+                finished_at=now,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        session.execute(
+            delete(BackgroundJob)
+            .where(
+                BackgroundJob.status.in_(FINISHED_STATUSES),
+                BackgroundJob.finished_at < now - timedelta(seconds=settings.JOB_RETENTION_SECONDS),
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    await run_write(reap)
+
+
+async def get_job_row(job_id: str) -> Optional[BackgroundJob]:
+    async with AsyncSessionLocal() as db:
+        return await db.get(BackgroundJob, job_id)
+
+
+def job_row_snapshot(job: BackgroundJob) -> Dict[str, Any]:
+    """
+    A queued job's state, in the shape of Job.snapshot.
+    """
+    progress = job.progress or {}
+    data = {
+        "job_id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "attempts": job.attempts,
+        "total": progress.get("total"),
+        "completed": progress.get("completed", 0),
+        "counts": progress.get("counts", {stage: 0 for stage in STAGES}),
+        "eta_seconds": 0.0 if job.status in FINISHED_STATUSES else progress.get("eta_seconds"),
+        "created_at": _timestamp(job.created_at),
+        "started_at": _timestamp(job.started_at),
+        "finished_at": _timestamp(job.finished_at),
+        "last_event_id": job.progress_seq,
+    }
+    if job.status in FINISHED_STATUSES:
+        data["result"] = job.result
+        data["error"] = job.error
+    elif job.error:
+        # The last failed attempt, while a retry is pending
+        data["error"] = job.error
+    return data
+
+
+async def follow_job_events(job_id: str, last_event_id: int = 0) -> AsyncIterator[str]:
+    """
+    Server-Sent Events for a queued job, until it finishes.
+
+    While a worker in this process runs the job, its live events are streamed
+    (see job_event_stream), resuming after last_event_id. Otherwise the job's
+    row is polled: its current state is sent first, then again whenever the
+    worker saves progress, as "progress" events ("status" when the status
+    changed). Their IDs start with "row-", so a client reconnecting with one
+    starts from the current state.
+
+    Args:
+        job_id: The job to follow
+        last_event_id: ID of the last live event the client has seen
+    """
+    last_seq = None
+    last_status = None
+    local_seen = last_event_id
+    idle_since = time.monotonic()
+    while True:
+        local = get_job(job_id)
+        if local is not None and local.status != PENDING:
+            async for message in job_event_stream(local, local_seen):
+                yield message
+            if local.finished:
+                return
+            # A retry is pending; a later attempt here continues after these events
+            local_seen, _ = local.progress_state()
+        job = await get_job_row(job_id)
+        if job is None:
+            return
+        if job.progress_seq != last_seq:
+            event = STATUS_EVENT if last_status is not None and job.status != last_status else PROGRESS_EVENT
+            yield sse_message(f"{ROW_EVENT_ID_PREFIX}{job.progress_seq}", event, job_row_snapshot(job))
+            last_seq, last_status = job.progress_seq, job.status
+            idle_since = time.monotonic()
+        if job.status in FINISHED_STATUSES:
+            return
+        if time.monotonic() - idle_since >= settings.JOB_KEEPALIVE_SECONDS:
+            yield ": keep-alive\n\n"
+            idle_since = time.monotonic()
+        await asyncio.sleep(settings.JOB_POLL_INTERVAL_SECONDS)
+
+
+class JobWorker:
+    """
+    Claims queued jobs and runs up to `concurrency` of them at once.
+    """
+
+    def __init__(self, worker_id: Optional[str] = None, concurrency: Optional[int] = None):
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.concurrency = concurrency or settings.JOB_WORKER_CONCURRENCY
+        self._running: Dict[str, asyncio.Task] = {}
+        self._stopping = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+
+    def notify(self) -> None:
+        """
+        Look for jobs now instead of at the next poll; callable from any thread.
+        """
+        if self._loop is not None and self._wake is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._wake.set)
+            except RuntimeError:
+                pass
+
+    def stop(self) -> None:
+        self._stopping = True
+        self.notify()
+
+    async def run(self) -> None:
+        """
+        Poll for jobs until stopped, then hand unfinished jobs back to the queue.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        _local_workers.append(self)
+        logger.info(f"Job worker {self.worker_id} started with concurrency {self.concurrency}")
+        last_reap = 0.0
+        try:
+            while not self._stopping:
+                self._wake.clear()
+                try:
+                    if time.monotonic() - last_reap >= settings.JOB_LEASE_SECONDS:
+                        await reap_jobs()
+                        last_reap = time.monotonic()
+                    while len(self._running) < self.concurrency and not self._stopping:
+                        claimed = await claim_job(self.worker_id)
+                        if claimed is None:
+                            break
+                        task = asyncio.create_task(self._execute(claimed))
+                        self._running[claimed.id] = task
+                        task.add_done_callback(lambda _, job_id=claimed.id: self._running.pop(job_id, None))
+                except Exception as e:
+                    logger.error(f"Job worker {self.worker_id} failed to poll for jobs: {str(e)}")
+                try:
+                    await asyncio.wait_for(self._wake.wait(), settings.JOB_POLL_INTERVAL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            _local_workers.remove(self)
+            tasks = list(self._running.values())
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            logger.info(f"Job worker {self.worker_id} stopped")
+
+    async def _keep_lease(self, claimed: ClaimedJob, progress: Job, runner: asyncio.Task, lost: List[bool]) -> None:
+        # Save progress when it changed, and renew well before the lease runs out
+        saved_seq = 0
+        renewed = time.monotonic()
+        while True:
+            await asyncio.sleep(settings.JOB_PROGRESS_SAVE_SECONDS)
+            seq, _ = progress.progress_state()
+            if seq == saved_seq and time.monotonic() - renewed < settings.JOB_LEASE_SECONDS / 3:
+                continue
+            try:
+                held = await renew_lease(claimed.id, self.worker_id, progress if seq != saved_seq else None)
+            except Exception as e:
+                logger.error(f"Renewing the lease of job {claimed.id} failed: {str(e)}")
+                continue
+            saved_seq = seq
+            renewed = time.monotonic()
+            if not held:
+                lost.append(True)
+                runner.cancel()
+                return
+
+    async def _execute(self, claimed: ClaimedJob) -> None:
+        handler, final_stage = _handlers.get(claimed.kind, (None, None))
+        if handler is None:
+            logger.error(f"No handler for job kind {claimed.kind}")
+            await fail_job(claimed, self.worker_id, f"Unknown job kind: {claimed.kind}", retry=False)
+            return
+
+        progress = create_job(claimed.kind, final_stage, claimed.total, job_id=claimed.id)
+        progress.start(claimed.attempts)
+        lost: List[bool] = []
+        keeper = asyncio.create_task(self._keep_lease(claimed, progress, asyncio.current_task(), lost))
+        try:
+            result = await handler(progress, claimed.payload)
+        except asyncio.CancelledError:
+            if lost:
+                logger.warning(f"Job {claimed.id} lost its lease; another worker owns it now")
+                progress.retry("Lease lost", 0)
+                return
+            await asyncio.shield(release_job(claimed, self.worker_id))
+            progress.retry("Worker stopped", 0)
+            raise
+        except Exception as e:
+            logger.error(f"Job {claimed.id} ({claimed.kind}) attempt {claimed.attempts} failed: {str(e)}")
+            delay = await fail_job(claimed, self.worker_id, str(e), progress)
+            if delay is None:
+                progress.fail(str(e))
+            else:
+                progress.retry(str(e), delay)
+        else:
+            await complete_job(claimed.id, self.worker_id, result, progress)
+            progress.succeed(result)
+        finally:
+            keeper.cancel()
@@ -1,6 +1,8 @@
+from collections import defaultdict
 from sqlalchemy.orm import Session
 from typing import List, Dict, Any
 
+from app.core.config import settings
 from app.models.awesome_list import AwesomeList
 from app.models.category import Category
 from app.models.project import Project
@@ -25,24 +27,35 @@ def generate_readme(db: Session, awesome_list: AwesomeList) -> str:
     markdown_content.append("## Contents")
     markdown_content.append("")
     
-    # Get all top-level categories
-    top_categories = db.query(Category).filter(
-        Category.list_id == awesome_list.id,
-        Category.parent_category_id == None
-    ).order_by(Category.order).all()
+    # Load the whole category tree in one query
+    categories = db.query(Category).filter(
+        Category.list_id == awesome_list.id
+    ).order_by(Category.order, Category.id).all()
+    
+    top_categories = [category for category in categories if category.parent_category_id is None]
+    subcategories_by_parent = defaultdict(list)
+    for category in categories:
+        if category.parent_category_id is not None:
+            subcategories_by_parent[category.parent_category_id].append(category)
+    
+    # Stream the project rows through a server-side cursor instead of
+    # materializing every project of a large list at once
+    project_lines = defaultdict(list)
+    project_rows = db.query(
+        Project.category_id, Project.title, Project.url, Project.description
+    ).filter(
+        Project.list_id == awesome_list.id
+    ).order_by(Project.category_id, Project.id).yield_per(settings.DB_STREAM_BATCH_SIZE)
+    
+    for category_id, title, url, description in project_rows:
+        project_lines[category_id].append(f"* [{title}]({url}) - {description}")
     
     # Add categories to table of contents
     for category in top_categories:
         markdown_content.append(f"- [{category.name}](#{category.name.lower().replace(' ', '-')})")
         
-        # Get subcategories for the current category
-        subcategories = db.query(Category).filter(
-            Category.list_id == awesome_list.id,
-            Category.parent_category_id == category.id
-        ).order_by(Category.order).all()
-        
         # Add subcategories to table of contents
-        for subcategory in subcategories:
+        for subcategory in subcategories_by_parent[category.id]:
             markdown_content.append(f"  - [{subcategory.name}](#{subcategory.name.lower().replace(' ', '-')})")
     
     # Generate content for each category
@@ -51,37 +64,17 @@ def generate_readme(db: Session, awesome_list: AwesomeList) -> str:
         markdown_content.append(f"## {category.name}")
         markdown_content.append("")
         
-        # Get projects directly in this category
-        category_projects = db.query(Project).filter(
-            Project.list_id == awesome_list.id,
-            Project.category_id == category.id
-        ).all()
-        
         # Add projects in this category
-        for project in category_projects:
-            markdown_content.append(f"* [{project.title}]({project.url}) - {project.description}")
-        
-        # Get subcategories
-        subcategories = db.query(Category).filter(
-            Category.list_id == awesome_list.id,
-            Category.parent_category_id == category.id
-        ).order_by(Category.order).all()
+        markdown_content.extend(project_lines[category.id])
         
         # Add content for each subcategory
-        for subcategory in subcategories:
+        for subcategory in subcategories_by_parent[category.id]:
             markdown_content.append("")
             markdown_content.append(f"### {subcategory.name}")
             markdown_content.append("")
             
-            # Get projects in this subcategory
-            subcategory_projects = db.query(Project).filter(
-                Project.list_id == awesome_list.id,
-                Project.category_id == subcategory.id
-            ).all()
-            
             # Add projects in this subcategory
-            for project in subcategory_projects:
-                markdown_content.append(f"* [{project.title}]({project.url}) - {project.description}")
+            markdown_content.extend(project_lines[subcategory.id])
     
     # Add license and contribute section as per awesome list guidelines
     markdown_content.append("")
@@ -0,0 +1,335 @@
+"""
+Cache for site metadata: an in-process LRU in front of the urlmetadata table.
+
+Entries younger than METADATA_CACHE_TTL_SECONDS are served as is. Older
+entries are still served for METADATA_CACHE_STALE_SECONDS while a background
+task refetches them; past that they are refetched before returning.
+
+Failed fetches are cached too: each failure pushes the URL's next attempt out
+exponentially, and until then the cached error is returned without touching
+the network, unless the caller forces a refresh.
+
+Concurrent fetches of one URL (several users, or duplicates within a batch)
+are coalesced into a single fetch whose result every caller gets.
+"""
+import asyncio
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Set
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal, run_write
+from app.models.url_metadata import UrlMetadata
+from app.utils.deadline import no_deadline
+from app.utils.singleflight import SingleFlight
+from app.utils.site_metadata import fetch_site_metadata
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# Query parameters that never change the page content
+TRACKING_PARAMS = {"fbclid", "gclid", "ref", "ref_src"}
+
+# Failures that rarely fix themselves back off NEGATIVE_CACHE_PERSISTENT_FACTOR times longer
+PERSISTENT_ERROR_CLASSES = {"http_404", "http_410"}
+
+
+class CacheEntry:
+    """
+    Last good metadata of a URL and its failure state; never mutated once cached.
+    """
+    __slots__ = ("metadata", "fetched_at", "error_metadata", "failure_count", "retry_at")
+
+    def __init__(
+        self,
+        metadata: Optional[Dict[str, Any]] = None,
+        fetched_at: Optional[float] = None,
+        error_metadata: Optional[Dict[str, Any]] = None,
+        failure_count: int = 0,
+        retry_at: float = 0.0,
+    ):
+        self.metadata = metadata
+        self.fetched_at = fetched_at
+        self.error_metadata = error_metadata
+        self.failure_count = failure_count
+        self.retry_at = retry_at
+
+
+def backoff_seconds(error_class: Optional[str], failure_count: int) -> float:
+    """
+    How long to wait before fetching a URL again after consecutive failures.
+
+    Args:
+        error_class: Class of the latest failure
+        failure_count: Number of consecutive failures, at least 1
+
+    Returns:
+        Seconds until the next attempt
+    """
+    base = settings.NEGATIVE_CACHE_BASE_SECONDS
+    if error_class in PERSISTENT_ERROR_CLASSES:
+        base *= settings.NEGATIVE_CACHE_PERSISTENT_FACTOR
+    return min(settings.NEGATIVE_CACHE_MAX_SECONDS, base * 2 ** (failure_count - 1))
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normalize a URL for use as a cache key.
+
+    Lowercases the scheme and host, drops default ports, fragments, tracking
+    parameters and trailing slashes, and sorts the query string.
+
+    Args:
+        url: URL to normalize
+
+    Returns:
+        Normalized URL
+    """
+    parts = urlsplit(str(url).strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+
+    path = parts.path.rstrip("/")
+    query = urlencode(sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not name.lower().startswith("utm_") and name.lower() not in TRACKING_PARAMS
+    ))
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+class MetadataLRU:
+    """
+    Thread-safe, size-bounded LRU of metadata entries.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, entry: CacheEntry) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_lru = MetadataLRU(settings.METADATA_CACHE_LRU_SIZE)
+_refreshing: Set[str] = set()
+_background_tasks: Set[asyncio.Task] = set()
+_fetches = SingleFlight("site_metadata")
+_stats = {
+    "lru_hits": 0, "db_hits": 0, "misses": 0, "stale_served": 0, "refreshes": 0,
+    "negative_hits": 0, "failures": 0, "forced": 0,
+}
+
+
+def _to_timestamp(value: Optional[datetime]) -> Optional[float]:
+    if value is None:
+        return None
+    # SQLite hands back naive datetimes; they were stored as UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def _to_datetime(value: Optional[float]) -> Optional[datetime]:
+    return datetime.fromtimestamp(value, timezone.utc) if value else None
+
+
+async def _load(key: str) -> Optional[CacheEntry]:
+    async with AsyncSessionLocal() as db:
+        row = (await db.execute(select(UrlMetadata).where(UrlMetadata.url == key))).scalar_one_or_none()
+    if row is None:
+        return None
+    return CacheEntry(
+        metadata=row.site_metadata,
+        fetched_at=_to_timestamp(row.fetched_at),
+        error_metadata=row.error_metadata,
+        failure_count=row.failure_count or 0,
+        retry_at=_to_timestamp(row.retry_at) or 0.0,
+    )
+
+
+async def _store(key: str, entry: CacheEntry) -> None:
+    values = {
+        "site_metadata": entry.metadata,
+        "fetched_at": _to_datetime(entry.fetched_at),
+        "error_metadata": entry.error_metadata,
+        "error_class": entry.error_metadata.get("error_class") if entry.error_metadata else None,
+        "failure_count": entry.failure_count,
+        "retry_at": _to_datetime(entry.retry_at),
+    }
+
+    def upsert(session: Session) -> None:
+        row = session.execute(select(UrlMetadata).where(UrlMetadata.url == key)).scalar_one_or_none()
+        if row is None:
+            session.add(UrlMetadata(url=key, **values))
+        else:
+            for field, value in values.items():
+                setattr(row, field, value)
+        session.flush()
+
+    for _ in range(2):
+        try:
+            await run_write(upsert)
+            return
+        except IntegrityError:
+            # Another process stored the URL first; update its row instead
+            continue
+
+
+async def _lookup(key: str, url: str) -> Optional[CacheEntry]:
+    entry = _lru.get(key)
+    if entry is not None:
+        _stats["lru_hits"] += 1
+        return entry
+    try:
+        entry = await _load(key)
+    except Exception as e:
+        logger.error(f"Error loading cached metadata for {url}: {str(e)}")
+    if entry is not None:
+        _stats["db_hits"] += 1
+        _lru.put(key, entry)
+    return entry
+
+
+def _failure_response(entry: CacheEntry) -> Dict[str, Any]:
+    response = copy.deepcopy(entry.error_metadata)
+    response["retry_at"] = _to_datetime(entry.retry_at).isoformat()
+    return response
+
+
+async def _fetch_and_store(key: str, url: str, previous: Optional[CacheEntry]) -> Dict[str, Any]:
+    metadata = await fetch_site_metadata(url)
+    _stats["refreshes"] += 1
+    now = time.time()
+
+    if metadata.get("error"):
+        # Keep the last good metadata and back off before the next attempt
+        _stats["failures"] += 1
+        failure_count = (previous.failure_count if previous else 0) + 1
+        entry = CacheEntry(
+            metadata=previous.metadata if previous else None,
+            fetched_at=previous.fetched_at if previous else None,
+            error_metadata=metadata,
+            failure_count=failure_count,
+            retry_at=now + backoff_seconds(metadata.get("error_class"), failure_count),
+        )
+        response = _failure_response(entry)
+    else:
+        entry = CacheEntry(metadata=metadata, fetched_at=now)
+        response = copy.deepcopy(metadata)
+
+    _lru.put(key, entry)
+    try:
+        await _store(key, entry)
+    except Exception as e:
+        logger.error(f"Error storing cached metadata for {url}: {str(e)}")
+    return response
+
+
+async def _refresh(key: str, url: str, previous: Optional[CacheEntry]) -> Dict[str, Any]:
+    # Callers asking for the URL while it is being fetched wait for that fetch
+    response = await _fetches.do(key, lambda: _fetch_and_store(key, url, previous))
+    return copy.deepcopy(response)
+
+
+async def _refresh_in_background(key: str, url: str, previous: CacheEntry) -> None:
+    try:
+        # Outlives the request that scheduled it, so its deadline does not apply
+        with no_deadline():
+            await _refresh(key, url, previous)
+    except Exception as e:
+        logger.error(f"Background metadata refresh failed for {url}: {str(e)}")
+    finally:
+        _refreshing.discard(key)
+
+
+def _schedule_refresh(key: str, url: str, previous: CacheEntry) -> None:
+    if key in _refreshing:
+        return
+    _refreshing.add(key)
+    task = asyncio.get_running_loop().create_task(_refresh_in_background(key, url, previous))
+    # Keep a reference so the task is not garbage collected mid-flight
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def get_cached_site_metadata(url: str, force_refresh: bool = False) -> Dict[str, Any]:
+    """
+    Get site metadata for a URL, from the cache when possible.
+
+    Args:
+        url: The URL to get metadata for
+        force_refresh: Fetch now, ignoring fresh entries and failure backoff
+
+    Returns:
+        A dictionary containing metadata fields, as returned by fetch_site_metadata.
+        Failures include `error`, `error_class` and `retry_at`, the earliest time
+        the URL will be fetched again.
+
+    Raises:
+        DeadlineExceeded: When the caller's deadline cut the fetch short; this is
+            not cached as a failure of the URL
+    """
+    key = normalize_url(url)
+    entry = await _lookup(key, url)
+
+    if force_refresh:
+        _stats["forced"] += 1
+        return await _refresh(key, url, entry)
+
+    if entry is not None:
+        now = time.time()
+        in_backoff = entry.retry_at > now
+        if entry.metadata is not None:
+            age = now - entry.fetched_at
+            if age < settings.METADATA_CACHE_TTL_SECONDS:
+                return copy.deepcopy(entry.metadata)
+            if age < settings.METADATA_CACHE_TTL_SECONDS + settings.METADATA_CACHE_STALE_SECONDS:
+                _stats["stale_served"] += 1
+                if not in_backoff:
+                    _schedule_refresh(key, url, entry)
+                return copy.deepcopy(entry.metadata)
+        if in_backoff:
+            # Fail fast with the cached error instead of waiting on a dead URL
+            _stats["negative_hits"] += 1
+            return _failure_response(entry)
+
+    _stats["misses"] += 1
+    return await _refresh(key, url, entry)
+
+
+def metadata_cache_stats() -> Dict[str, Any]:
+    """
+    Counters describing cache effectiveness.
+    """
+    return {**_stats, "lru_size": len(_lru), "refreshing": len(_refreshing)}
@@ -1,5 +1,5 @@
 from typing import List, Optional, Dict
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, undefer
 
 from app.models.project import Project
 from app.schemas.project import ProjectCreate, ProjectUpdate
@@ -10,13 +10,20 @@ def get_projects(
     list_id: Optional[int] = None,
     category_id: Optional[int] = None,
     skip: int = 0,
-    limit: int = 100
+    limit: int = 100,
+    include_metadata: bool = False
 ) -> List[Project]:
     """
     Retrieve projects with optional filtering by list_id and category_id.
+
+    ``project_metadata`` is deferred on the model; pass ``include_metadata``
+    to load it in the same query instead of one lazy load per row.
     """
     query = db.query(Project)
 
+    if include_metadata:
+        query = query.options(undefer(Project.project_metadata))
+
     if list_id is not None:
         query = query.filter(Project.list_id == list_id)
 
@@ -28,9 +35,11 @@ def get_projects(
 
 def get_project(db: Session, project_id: int) -> Optional[Project]:
     """
-    Get a specific project by ID.
+    Get a specific project by ID, including its metadata.
     """
-    return db.query(Project).filter(Project.id == project_id).first()
+    return db.query(Project).options(
+        undefer(Project.project_metadata)
+    ).filter(Project.id == project_id).first()
 
 
 def create_project(db: Session, project_in: ProjectCreate) -> Project:
@@ -51,7 +60,7 @@ def create_project(db: Session, project_in: ProjectCreate) -> Project:
     return db_project
 
 
-def create_project_from_import(
+def add_project_from_import(
     db: Session,
     list_id: int,
     category_id: int,
@@ -60,7 +69,7 @@ def create_project_from_import(
     description: str
 ) -> Project:
     """
-    Create a new project during import process.
+    Add a project during import and flush it, without committing.
     """
     db_project = Project(
         list_id=list_id,
@@ -71,6 +80,29 @@ def create_project_from_import(
         project_metadata={},  # Initialize with empty dict to avoid validation errors
     )
     db.add(db_project)
+    db.flush()
+    return db_project
+
+
+def create_project_from_import(
+    db: Session,
+    list_id: int,
+    category_id: int,
+    title: str,
+    url: str,
+    description: str
+) -> Project:
+    """
+    Create a new project during import process.
+    """
+    db_project = add_project_from_import(
+        db,
+        list_id=list_id,
+        category_id=category_id,
+        title=title,
+        url=url,
+        description=description,
+    )
     db.commit()
     db.refresh(db_project)
     return db_project
@@ -0,0 +1,173 @@
+"""
+Batch URL characterization: fetch metadata for many URLs with bounded concurrency.
+
+Category suggestions are left to the caller, which scores all fetched URLs
+against the list's suggester at once.
+
+A batch may carry a time budget: fetches inherit the deadline as their
+timeout, and URLs that did not finish in time are returned with status
+"not_attempted" so a follow-up request can send just those again.
+"""
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from app.core.config import settings
+from app.services.job_progress import CATEGORIZED, FAILED, FETCHED, NOT_ATTEMPTED, Job
+from app.services.metadata_cache import get_cached_site_metadata
+from app.utils.deadline import DeadlineExceeded, deadline_at, deadline_in
+
+# Result statuses; "not_attempted" URLs can be sent again in a follow-up request
+COMPLETED = "completed"
+FAILED_STATUS = "failed"
+NOT_ATTEMPTED_STATUS = NOT_ATTEMPTED
+
+
+class UrlAnalysisResult(BaseModel):
+    url: str
+    status: str = COMPLETED
+    title: Optional[str] = None
+    description: Optional[str] = None
+    category_id: Optional[int] = None
+    confidence: Optional[float] = None
+    error: Optional[str] = None
+
+
+async def characterize_url(url: str, refresh: bool = False) -> UrlAnalysisResult:
+    """
+    Fetch metadata for one URL; the category is suggested by the caller.
+    """
+    try:
+        # Validate URL format
+        try:
+            # Basic URL validation
+            if not url.startswith(('http://', 'https://')):
+                return UrlAnalysisResult(
+                    url=url,
+                    status=FAILED_STATUS,
+                    error="Invalid URL format. URL must start with http:// or https://"
+                )
+
+            # Fetch metadata
+            metadata = await get_cached_site_metadata(url, force_refresh=refresh)
+
+            if metadata.get("error"):
+                return UrlAnalysisResult(
+                    url=url,
+                    status=FAILED_STATUS,
+                    error=f"Failed to fetch metadata: {metadata['error']}"
+                )
+
+            return UrlAnalysisResult(
+                url=url,
+                title=metadata.get("title"),
+                description=metadata.get("description"),
+            )
+
+        except DeadlineExceeded as e:
+            return not_attempted(url, e)
+        except Exception as e:
+            return UrlAnalysisResult(
+                url=url,
+                status=FAILED_STATUS,
+                error=f"Failed to process URL: {str(e)}"
+            )
+    except Exception as e:
+        return UrlAnalysisResult(
+            url=url,
+            status=FAILED_STATUS,
+            error=f"Unexpected error: {str(e)}"
+        )
+
+
+def not_attempted(url: str, error: Optional[DeadlineExceeded] = None) -> UrlAnalysisResult:
+    """
+    Result for a URL the time budget ran out on.
+    """
+    return UrlAnalysisResult(url=url, status=NOT_ATTEMPTED_STATUS, error=str(error or DeadlineExceeded()))
+
+
+async def characterize_urls(
+    urls: List[str], refresh: bool = False, concurrency: Optional[int] = None,
+    budget_seconds: Optional[float] = None,
+) -> AsyncIterator[Tuple[int, UrlAnalysisResult]]:
+    """
+    Characterize URLs with at most `concurrency` in flight, yielding each as it finishes.
+
+    A new URL starts as soon as any finishes, so one slow URL holds up only its
+    own slot instead of a whole chunk.
+
+    Args:
+        urls: URLs to characterize
+        refresh: Fetch every URL now, bypassing the cache and failure backoff
+        concurrency: Window size (default BATCH_CHARACTERIZE_CONCURRENCY)
+        budget_seconds: Time budget for the whole batch; URLs unfinished when it
+            runs out, in flight or still queued, are cancelled and yielded last
+            as "not_attempted"
+
+    Yields:
+        (position in urls, result) in completion order
+    """
+    semaphore = asyncio.Semaphore(concurrency or settings.BATCH_CHARACTERIZE_CONCURRENCY)
+    deadline = deadline_in(budget_seconds)
+
+    async def run(index: int, url: str) -> Tuple[int, UrlAnalysisResult]:
+        with deadline_at(deadline):
+            async with semaphore:
+                return index, await characterize_url(url, refresh)
+
+    tasks = [asyncio.create_task(run(index, url)) for index, url in enumerate(urls)]
+    yielded = set()
+    try:
+        try:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            for next_done in asyncio.as_completed(tasks, timeout=timeout):
+                index, result = await next_done
+                yielded.add(index)
+                yield index, result
+        except asyncio.TimeoutError:
+            pass
+
+        for index, task in enumerate(tasks):
+            if index in yielded:
+                continue
+            if task.done() and not task.cancelled():
+                yield task.result()
+            else:
+                task.cancel()
+                yield index, not_attempted(urls[index])
+    finally:
+        # The consumer went away (e.g. a streaming client disconnected)
+        for task in tasks:
+            task.cancel()
+
+
+async def characterize_batch(urls: List[str], refresh: bool, suggester, progress: Job,
+                             budget_seconds: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    Characterize and categorize URLs for a background job, reporting each URL's progress.
+
+    Args:
+        urls: URLs to characterize
+        refresh: Fetch every URL now, bypassing the cache and failure backoff
+        suggester: The list's category suggester
+        progress: Job to report fetched, categorized, failed and not attempted URLs to
+        budget_seconds: Time budget for the whole batch
+
+    Returns:
+        Results in the order of urls
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(urls)
+    async for index, result in characterize_urls(urls, refresh, budget_seconds=budget_seconds):
+        if result.error is None:
+            progress.emit(FETCHED, url=result.url)
+            result.category_id, result.confidence = suggester.score(result.url, result.description)
+            progress.emit(CATEGORIZED, url=result.url, category_id=result.category_id)
+        elif result.status == NOT_ATTEMPTED_STATUS:
+            progress.emit(NOT_ATTEMPTED, url=result.url)
+        else:
+            progress.emit(FAILED, url=result.url, error=result.error)
+        results[index] = result.model_dump()
+    return results
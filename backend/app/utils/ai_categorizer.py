@@ -1,16 +1,23 @@
 """
 AI-powered repository categorization and summarization.
 Supports both OpenAI and Ollama as backends for AI processing.
+
+All calls are async and go through the shared HTTP client's connection pool
+and the per-host scheduler, so categorizing a batch needs no threads.
 """
 import os
 import re
-import requests
 import logging
 from typing import List, Dict, Any, Tuple, Optional, Union
 import json
 import base64
+import hashlib
 from urllib.parse import urlparse
 
+from app.core.config import settings
+from app.utils.deadline import capped_timeout, check_deadline, enforce_deadline
+from app.utils.http_client import async_request, get_scheduled_async_client
+
 # OpenAI imports - will be imported conditionally to support environments without this dependency
 try:
     import openai
@@ -53,30 +60,64 @@ class AICategorizer:
                 raise ValueError("OpenAI API key is required when not using Ollama")
             
             self.model = model
-            self.client = openai.OpenAI(api_key=self.api_key)
+            # Scheduled per host, so 429s and Retry-After from the API slow us down
+            self.client = openai.AsyncOpenAI(api_key=self.api_key, http_client=get_scheduled_async_client())
         else:
             # Configure Ollama
             self.ollama_base_url = ollama_base_url
             self.ollama_model = ollama_model
     
-    def fetch_github_readme(self, github_url: str) -> str:
+    @staticmethod
+    def _github_repo(github_url: str) -> Tuple[str, str]:
+        # Parse the GitHub URL to extract owner and repo
+        parsed_url = urlparse(github_url)
+        path_parts = parsed_url.path.strip('/').split('/')
+        
+        if len(path_parts) < 2:
+            raise ValueError(f"Invalid GitHub URL: {github_url}")
+        
+        return path_parts[0], path_parts[1]
+    
+    @classmethod
+    def readme_key(cls, github_url: str) -> str:
         """
-        Fetch README content from a GitHub repository URL.
+        Key identifying the README fetch_github_readme returns, for coalescing fetches.
         
         Args:
             github_url: URL to a GitHub repository
             
         Returns:
-            String containing the README content
+            "owner/repo" in lowercase, the same for every URL within the repository
         """
-        # Parse the GitHub URL to extract owner and repo
-        parsed_url = urlparse(github_url)
-        path_parts = parsed_url.path.strip('/').split('/')
+        owner, repo = cls._github_repo(github_url)
+        return f"{owner}/{repo}".lower()
+    
+    def prompt_key(self, readme_content: str, category_structure: Dict[str, List[str]]) -> str:
+        """
+        Key identifying the call categorize_readme makes, for coalescing identical calls.
         
-        if len(path_parts) < 2:
-            raise ValueError(f"Invalid GitHub URL: {github_url}")
+        Args:
+            readme_content: Repository README content
+            category_structure: Dictionary of categories and subcategories
+            
+        Returns:
+            Hash of the backend, model and prompt inputs
+        """
+        model = self.ollama_model if self.use_ollama else self.model
+        prompt = json.dumps([self.use_ollama, model, readme_content, category_structure], sort_keys=True)
+        return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    
+    async def fetch_github_readme(self, github_url: str) -> str:
+        """
+        Fetch README content from a GitHub repository URL.
         
-        owner, repo = path_parts[0], path_parts[1]
+        Args:
+            github_url: URL to a GitHub repository
+            
+        Returns:
+            String containing the README content
+        """
+        owner, repo = self._github_repo(github_url)
         
         # Use GitHub API to fetch README content
         api_url = f"https://api.github.com/repos/{owner}/{repo}/readme"
@@ -87,7 +128,7 @@ class AICategorizer:
         if github_token:
             headers["Authorization"] = f"token {github_token}"
         
-        response = requests.get(api_url, headers=headers)
+        response = await async_request("GET", api_url, headers=headers)
         
         if response.status_code != 200:
             raise Exception(f"Failed to fetch README: {response.status_code} - {response.text}")
@@ -126,7 +167,7 @@ class AICategorizer:
             
         return cleaned
     
-    def categorize_with_openai(self, readme_content: str, category_structure: Dict[str, List[str]]) -> Dict[str, Any]:
+    async def categorize_with_openai(self, readme_content: str, category_structure: Dict[str, List[str]]) -> Dict[str, Any]:
         """
         Categorize repository and generate summary using OpenAI.
         
@@ -160,14 +201,23 @@ class AICategorizer:
         - category: The main category from the provided structure
         - subcategory: The subcategory from the provided structure under the selected category (can be null if none match)
         - summary: A concise 1-2 sentence summary of what this repository is about
+        - confidence: How sure you are of the category, from 0.0 to 1.0
         """
         
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[{"role": "system", "content": "You are a helpful assistant that categorizes GitHub repositories."},
-                     {"role": "user", "content": prompt}],
-            temperature=0.2
-        )
+        try:
+            async with enforce_deadline():
+                response = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[{"role": "system", "content": "You are a helpful assistant that categorizes GitHub repositories."},
+                             {"role": "user", "content": prompt}],
+                    temperature=0.2,
+                    # Shortened to the time left when the request has a deadline
+                    timeout=capped_timeout(settings.HTTP_LLM_TIMEOUT_SECONDS)
+                )
+        except openai.APIError:
+            # The SDK wraps a cut-off at the deadline as a connection error
+            check_deadline()
+            raise
         
         result_text = response.choices[0].message.content.strip()
         
@@ -192,7 +242,7 @@ class AICategorizer:
                 "summary": "Failed to generate summary and categories."
             }
     
-    def categorize_with_ollama(self, readme_content: str, category_structure: Dict[str, List[str]]) -> Dict[str, Any]:
+    async def categorize_with_ollama(self, readme_content: str, category_structure: Dict[str, List[str]]) -> Dict[str, Any]:
         """
         Categorize repository and generate summary using Ollama.
         
@@ -226,16 +276,19 @@ class AICategorizer:
         - category: The main category from the provided structure
         - subcategory: The subcategory from the provided structure under the selected category (can be null if none match)
         - summary: A concise 1-2 sentence summary of what this repository is about
+        - confidence: How sure you are of the category, from 0.0 to 1.0
         """
         
         # Make API call to Ollama
-        response = requests.post(
+        response = await async_request(
+            "POST",
             f"{self.ollama_base_url}/api/generate",
             json={
                 "model": self.ollama_model,
                 "prompt": prompt,
                 "stream": False
-            }
+            },
+            timeout=settings.HTTP_LLM_TIMEOUT_SECONDS
         )
         
         if response.status_code != 200:
@@ -269,7 +322,22 @@ class AICategorizer:
                 "summary": "Failed to generate summary and categories."
             }
     
-    def categorize_repository(self, 
+    async def categorize_readme(self, readme_content: str, category_structure: Dict[str, List[str]]) -> Dict[str, Any]:
+        """
+        Categorize already fetched README content with the configured backend.
+        
+        Args:
+            readme_content: Repository README content
+            category_structure: Dictionary of categories and subcategories
+            
+        Returns:
+            Dictionary with category, subcategory, summary and confidence
+        """
+        if self.use_ollama:
+            return await self.categorize_with_ollama(readme_content, category_structure)
+        return await self.categorize_with_openai(readme_content, category_structure)
+    
+    async def categorize_repository(self, 
                              github_url: str, 
                              category_structure: Dict[str, List[str]]) -> Dict[str, Any]:
         """
@@ -283,12 +351,8 @@ class AICategorizer:
             Dictionary with suggested category, subcategory, and summary
         """
         try:
-            readme_content = self.fetch_github_readme(github_url)
-            
-            if self.use_ollama:
-                return self.categorize_with_ollama(readme_content, category_structure)
-            else:
-                return self.categorize_with_openai(readme_content, category_structure)
+            readme_content = await self.fetch_github_readme(github_url)
+            return await self.categorize_readme(readme_content, category_structure)
                 
         except Exception as e:
             logger.error(f"Error categorizing repository: {str(e)}")
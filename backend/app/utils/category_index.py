@@ -0,0 +1,401 @@
+"""
+Per-list inverted index from keywords to categories, for category suggestions.
+
+Category names are tokenized once per list into postings weighted by TF-IDF,
+so scoring a URL is a dictionary lookup per keyword instead of substring tests
+against every category. Whole name tokens match with their full weight and
+substrings of them (at least MIN_SUBSTRING_LENGTH characters) with half of it.
+Batches of URLs are scored with NumPy matrix products when it is installed.
+
+Indexes are cached per list and dropped when a session that changed a
+category commits. The TTL bounds staleness for changes made by other
+processes sharing the database.
+"""
+import math
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import urlparse
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.awesome_list import AwesomeList
+from app.models.category import Category
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# Shorter substrings of category tokens are too ambiguous to match
+MIN_SUBSTRING_LENGTH = 3
+
+# Weight of a keyword found inside a category token rather than equal to it
+SUBSTRING_WEIGHT = 0.5
+
+# Scores are rounded before comparing, so float summation order never decides a tie
+SCORE_DECIMALS = 12
+
+# Session.info key collecting the lists whose categories a transaction changed
+CHANGED_LISTS_KEY = "category_index_changed_lists"
+
+# Marks a change that may touch any list
+ALL_LISTS = None
+
+# Execution option naming the one list a bulk UPDATE or DELETE touches
+LIST_ID_OPTION = "category_index_list_id"
+
+
+def category_tokens(name: str) -> List[str]:
+    """
+    Split a category name into lowercase tokens longer than two characters.
+    """
+    return [token for token in re.split(r"[^a-z0-9]", name.lower()) if len(token) > 2]
+
+
+def query_keywords(url: str, description: Optional[str] = None) -> Set[str]:
+    """
+    Extract the keywords of a URL and an optional description.
+
+    Args:
+        url: The URL of the project
+        description: Optional description of the project
+
+    Returns:
+        Lowercase domain names, path words and description words of four or more letters
+    """
+    parsed_url = urlparse(url)
+    # The TLD and "www" say nothing about the project ("com" would match "Command-line")
+    keywords = set((parsed_url.hostname or "").split(".")[:-1])
+    keywords.discard("www")
+
+    for component in parsed_url.path.lower().split("/"):
+        keywords.update(part for part in re.split(r"[^a-z0-9]", component) if part)
+
+    if description:
+        keywords.update(re.findall(r"\b[a-zA-Z]{4,}\b", description.lower()))
+
+    keywords.discard("")
+    return keywords
+
+
+class CategoryIndex:
+    """
+    Inverted index over the category names of one list.
+
+    Every distinct token of a category name is a slot; a category's score is
+    the sum of its matched slots.
+
+    Attributes:
+        category_ids: Indexed categories in scoring order
+        postings: Term -> list of (slot, weight)
+        slot_positions: Category position of each slot
+        slot_weights: TF-IDF weight of each slot's token
+        norms: Total weight of each category's slots
+    """
+
+    def __init__(self, categories: Iterable[Tuple[int, str]]):
+        """
+        Args:
+            categories: (id, name) pairs; ties are won by the earliest
+        """
+        categories = list(categories)
+        self.category_ids: List[int] = [category_id for category_id, _ in categories]
+        self.postings: Dict[str, List[Tuple[int, float]]] = {}
+        self.slot_positions: List[int] = []
+        self.slot_weights: List[float] = []
+        self.norms: List[float] = []
+
+        tokenized = [category_tokens(name) for _, name in categories]
+        document_frequency: Dict[str, int] = {}
+        for tokens in tokenized:
+            for token in set(tokens):
+                document_frequency[token] = document_frequency.get(token, 0) + 1
+
+        total = len(categories)
+        for position, tokens in enumerate(tokenized):
+            norm = 0.0
+            for token, count in _counts(tokens).items():
+                idf = math.log((1 + total) / (1 + document_frequency[token])) + 1.0
+                weight = count / len(tokens) * idf
+                norm += weight
+                slot = len(self.slot_weights)
+                self.slot_positions.append(position)
+                self.slot_weights.append(weight)
+                self.postings.setdefault(token, []).append((slot, weight))
+                for substring in _substrings(token):
+                    self.postings.setdefault(substring, []).append((slot, weight * SUBSTRING_WEIGHT))
+            self.norms.append(norm)
+
+    def __len__(self) -> int:
+        return len(self.category_ids)
+
+    def score(self, url: str, description: Optional[str] = None) -> Tuple[Optional[int], float]:
+        """
+        Suggest the best matching category for a URL and description.
+
+        Each slot counts once, with the best weight any keyword gives it; the
+        confidence is the share of the category's weight matched.
+
+        Returns:
+            A tuple containing (suggested_category_id, confidence_score)
+        """
+        return self._score_keywords(query_keywords(url, description))
+
+    def _score_keywords(self, keywords: Set[str]) -> Tuple[Optional[int], float]:
+        matched: Dict[int, float] = {}
+        for keyword in keywords:
+            for slot, weight in self.postings.get(keyword, ()):
+                if matched.get(slot, 0.0) < weight:
+                    matched[slot] = weight
+
+        totals: Dict[int, float] = {}
+        for slot, weight in matched.items():
+            position = self.slot_positions[slot]
+            totals[position] = totals.get(position, 0.0) + weight
+
+        best_position = None
+        best_score = 0.0
+        for position in sorted(totals):
+            # Rounded so summation order cannot break ties differently than score_batch
+            score = round(totals[position] / self.norms[position], SCORE_DECIMALS)
+            if score > best_score:
+                best_position, best_score = position, score
+
+        if best_position is None:
+            return None, 0.0
+        return self.category_ids[best_position], min(best_score, 1.0)
+
+    def score_batch(self, items: List[Tuple[str, Optional[str]]]) -> List[Tuple[Optional[int], float]]:
+        """
+        Score many URLs at once; equivalent to calling score for each.
+
+        With NumPy, the keywords of all URLs and the slots they touch become
+        matrices and every URL is scored against every slot with two matrix
+        products. Without it, each URL is scored in turn.
+
+        Args:
+            items: (url, description) pairs
+
+        Returns:
+            A (suggested_category_id, confidence_score) tuple per item, in order
+        """
+        keyword_sets = [query_keywords(url, description) for url, description in items]
+        if not NUMPY_AVAILABLE:
+            return [self._score_keywords(keywords) for keywords in keyword_sets]
+
+        # Only terms and slots the batch touches, so the matrices stay batch-sized
+        terms = sorted({keyword for keywords in keyword_sets for keyword in keywords if keyword in self.postings})
+        slots = sorted({slot for term in terms for slot, _ in self.postings[term]})
+        if not slots:
+            return [(None, 0.0)] * len(items)
+        term_columns = {term: column for column, term in enumerate(terms)}
+        slot_columns = {slot: column for column, slot in enumerate(slots)}
+
+        queries = np.zeros((len(items), len(terms)))
+        for row, keywords in enumerate(keyword_sets):
+            for keyword in keywords:
+                column = term_columns.get(keyword)
+                if column is not None:
+                    queries[row, column] = 1.0
+
+        # Which slots each term matches whole, and which it matches as a substring
+        whole = np.zeros((len(terms), len(slots)))
+        partial = np.zeros((len(terms), len(slots)))
+        for row, term in enumerate(terms):
+            for slot, weight in self.postings[term]:
+                target = whole if weight == self.slot_weights[slot] else partial
+                target[row, slot_columns[slot]] = 1.0
+
+        weights = np.asarray(self.slot_weights)[slots]
+        slot_scores = np.where(
+            queries @ whole > 0,
+            weights,
+            np.where(queries @ partial > 0, weights * SUBSTRING_WEIGHT, 0.0),
+        )
+
+        totals = np.zeros((len(self.category_ids), len(items)))
+        np.add.at(totals, np.asarray(self.slot_positions)[slots], slot_scores.T)
+        norms = np.asarray(self.norms)[:, None]
+        scores = np.round(np.divide(totals, norms, out=np.zeros_like(totals), where=norms > 0), SCORE_DECIMALS)
+
+        best_positions = scores.argmax(axis=0)
+        results = []
+        for column, position in enumerate(best_positions):
+            best_score = float(scores[position, column])
+            if best_score > 0:
+                results.append((self.category_ids[position], min(best_score, 1.0)))
+            else:
+                results.append((None, 0.0))
+        return results
+
+
+def _counts(tokens: List[str]) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for token in tokens:
+        counts[token] = counts.get(token, 0) + 1
+    return counts
+
+
+def _substrings(token: str) -> Set[str]:
+    return {
+        token[start:end]
+        for start in range(len(token))
+        for end in range(start + MIN_SUBSTRING_LENGTH, len(token) + 1)
+        if end - start < len(token)
+    }
+
+
+class ListModelCache:
+    """
+    Thread-safe per-list cache of models built from a list's rows.
+
+    Every invalidation or update bumps the list's version, so a model built
+    from rows read before the change is never stored.
+    """
+
+    def __init__(self, ttl_setting: str):
+        """
+        Args:
+            ttl_setting: Name of the setting holding the entry TTL in seconds
+        """
+        self.ttl_setting = ttl_setting
+        self._models: Dict[int, Tuple[Any, float]] = {}
+        self._versions: Dict[int, int] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "builds": 0, "invalidations": 0, "updates": 0}
+
+    def get(self, list_id: int) -> Optional[Any]:
+        with self._lock:
+            cached = self._models.get(list_id)
+            if cached is None or time.monotonic() - cached[1] > getattr(settings, self.ttl_setting):
+                return None
+            self.stats["hits"] += 1
+            return cached[0]
+
+    def version(self, list_id: int) -> Tuple[int, int]:
+        with self._lock:
+            return self._generation, self._versions.get(list_id, 0)
+
+    def put(self, list_id: int, model: Any, version: Tuple[int, int]) -> None:
+        with self._lock:
+            self.stats["builds"] += 1
+            if (self._generation, self._versions.get(list_id, 0)) == version:
+                self._models[list_id] = (model, time.monotonic())
+
+    def update(self, list_id: int, apply: Callable[[Any], None]) -> None:
+        """
+        Apply a change to the cached model of a list, if there is one.
+        """
+        with self._lock:
+            self._versions[list_id] = self._versions.get(list_id, 0) + 1
+            cached = self._models.get(list_id)
+            if cached is not None:
+                self.stats["updates"] += 1
+                apply(cached[0])
+
+    def invalidate(self, list_id: Optional[int] = ALL_LISTS) -> None:
+        """
+        Drop the model of one list, or of every list.
+        """
+        with self._lock:
+            self.stats["invalidations"] += 1
+            if list_id is ALL_LISTS:
+                self._generation += 1
+                self._models.clear()
+            else:
+                self._versions[list_id] = self._versions.get(list_id, 0) + 1
+                self._models.pop(list_id, None)
+
+
+category_index_cache = ListModelCache("CATEGORY_INDEX_TTL_SECONDS")
+
+# Caches dropped for a list whenever its categories change
+category_dependent_caches: List[ListModelCache] = [category_index_cache]
+
+
+def _category_rows_query(list_id: int):
+    return select(Category.id, Category.name).where(Category.list_id == list_id).order_by(Category.id)
+
+
+def get_category_index(db: Session, list_id: int) -> CategoryIndex:
+    """
+    Get the category index of a list, building it on first use.
+
+    Args:
+        db: Database session
+        list_id: The awesome list ID
+
+    Returns:
+        The list's category index
+    """
+    index = category_index_cache.get(list_id)
+    if index is None:
+        version = category_index_cache.version(list_id)
+        index = CategoryIndex(db.execute(_category_rows_query(list_id)).all())
+        category_index_cache.put(list_id, index, version)
+    return index
+
+
+async def get_category_index_async(db: AsyncSession, list_id: int) -> CategoryIndex:
+    """
+    Async variant of get_category_index for use inside async handlers.
+    """
+    index = category_index_cache.get(list_id)
+    if index is None:
+        version = category_index_cache.version(list_id)
+        index = CategoryIndex((await db.execute(_category_rows_query(list_id))).all())
+        category_index_cache.put(list_id, index, version)
+    return index
+
+
+def _mark_changed(session: Session, list_id: Optional[int]) -> None:
+    session.info.setdefault(CHANGED_LISTS_KEY, set()).add(list_id)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_category_changes(session: Session, flush_context) -> None:
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Category):
+            _mark_changed(session, obj.list_id)
+            # A category moved to another list also leaves its old list
+            previous_list_ids = inspect(obj).attrs.list_id.history.deleted
+            for list_id in previous_list_ids:
+                _mark_changed(session, list_id)
+        elif isinstance(obj, AwesomeList) and obj in session.deleted:
+            _mark_changed(session, obj.id)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk_category_changes(orm_execute_state) -> None:
+    # Bulk and cascading deletes do not say which lists they touch unless
+    # the statement names its list with LIST_ID_OPTION
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, "table", None)
+        if table is not None and table.name in (Category.__tablename__, AwesomeList.__tablename__):
+            list_id = orm_execute_state.execution_options.get(LIST_ID_OPTION, ALL_LISTS)
+            _mark_changed(orm_execute_state.session, list_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_lists(session: Session) -> None:
+    changed = session.info.pop(CHANGED_LISTS_KEY, None)
+    if not changed:
+        return
+    for cache in category_dependent_caches:
+        if ALL_LISTS in changed:
+            cache.invalidate(ALL_LISTS)
+            continue
+        for list_id in changed:
+            cache.invalidate(list_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_lists(session: Session) -> None:
+    session.info.pop(CHANGED_LISTS_KEY, None)
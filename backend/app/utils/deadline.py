@@ -0,0 +1,143 @@
+"""
+Request deadlines for outbound calls.
+
+A batch request with a time budget sets a deadline (a time.monotonic()
+timestamp) for the work it starts. Outbound calls read it from a context
+variable, so it follows asyncio tasks and worker threads started with a copy
+of the context: HTTP calls cap their timeouts at the time left, and calls
+that would start after the deadline raise DeadlineExceeded instead.
+"""
+import asyncio
+import contextvars
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Iterator, Optional, Union
+
+import httpx
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """
+    The time budget ran out before a call could finish.
+    """
+
+    def __init__(self, message: str = "The time budget ran out"):
+        super().__init__(message)
+
+
+def deadline_in(seconds: Optional[float]) -> Optional[float]:
+    """
+    Deadline `seconds` from now, or the current one when that is sooner.
+
+    Args:
+        seconds: Time budget; None for no budget
+
+    Returns:
+        The deadline, or None when there is neither a budget nor a current deadline
+    """
+    current = _deadline.get()
+    if seconds is None:
+        return current
+    deadline = time.monotonic() + seconds
+    return deadline if current is None else min(current, deadline)
+
+
+@contextmanager
+def deadline_at(deadline: Optional[float]) -> Iterator[None]:
+    """
+    Apply a deadline (from deadline_in) to calls made inside the block.
+
+    A deadline later than the current one is ignored.
+    """
+    current = _deadline.get()
+    if deadline is not None and current is not None:
+        deadline = min(deadline, current)
+    token = _deadline.set(deadline if deadline is not None else current)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+@contextmanager
+def no_deadline() -> Iterator[None]:
+    """
+    Run the block without a deadline, e.g. work shared by several requests.
+    """
+    token = _deadline.set(None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """
+    Seconds left until the deadline (may be negative), or None without one.
+    """
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def check_deadline() -> None:
+    """
+    Raise DeadlineExceeded when the deadline has passed.
+    """
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded()
+
+
+def capped_timeout(timeout: Union[None, float, httpx.Timeout]) -> Union[None, float, httpx.Timeout]:
+    """
+    A call's timeout, capped at the time left until the deadline.
+
+    Args:
+        timeout: The timeout the call would use without a deadline
+
+    Returns:
+        The timeout to pass to the call
+
+    Raises:
+        DeadlineExceeded: When the deadline has passed
+    """
+    check_deadline()
+    left = remaining()
+    if left is None:
+        return timeout
+    if isinstance(timeout, httpx.Timeout):
+        return httpx.Timeout(
+            connect=_cap(timeout.connect, left),
+            read=_cap(timeout.read, left),
+            write=_cap(timeout.write, left),
+            pool=_cap(timeout.pool, left),
+        )
+    return _cap(timeout, left)
+
+
+def _cap(timeout: Optional[float], left: float) -> float:
+    return left if timeout is None else min(timeout, left)
+
+
+@asynccontextmanager
+async def enforce_deadline():
+    """
+    Cancel the block at the deadline, raising DeadlineExceeded.
+
+    Covers waits that have no timeout of their own, such as host scheduling.
+    """
+    left = remaining()
+    if left is None:
+        yield
+        return
+    if left <= 0:
+        raise DeadlineExceeded()
+    try:
+        async with asyncio.timeout(left) as scope:
+            yield
+    except TimeoutError as e:
+        if scope.expired():
+            raise DeadlineExceeded() from e
+        raise
@@ -0,0 +1,274 @@
+"""
+GitHub-native metadata for repository URLs.
+
+Repository pages are resolved through the GitHub GraphQL API instead of
+scraping github.com. Lookups made within a few milliseconds of each other are
+batched into one query of up to GITHUB_GRAPHQL_BATCH_SIZE repositories.
+"""
+import asyncio
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+from urllib.parse import urlparse
+
+from app.core.config import settings
+from app.services.markdown_parser import parse_github_url
+from app.utils.deadline import no_deadline
+from app.utils.http_client import async_request
+
+GITHUB_HOSTS = {"github.com", "www.github.com"}
+
+# First path segments on github.com that are not repository owners
+RESERVED_OWNERS = {
+    "about", "apps", "collections", "enterprise", "features", "marketplace",
+    "orgs", "settings", "sponsors", "topics", "trending",
+}
+
+REPOSITORY_FIELDS = """
+    nameWithOwner
+    description
+    url
+    homepageUrl
+    stargazerCount
+    isArchived
+    primaryLanguage { name }
+    repositoryTopics(first: 20) { nodes { topic { name } } }
+"""
+
+
+class GitHubGraphQLUnavailable(Exception):
+    """
+    The GraphQL API could not answer; callers fall back to scraping.
+    """
+
+
+def github_repo_from_url(url: str) -> Optional[Tuple[str, str]]:
+    """
+    Get the owner and name of a repository home page URL.
+
+    Args:
+        url: Any URL
+
+    Returns:
+        (owner, repo) for github.com/<owner>/<repo> URLs, otherwise None
+    """
+    parsed = urlparse(str(url))
+    if parsed.netloc.lower() not in GITHUB_HOSTS:
+        return None
+    # Issues, files and other pages below a repository are not the repository
+    path_parts = [part for part in parsed.path.split("/") if part]
+    if len(path_parts) != 2:
+        return None
+
+    repo_info = parse_github_url(str(url))
+    if not repo_info or repo_info["owner"].lower() in RESERVED_OWNERS:
+        return None
+    repo = repo_info["repo"]
+    if repo.endswith(".git"):
+        repo = repo[:-4]
+    return repo_info["owner"], repo
+
+
+def github_graphql_enabled() -> bool:
+    """
+    The GraphQL API needs a token; without one every URL is scraped.
+    """
+    return settings.GITHUB_GRAPHQL_ENABLED and bool(_github_token())
+
+
+def _github_token() -> Optional[str]:
+    return settings.GITHUB_ACCESS_TOKEN or settings.GITHUB_TOKEN or None
+
+
+def repository_metadata(repository: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Map a GraphQL repository node onto the site metadata fields.
+    """
+    topics = [node["topic"]["name"] for node in repository["repositoryTopics"]["nodes"]]
+    language = repository["primaryLanguage"]["name"] if repository.get("primaryLanguage") else None
+    return {
+        "title": repository["nameWithOwner"],
+        "description": repository.get("description"),
+        "keywords": topics,
+        "error": None,
+        "error_class": None,
+        "github": {
+            "stars": repository["stargazerCount"],
+            "language": language,
+            "topics": topics,
+            "archived": repository["isArchived"],
+            "homepage": repository.get("homepageUrl") or None,
+            "url": repository["url"],
+        },
+    }
+
+
+def _build_query(repos: List[Tuple[str, str]]) -> Tuple[str, Dict[str, str]]:
+    arguments = []
+    selections = []
+    variables = {}
+    for index, (owner, name) in enumerate(repos):
+        arguments.append(f"$owner{index}: String!, $name{index}: String!")
+        selections.append(f"r{index}: repository(owner: $owner{index}, name: $name{index}) {{ {REPOSITORY_FIELDS} }}")
+        variables[f"owner{index}"] = owner
+        variables[f"name{index}"] = name
+    query = f"query({', '.join(arguments)}) {{ {' '.join(selections)} }}"
+    return query, variables
+
+
+async def query_repositories(
+    repos: List[Tuple[str, str]]
+) -> List[Union[None, Dict[str, Any], GitHubGraphQLUnavailable]]:
+    """
+    Look up repositories in one GraphQL query.
+
+    Args:
+        repos: (owner, name) pairs, at most GITHUB_GRAPHQL_BATCH_SIZE
+
+    Returns:
+        The repository node for each pair, None when it does not exist, or a
+        GitHubGraphQLUnavailable when the API reported an error for that repository
+
+    Raises:
+        GitHubGraphQLUnavailable: When the API request itself fails
+    """
+    query, variables = _build_query(repos)
+    try:
+        response = await async_request(
+            "POST",
+            settings.GITHUB_GRAPHQL_URL,
+            json={"query": query, "variables": variables},
+            headers={"Authorization": f"bearer {_github_token()}"},
+        )
+    except Exception as e:
+        raise GitHubGraphQLUnavailable(f"GitHub GraphQL request failed: {str(e) or e.__class__.__name__}")
+    if response.status_code != 200:
+        raise GitHubGraphQLUnavailable(f"GitHub GraphQL returned {response.status_code}")
+
+    try:
+        payload = response.json()
+    except ValueError:
+        raise GitHubGraphQLUnavailable("GitHub GraphQL returned invalid JSON")
+    data = payload.get("data")
+    if data is None:
+        raise GitHubGraphQLUnavailable(f"GitHub GraphQL errors: {payload.get('errors')}")
+
+    results = [data.get(f"r{index}") for index in range(len(repos))]
+    aliases = {f"r{index}": index for index in range(len(repos))}
+    # Missing repositories come back as null with a NOT_FOUND error. Other errors
+    # fail the repository their path points at, or the batch when they have no path
+    for error in payload.get("errors") or []:
+        if error.get("type") == "NOT_FOUND":
+            continue
+        path = error.get("path") or []
+        index = aliases.get(path[0]) if path else None
+        if index is None:
+            raise GitHubGraphQLUnavailable(f"GitHub GraphQL error: {error.get('message')}")
+        results[index] = GitHubGraphQLUnavailable(f"GitHub GraphQL error: {error.get('message')}")
+    return results
+
+
+class GitHubRepoBatcher:
+    """
+    Collects concurrent repository lookups into batched GraphQL queries.
+    """
+
+    def __init__(self):
+        self._pending: Dict[Tuple[str, str], List[asyncio.Future]] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # The loop keeps only weak references to tasks; hold running queries here
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def fetch(self, owner: str, repo: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up one repository, sharing a query with concurrent lookups.
+
+        Returns:
+            The repository node, or None when it does not exist
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        key = (owner.lower(), repo.lower())
+        self._pending.setdefault(key, []).append(future)
+
+        if len(self._pending) >= settings.GITHUB_GRAPHQL_BATCH_SIZE:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(settings.GITHUB_GRAPHQL_BATCH_WAIT_MS / 1000.0, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending = self._pending, {}
+        if pending:
+            task = asyncio.get_running_loop().create_task(self._run(pending))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, pending: Dict[Tuple[str, str], List[asyncio.Future]]) -> None:
+        repos = list(pending)
+        try:
+            # The query serves every waiting request, not just the one whose
+            # context scheduled the flush
+            with no_deadline():
+                results = await query_repositories(repos)
+        except Exception as e:
+            if not isinstance(e, GitHubGraphQLUnavailable):
+                e = GitHubGraphQLUnavailable(f"GitHub GraphQL lookup failed: {str(e) or e.__class__.__name__}")
+            for futures in pending.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+
+        for repo, result in zip(repos, results):
+            for future in pending[repo]:
+                if future.done():
+                    continue
+                if isinstance(result, GitHubGraphQLUnavailable):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+
+_batcher: Optional[GitHubRepoBatcher] = None
+_batcher_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_github_batcher() -> GitHubRepoBatcher:
+    """
+    Get the repository batcher for the running event loop.
+    """
+    global _batcher, _batcher_loop
+    loop = asyncio.get_running_loop()
+    if _batcher is None or _batcher_loop is not loop:
+        # Pending futures and the flush timer belong to one loop
+        _batcher = GitHubRepoBatcher()
+        _batcher_loop = loop
+    return _batcher
+
+
+async def fetch_github_metadata(owner: str, repo: str) -> Dict[str, Any]:
+    """
+    Fetch site metadata for a GitHub repository through the GraphQL API.
+
+    Args:
+        owner: Repository owner
+        repo: Repository name
+
+    Returns:
+        A dictionary containing metadata fields plus a `github` section
+
+    Raises:
+        GitHubGraphQLUnavailable: When the API cannot answer
+    """
+    repository = await get_github_batcher().fetch(owner, repo)
+    if repository is None:
+        return {
+            "title": f"{owner}/{repo}",
+            "description": None,
+            "keywords": [],
+            "error": f"GitHub repository {owner}/{repo} not found",
+            "error_class": "http_404",
+        }
+    return repository_metadata(repository)
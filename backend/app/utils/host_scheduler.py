@@ -0,0 +1,317 @@
+"""
+Per-host politeness scheduler for outbound requests.
+
+Every request to a host takes a token from that host's bucket and one of its
+concurrency slots. The concurrency limit adapts with AIMD: it grows by about
+one slot per window of fast, successful responses and is cut multiplicatively
+on 429s, 5xx responses, transport errors and responses much slower than the
+host's usual latency. A Retry-After header pauses the host until it expires.
+
+Callers waiting for a slot sleep until one is freed; callers waiting for a
+token or a Retry-After pause sleep until then. Nothing polls.
+Requests cancelled by the caller or cut off at the caller's deadline free
+their slot without adapting the limit: they say nothing about the host.
+"""
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import httpx
+
+from app.core.config import settings
+from app.utils.deadline import DeadlineExceeded, remaining
+
+# Responses signalling that the host wants us to slow down
+THROTTLE_STATUSES = {429, 503}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header into seconds from now.
+
+    Args:
+        value: Header value, either delay-seconds or an HTTP date
+
+    Returns:
+        Seconds to wait, or None when the header is missing or invalid
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class HostState:
+    """
+    Token bucket, adaptive concurrency limit and latency estimate for one host.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.refilled_at = time.monotonic()
+        self.limit = float(settings.HTTP_HOST_INITIAL_CONCURRENCY)
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self.latency: Optional[float] = None
+        self.requests = 0
+        self.throttled = 0
+        self.errors = 0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.refilled_at) * self.rate)
+        self.refilled_at = now
+
+    def try_acquire(self, now: float) -> Optional[float]:
+        """
+        Take a token and a slot if both are free.
+
+        Returns:
+            0 when acquired, None when every slot is taken (wait for a release),
+            otherwise how long to wait before trying again
+        """
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.in_flight >= int(self.limit):
+            return None
+        self._refill(now)
+        if self.tokens < 1:
+            return (1 - self.tokens) / self.rate
+        self.tokens -= 1
+        self.in_flight += 1
+        self.requests += 1
+        return 0.0
+
+    def release(self, status: Optional[int], latency: float, retry_after: Optional[float]) -> None:
+        """
+        Free a slot and adapt the concurrency limit to the outcome.
+
+        Args:
+            status: HTTP status, or None when the request failed without a response
+            latency: Seconds until the response headers arrived
+            retry_after: Parsed Retry-After header, if any
+        """
+        self.in_flight -= 1
+        min_limit = 1.0
+        max_limit = float(settings.HTTP_MAX_CONNECTIONS_PER_HOST)
+
+        if status is None or status in THROTTLE_STATUSES or status >= 500:
+            if status in THROTTLE_STATUSES:
+                self.throttled += 1
+            else:
+                self.errors += 1
+            self.limit = max(min_limit, self.limit * settings.HTTP_HOST_DECREASE_FACTOR)
+            if retry_after is not None:
+                pause = min(retry_after, settings.HTTP_MAX_RETRY_AFTER_SECONDS)
+                self.blocked_until = max(self.blocked_until, time.monotonic() + pause)
+            return
+
+        if self.latency is not None and latency > self.latency * settings.HTTP_HOST_SLOW_FACTOR:
+            # Much slower than usual: the host is queueing our requests
+            self.limit = max(min_limit, self.limit * settings.HTTP_HOST_SLOW_DECREASE_FACTOR)
+        else:
+            self.limit = min(max_limit, self.limit + 1.0 / self.limit)
+
+        self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+
+    def abandon(self) -> None:
+        """
+        Free a slot without adapting, for requests cancelled by the caller.
+        """
+        self.in_flight -= 1
+
+    def stats(self, now: float) -> Dict[str, Any]:
+        self._refill(now)
+        return {
+            "concurrency_limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "tokens": round(self.tokens, 2),
+            "rate_per_second": self.rate,
+            "paused_for_seconds": round(max(0.0, self.blocked_until - now), 2),
+            "avg_latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "errors": self.errors,
+        }
+
+
+class HostSlot:
+    """
+    Handle for one scheduled request; records its outcome on release.
+    """
+
+    def __init__(self, scheduler: "HostScheduler", host: str):
+        self.scheduler = scheduler
+        self.host = host
+        self.started_at = time.monotonic()
+        self.released = False
+
+    def record(self, response: httpx.Response) -> None:
+        """
+        Release the slot with the response's status and Retry-After header.
+        """
+        self._release(response.status_code, parse_retry_after(response.headers.get("Retry-After")))
+
+    def fail(self) -> None:
+        """
+        Release the slot for a request that got no response.
+        """
+        self._release(None, None)
+
+    def abandon(self) -> None:
+        """
+        Release the slot without judging the host.
+        """
+        if not self.released:
+            self.released = True
+            self.scheduler.abandon(self.host)
+
+    def _release(self, status: Optional[int], retry_after: Optional[float]) -> None:
+        if not self.released:
+            self.released = True
+            self.scheduler.release(self.host, status, time.monotonic() - self.started_at, retry_after)
+
+
+class HostScheduler:
+    """
+    Schedules outbound requests per host, for both async code and worker threads.
+    """
+
+    def __init__(self):
+        self._hosts: Dict[str, HostState] = {}
+        self._lock = threading.Lock()
+        # Wakes threads waiting in sync_slot when any slot is freed
+        self._released = threading.Condition(self._lock)
+        # Host -> events of coroutines waiting in async_slot, with their loops
+        self._async_waiters: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]]] = {}
+
+    def _state(self, host: str) -> HostState:
+        state = self._hosts.get(host)
+        if state is None:
+            rate = settings.HTTP_HOST_RATE_OVERRIDES.get(host, settings.HTTP_HOST_RATE_PER_SECOND)
+            state = self._hosts[host] = HostState(rate=rate, burst=settings.HTTP_HOST_BURST)
+        return state
+
+    def _wake(self, host: str) -> None:
+        # Called with the lock held, after a slot of host was freed
+        self._released.notify_all()
+        for loop, event in self._async_waiters.pop(host, []):
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # The waiter's loop is closed
+                pass
+
+    def release(self, host: str, status: Optional[int], latency: float, retry_after: Optional[float]) -> None:
+        with self._lock:
+            self._state(host).release(status, latency, retry_after)
+            self._wake(host)
+
+    def abandon(self, host: str) -> None:
+        with self._lock:
+            self._state(host).abandon()
+            self._wake(host)
+
+    @asynccontextmanager
+    async def async_slot(self, url: str):
+        """
+        Wait for the URL's host to accept a request, without blocking the event loop.
+        """
+        host = urlparse(str(url)).netloc.lower()
+        loop = asyncio.get_running_loop()
+        while True:
+            released = asyncio.Event()
+            with self._lock:
+                wait = self._state(host).try_acquire(time.monotonic())
+                if wait is None:
+                    self._async_waiters.setdefault(host, []).append((loop, released))
+            if wait == 0:
+                break
+            if wait is not None:
+                await asyncio.sleep(wait)
+                continue
+            try:
+                await released.wait()
+            finally:
+                with self._lock:
+                    waiters = self._async_waiters.get(host, [])
+                    if (loop, released) in waiters:
+                        waiters.remove((loop, released))
+
+        slot = HostSlot(self, host)
+        try:
+            yield slot
+        except (asyncio.CancelledError, DeadlineExceeded):
+            slot.abandon()
+            raise
+        except Exception:
+            slot.fail()
+            raise
+        finally:
+            slot.abandon()
+
+    @contextmanager
+    def sync_slot(self, url: str):
+        """
+        Wait for the URL's host to accept a request, from a worker thread.
+
+        Raises:
+            DeadlineExceeded: When the caller's deadline passes while waiting
+        """
+        host = urlparse(str(url)).netloc.lower()
+        with self._released:
+            while True:
+                wait = self._state(host).try_acquire(time.monotonic())
+                if wait == 0:
+                    break
+                # Wait no longer than the caller's deadline; without either
+                # timeout, wait until a slot is freed
+                left = remaining()
+                if left is not None:
+                    if left <= 0:
+                        raise DeadlineExceeded()
+                    wait = left if wait is None else min(wait, left)
+                self._released.wait(wait)
+
+        slot = HostSlot(self, host)
+        try:
+            yield slot
+        except DeadlineExceeded:
+            slot.abandon()
+            raise
+        except Exception:
+            slot.fail()
+            raise
+        finally:
+            slot.abandon()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Current scheduling state of every host seen so far.
+        """
+        now = time.monotonic()
+        with self._lock:
+            return {host: state.stats(now) for host, state in self._hosts.items()}
+
+
+def should_retry(response: httpx.Response) -> bool:
+    """
+    Whether a throttled response asks to be retried within an acceptable delay.
+    """
+    if response.status_code not in THROTTLE_STATUSES:
+        return False
+    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+    return retry_after is not None and retry_after <= settings.HTTP_MAX_RETRY_AFTER_SECONDS
+
+
+host_scheduler = HostScheduler()
@@ -0,0 +1,252 @@
+"""
+Shared outbound HTTP clients.
+
+All outbound calls go through one async and one sync client so connections,
+TLS sessions and HTTP/2 streams are reused instead of being set up per call.
+The FastAPI lifespan opens and closes them; scripts and tests get them lazily.
+
+SDKs that send requests themselves (OpenAI) get a client on the same
+connection pool whose transport schedules every request per host, so they
+are throttled like requests made with async_request.
+"""
+import asyncio
+import logging
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from functools import lru_cache
+from typing import Optional, Tuple, Union
+
+import httpx
+
+from app.core.config import settings
+from app.utils.deadline import DeadlineExceeded, capped_timeout, enforce_deadline, remaining
+from app.utils.host_scheduler import host_scheduler, should_retry
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+try:
+    from github import Github
+    GITHUB_AVAILABLE = True
+except ImportError:
+    # Github module might not be available during testing
+    GITHUB_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+_async_client: Optional[httpx.AsyncClient] = None
+_scheduled_async_client: Optional[httpx.AsyncClient] = None
+_async_client_loop: Optional[asyncio.AbstractEventLoop] = None
+_sync_client: Optional[httpx.Client] = None
+_sync_lock = threading.Lock()
+
+
+def _transport_options() -> dict:
+    return {
+        "http2": settings.HTTP2_ENABLED and HTTP2_AVAILABLE,
+        "limits": httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+    }
+
+
+def _client_options() -> dict:
+    return {
+        **_transport_options(),
+        "timeout": httpx.Timeout(settings.HTTP_TIMEOUT_SECONDS, connect=settings.HTTP_CONNECT_TIMEOUT_SECONDS),
+    }
+
+
+class ScheduledAsyncTransport(httpx.AsyncBaseTransport):
+    """
+    Transport that takes a host slot for every request it sends.
+
+    For clients handed to SDKs, whose requests do not go through async_request.
+    The slot is released when the response headers arrive, with their status
+    and Retry-After header.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        async with host_scheduler.async_slot(request.url) as slot:
+            try:
+                response = await self._transport.handle_async_request(request)
+            except httpx.TimeoutException as e:
+                left = remaining()
+                if left is not None and left <= 0:
+                    # Cut off at the caller's deadline, not the host's fault
+                    raise DeadlineExceeded() from e
+                raise
+            slot.record(response)
+            return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """
+    Get the shared async client for the running event loop.
+    """
+    global _async_client, _scheduled_async_client, _async_client_loop
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client.is_closed or _async_client_loop is not loop:
+        # Pooled connections belong to the loop that opened them
+        options = _client_options()
+        transport = httpx.AsyncHTTPTransport(**_transport_options())
+        _async_client = httpx.AsyncClient(transport=transport, timeout=options["timeout"])
+        _scheduled_async_client = httpx.AsyncClient(
+            transport=ScheduledAsyncTransport(transport), timeout=options["timeout"]
+        )
+        _async_client_loop = loop
+    return _async_client
+
+
+def get_scheduled_async_client() -> httpx.AsyncClient:
+    """
+    Get an async client for SDKs: same connection pool as get_async_client(),
+    with every request scheduled per host.
+    """
+    get_async_client()
+    return _scheduled_async_client
+
+
+def _with_deadline(client: Union[httpx.AsyncClient, httpx.Client], kwargs: dict) -> Tuple[dict, bool]:
+    # Cap the call's timeouts at the time left until the request's deadline;
+    # also tells whether that shortened them
+    timeout = kwargs.get("timeout", client.timeout)
+    capped = capped_timeout(timeout)
+    return {**kwargs, "timeout": capped}, capped != timeout
+
+
+@contextmanager
+def _deadline_timeouts(shortened: bool):
+    # A timeout shortened by the caller's deadline says nothing about the host:
+    # raise DeadlineExceeded, which the host scheduler does not count as a failure
+    try:
+        yield
+    except httpx.TimeoutException as e:
+        if shortened:
+            raise DeadlineExceeded() from e
+        raise
+
+
+def get_sync_client() -> httpx.Client:
+    """
+    Get the shared sync client, for code running in worker threads.
+    """
+    global _sync_client
+    with _sync_lock:
+        if _sync_client is None or _sync_client.is_closed:
+            _sync_client = httpx.Client(**_client_options())
+        return _sync_client
+
+
+async def async_request(method: str, url: str, **kwargs) -> httpx.Response:
+    """
+    Send a request with the shared async client, scheduled per host.
+
+    Throttled responses with a short Retry-After are retried once the host
+    accepts requests again. Under a deadline (see app.utils.deadline) the
+    whole call, waits included, is cut off with DeadlineExceeded.
+    """
+    async with enforce_deadline():
+        for attempt in range(settings.HTTP_MAX_RETRIES + 1):
+            async with host_scheduler.async_slot(url) as slot:
+                client = get_async_client()
+                call_kwargs, shortened = _with_deadline(client, kwargs)
+                with _deadline_timeouts(shortened):
+                    response = await client.request(method, url, **call_kwargs)
+                slot.record(response)
+            if attempt == settings.HTTP_MAX_RETRIES or not should_retry(response):
+                return response
+
+
+@asynccontextmanager
+async def async_stream(method: str, url: str, **kwargs):
+    """
+    Stream a response with the shared async client, scheduled per host.
+
+    Leaving the block early closes the response without reading the rest of the
+    body. Under a deadline, the block is cut off with DeadlineExceeded too.
+    """
+    async with enforce_deadline():
+        for attempt in range(settings.HTTP_MAX_RETRIES + 1):
+            async with host_scheduler.async_slot(url) as slot:
+                client = get_async_client()
+                call_kwargs, shortened = _with_deadline(client, kwargs)
+                with _deadline_timeouts(shortened):
+                    async with client.stream(method, url, **call_kwargs) as response:
+                        slot.record(response)
+                        if attempt < settings.HTTP_MAX_RETRIES and should_retry(response):
+                            continue
+                        yield response
+                        return
+
+
+def sync_request(method: str, url: str, **kwargs) -> httpx.Response:
+    """
+    Send a request with the shared sync client, scheduled per host.
+
+    Under a deadline, each attempt's timeouts are capped at the time left and
+    no attempt starts once it has passed (DeadlineExceeded).
+    """
+    for attempt in range(settings.HTTP_MAX_RETRIES + 1):
+        with host_scheduler.sync_slot(url) as slot:
+            client = get_sync_client()
+            call_kwargs, shortened = _with_deadline(client, kwargs)
+            with _deadline_timeouts(shortened):
+                response = client.request(method, url, **call_kwargs)
+            slot.record(response)
+        if attempt == settings.HTTP_MAX_RETRIES or not should_retry(response):
+            return response
+
+
+@lru_cache(maxsize=None)
+def get_github_client(token: Optional[str] = None) -> "Github":
+    """
+    Get a cached PyGithub client, so its connection pool is reused across calls.
+
+    Args:
+        token: GitHub access token; anonymous when empty
+
+    Returns:
+        Github client
+    """
+    if not GITHUB_AVAILABLE:
+        raise ImportError("PyGithub is not installed. Please install it with 'pip install pygithub'")
+    return Github(token or None, pool_size=settings.HTTP_MAX_CONNECTIONS_PER_HOST)
+
+
+async def open_http_clients() -> None:
+    """
+    Create the shared clients; called from the application lifespan.
+    """
+    get_async_client()
+    get_sync_client()
+    logger.info(f"Opened shared HTTP clients (http2={settings.HTTP2_ENABLED and HTTP2_AVAILABLE})")
+
+
+async def close_http_clients() -> None:
+    """
+    Close the shared clients and their pooled connections.
+    """
+    global _async_client, _scheduled_async_client, _async_client_loop, _sync_client
+    if _async_client is not None:
+        # Also closes the pool under the scheduled client
+        await _async_client.aclose()
+    with _sync_lock:
+        if _sync_client is not None:
+            _sync_client.close()
+        _sync_client = None
+    _async_client = None
+    _scheduled_async_client = None
+    _async_client_loop = None
+    get_github_client.cache_clear()
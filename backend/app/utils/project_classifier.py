@@ -0,0 +1,386 @@
+"""
+Per-list multinomial naive Bayes categorizer trained on the list's projects.
+
+Every project's title and description is a training document for its
+category, and every category name is one more, so empty categories can still
+be suggested. The model is a sparse token -> {category: count} table plus
+per-category totals; it is built from the database on first use and then
+updated in place as projects are added, edited, moved or deleted.
+
+Raw naive Bayes posteriors are overconfident, so they are tempered with a
+temperature fitted on leave-one-out predictions of the training projects.
+"""
+import math
+import re
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlparse
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.category import Category
+from app.models.project import Project
+from app.utils.category_index import ALL_LISTS, LIST_ID_OPTION, ListModelCache, category_dependent_caches
+
+# Words too common in project descriptions to tell categories apart
+STOP_WORDS = {
+    "and", "for", "the", "with", "that", "this", "from", "your", "you", "are",
+    "its", "into", "using", "use", "based", "written", "simple", "awesome",
+    "http", "https", "www", "com", "org", "github",
+}
+
+# Temperatures tried when calibrating
+TEMPERATURES = [1.0, 1.5, 2.0, 3.0, 4.0, 6.0, 8.0, 12.0, 16.0]
+
+# Session.info key collecting project changes to apply on commit
+PENDING_UPDATES_KEY = "project_classifier_updates"
+# SAVEPOINT -> number of pending updates when it began
+SAVEPOINT_MARKS_KEY = "project_classifier_savepoints"
+
+
+class BulkChange(NamedTuple):
+    """
+    Pending change from a bulk statement: the model of the list is rebuilt.
+    """
+    list_id: Optional[int]
+
+
+def text_tokens(*texts: Optional[str]) -> Counter:
+    """
+    Count the lowercase word tokens of some texts, without stop words.
+    """
+    tokens: Counter = Counter()
+    for text in texts:
+        if text:
+            tokens.update(
+                token for token in re.findall(r"[a-z0-9]+", text.lower())
+                if len(token) > 2 and token not in STOP_WORDS and not token.isdigit()
+            )
+    return tokens
+
+
+def url_tokens(url: str, description: Optional[str] = None, title: Optional[str] = None) -> Counter:
+    """
+    Count the tokens of a URL's path, title and description.
+    """
+    return text_tokens(urlparse(url).path.replace("/", " "), title, description)
+
+
+class ProjectClassifier:
+    """
+    Multinomial naive Bayes over project tokens, for one list.
+
+    Attributes:
+        token_counts: Token -> {category ID: occurrences}
+        category_tokens: Category ID -> total token occurrences
+        category_documents: Category ID -> training documents
+        projects: Training projects, not counting category names
+        temperature: Divides log posteriors before normalizing
+    """
+
+    def __init__(self, alpha: Optional[float] = None):
+        self.alpha = settings.CLASSIFIER_ALPHA if alpha is None else alpha
+        self.token_counts: Dict[str, Dict[int, int]] = {}
+        self.category_tokens: Dict[int, int] = {}
+        self.category_documents: Dict[int, int] = {}
+        self.projects = 0
+        self.temperature = 1.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(
+        cls,
+        categories: Iterable[Tuple[int, str]],
+        projects: Iterable[Tuple[int, Optional[str], Optional[str]]],
+    ) -> "ProjectClassifier":
+        """
+        Train a model and calibrate its confidence.
+
+        Args:
+            categories: (id, name) pairs
+            projects: (category_id, title, description) triples
+
+        Returns:
+            The trained model
+        """
+        model = cls()
+        for category_id, name in categories:
+            model.category_documents.setdefault(category_id, 0)
+            model.category_tokens.setdefault(category_id, 0)
+            model._update(category_id, text_tokens(name), 1, is_project=False)
+
+        documents = []
+        for category_id, title, description in projects:
+            if category_id not in model.category_documents:
+                continue
+            tokens = text_tokens(title, description)
+            model._update(category_id, tokens, 1)
+            documents.append((category_id, tokens))
+
+        model.temperature = model._fit_temperature(documents)
+        return model
+
+    def update(self, category_id: int, title: Optional[str], description: Optional[str], sign: int) -> None:
+        """
+        Add (sign=1) or remove (sign=-1) one project.
+        """
+        with self._lock:
+            if category_id in self.category_documents:
+                self._update(category_id, text_tokens(title, description), sign)
+
+    def _update(self, category_id: int, tokens: Counter, sign: int, is_project: bool = True) -> None:
+        self.category_documents[category_id] = self.category_documents.get(category_id, 0) + sign
+        if is_project:
+            self.projects += sign
+        for token, count in tokens.items():
+            counts = self.token_counts.setdefault(token, {})
+            counts[category_id] = counts.get(category_id, 0) + sign * count
+            self.category_tokens[category_id] = self.category_tokens.get(category_id, 0) + sign * count
+            if counts[category_id] <= 0:
+                del counts[category_id]
+                if not counts:
+                    del self.token_counts[token]
+
+    def _log_joint(self, tokens: Counter, exclude: Optional[Tuple[int, Counter]] = None) -> Dict[int, float]:
+        """
+        Log prior plus log likelihood of the tokens for every category.
+
+        Only categories containing a token need a per-token term; the rest
+        share the unseen-token probability, folded into each category's base.
+
+        Args:
+            tokens: Token counts of the document
+            exclude: (category_id, tokens) of a training document to leave out
+
+        Returns:
+            Category ID -> log joint probability
+        """
+        alpha = self.alpha
+        vocabulary = len(self.token_counts)
+        total_documents = sum(self.category_documents.values()) + len(self.category_documents)
+        if exclude:
+            total_documents -= 1
+        known = {token: count for token, count in tokens.items() if token in self.token_counts}
+        length = sum(known.values())
+
+        left_out_category, left_out_tokens = exclude if exclude else (None, Counter())
+        log_alpha = math.log(alpha)
+        scores = {}
+        for category_id, documents in self.category_documents.items():
+            category_tokens = self.category_tokens[category_id]
+            if category_id == left_out_category:
+                documents -= 1
+                category_tokens -= sum(left_out_tokens.values())
+            prior = math.log((documents + 1) / total_documents)
+            scores[category_id] = prior + length * (log_alpha - math.log(category_tokens + alpha * vocabulary))
+
+        for token, count in known.items():
+            for category_id, occurrences in self.token_counts[token].items():
+                if category_id == left_out_category:
+                    occurrences -= left_out_tokens.get(token, 0)
+                scores[category_id] += count * (math.log(occurrences + alpha) - log_alpha)
+        return scores
+
+    def _fit_temperature(self, documents: List[Tuple[int, Counter]]) -> float:
+        """
+        Pick the temperature minimizing the log loss of leave-one-out predictions.
+        """
+        step = max(1, len(documents) // max(1, settings.CLASSIFIER_CALIBRATION_SAMPLES))
+        samples = []
+        for category_id, tokens in documents[::step]:
+            if not tokens:
+                continue
+            scores = self._log_joint(tokens, exclude=(category_id, tokens))
+            samples.append((scores[category_id], list(scores.values())))
+        if not samples:
+            return 1.0
+
+        def log_loss(temperature: float) -> float:
+            loss = 0.0
+            for true_score, scores in samples:
+                peak = max(scores)
+                normalizer = sum(math.exp((score - peak) / temperature) for score in scores)
+                loss -= (true_score - peak) / temperature - math.log(normalizer)
+            return loss
+
+        return min(TEMPERATURES, key=log_loss)
+
+    def predict(self, tokens: Counter) -> Tuple[Optional[int], float]:
+        """
+        Most probable category of a document and its calibrated probability.
+
+        Returns:
+            (category_id, probability), or (None, 0.0) when no token is known
+        """
+        with self._lock:
+            if not self.category_documents or not any(token in self.token_counts for token in tokens):
+                return None, 0.0
+            scores = self._log_joint(tokens)
+            temperature = self.temperature
+
+        peak = max(scores.values())
+        normalizer = sum(math.exp((score - peak) / temperature) for score in scores.values())
+        best_id = min(category_id for category_id, score in scores.items() if score == peak)
+        return best_id, 1.0 / normalizer
+
+    def score(self, url: str, description: Optional[str] = None) -> Tuple[Optional[int], float]:
+        """
+        Suggest a category for a URL and description, like CategoryIndex.score.
+        """
+        return self.predict(url_tokens(url, description))
+
+    def score_batch(self, items: List[Tuple[str, Optional[str]]]) -> List[Tuple[Optional[int], float]]:
+        """
+        Suggest a category for each (url, description) pair.
+        """
+        return [self.score(url, description) for url, description in items]
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "projects": self.projects,
+            "categories": len(self.category_documents),
+            "vocabulary": len(self.token_counts),
+            "temperature": self.temperature,
+        }
+
+
+project_classifier_cache = ListModelCache("CLASSIFIER_TTL_SECONDS")
+category_dependent_caches.append(project_classifier_cache)
+
+
+def _category_query(list_id: int):
+    return select(Category.id, Category.name).where(Category.list_id == list_id).order_by(Category.id)
+
+
+def _project_query(list_id: int):
+    return (
+        select(Project.category_id, Project.title, Project.description)
+        .where(Project.list_id == list_id)
+        .order_by(Project.id)
+    )
+
+
+def get_project_classifier(db: Session, list_id: int) -> ProjectClassifier:
+    """
+    Get the naive Bayes model of a list, training it on first use.
+
+    Args:
+        db: Database session
+        list_id: The awesome list ID
+
+    Returns:
+        The list's model
+    """
+    model = project_classifier_cache.get(list_id)
+    if model is None:
+        version = project_classifier_cache.version(list_id)
+        categories = db.execute(_category_query(list_id)).all()
+        projects = db.execute(_project_query(list_id)).all()
+        model = ProjectClassifier.build(categories, projects)
+        project_classifier_cache.put(list_id, model, version)
+    return model
+
+
+async def get_project_classifier_async(db: AsyncSession, list_id: int) -> ProjectClassifier:
+    """
+    Async variant of get_project_classifier for use inside async handlers.
+    """
+    model = project_classifier_cache.get(list_id)
+    if model is None:
+        version = project_classifier_cache.version(list_id)
+        categories = (await db.execute(_category_query(list_id))).all()
+        projects = (await db.execute(_project_query(list_id))).all()
+        model = ProjectClassifier.build(categories, projects)
+        project_classifier_cache.put(list_id, model, version)
+    return model
+
+
+def _pending(session: Session) -> list:
+    return session.info.setdefault(PENDING_UPDATES_KEY, [])
+
+
+def _previous(state, attribute: str):
+    history = state.attrs[attribute].history
+    if history.deleted:
+        return history.deleted[0]
+    return history.unchanged[0] if history.unchanged else None
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_project_changes(session: Session, flush_context) -> None:
+    for obj in session.new:
+        if isinstance(obj, Project):
+            _pending(session).append((obj.list_id, obj.category_id, obj.title, obj.description, 1))
+    for obj in session.deleted:
+        if isinstance(obj, Project):
+            _pending(session).append((obj.list_id, obj.category_id, obj.title, obj.description, -1))
+    for obj in session.dirty:
+        if not isinstance(obj, Project):
+            continue
+        state = inspect(obj)
+        fields = ("list_id", "category_id", "title", "description")
+        if not any(state.attrs[field].history.has_changes() for field in fields):
+            continue
+        # A moved or edited project leaves its old category and joins the new one
+        previous = [_previous(state, field) for field in fields]
+        _pending(session).append((*previous, -1))
+        _pending(session).append((obj.list_id, obj.category_id, obj.title, obj.description, 1))
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk_project_changes(orm_execute_state) -> None:
+    # Bulk updates and deletes do not say which projects they touch, nor which
+    # list unless the statement names it with LIST_ID_OPTION
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, "table", None)
+        if table is not None and table.name == Project.__tablename__:
+            list_id = orm_execute_state.execution_options.get(LIST_ID_OPTION, ALL_LISTS)
+            _pending(orm_execute_state.session).append(BulkChange(list_id))
+
+
+@event.listens_for(Session, "after_transaction_create")
+def _mark_savepoint(session: Session, transaction) -> None:
+    if transaction.nested:
+        session.info.setdefault(SAVEPOINT_MARKS_KEY, {})[transaction] = len(_pending(session))
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_project_changes(session: Session, previous_transaction) -> None:
+    if not previous_transaction.nested:
+        session.info.pop(SAVEPOINT_MARKS_KEY, None)
+        session.info.pop(PENDING_UPDATES_KEY, None)
+        return
+    # A rolled back SAVEPOINT (e.g. a failed WriteQueue job) drops only the
+    # updates flushed inside it; the outer transaction may still commit
+    mark = session.info.get(SAVEPOINT_MARKS_KEY, {}).pop(previous_transaction, None)
+    if mark is not None:
+        del _pending(session)[mark:]
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_project_changes(session: Session) -> None:
+    # Also fired on RELEASE SAVEPOINT; the enclosing job or batch may still roll back
+    if session.in_nested_transaction():
+        return
+    session.info.pop(SAVEPOINT_MARKS_KEY, None)
+    updates = session.info.pop(PENDING_UPDATES_KEY, None)
+    if not updates:
+        return
+    rebuilt = {update.list_id for update in updates if isinstance(update, BulkChange)}
+    if ALL_LISTS in rebuilt:
+        project_classifier_cache.invalidate(ALL_LISTS)
+        return
+    for list_id in rebuilt:
+        project_classifier_cache.invalidate(list_id)
+    for update in updates:
+        if isinstance(update, BulkChange) or update[0] in rebuilt:
+            continue
+        list_id, category_id, title, description, sign = update
+        project_classifier_cache.update(
+            list_id, lambda model: model.update(category_id, title, description, sign)
+        )
+
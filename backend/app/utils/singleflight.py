@@ -0,0 +1,101 @@
+"""
+In-flight request coalescing ("singleflight").
+
+Concurrent callers asking for the same key share one execution of the work:
+the first caller starts it as a task and later callers await that task
+instead of repeating the upstream call. Once it finishes the key is free
+again, so nothing is cached here; callers cache results where they need to.
+
+The shared task is shielded, so a caller that gives up (a disconnected client
+or a spent time budget) does not cancel it for the others. It runs with the
+deadline of the caller that started it; when that deadline cuts it short,
+callers with time left start the work again themselves.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+from app.utils.deadline import DeadlineExceeded, check_deadline, enforce_deadline
+
+logger = logging.getLogger(__name__)
+
+_groups: List["SingleFlight"] = []
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one execution.
+
+    Attributes:
+        name: Name reported with the stats
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._flights: Dict[Hashable, asyncio.Task] = {}
+        self._stats = {"calls": 0, "executions": 0, "coalesced": 0}
+        _groups.append(self)
+
+    def _flight(self, key: Hashable) -> Optional[asyncio.Task]:
+        task = self._flights.get(key)
+        # A task left over from a closed event loop (scripts, tests) is never shared
+        if task is not None and (task.done() or task.get_loop() is not asyncio.get_running_loop()):
+            return None
+        return task
+
+    def _start(self, key: Hashable, work: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        self._stats["executions"] += 1
+        task = asyncio.get_running_loop().create_task(work())
+        self._flights[key] = task
+
+        def finished(done: asyncio.Task) -> None:
+            if self._flights.get(key) is done:
+                del self._flights[key]
+            # Retrieve the outcome, so a failure nobody waited for is not logged as unhandled
+            if not done.cancelled():
+                done.exception()
+
+        task.add_done_callback(finished)
+        return task
+
+    async def do(self, key: Hashable, work: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run work() for key, or wait for the run already in flight.
+
+        Args:
+            key: What identifies the work, e.g. a normalized URL or a prompt hash
+            work: Starts the work; called only when no run is in flight
+
+        Returns:
+            The result of the shared run (the same object for every caller)
+        """
+        self._stats["calls"] += 1
+        while True:
+            check_deadline()
+            task = self._flight(key)
+            started = task is None
+            if started:
+                task = self._start(key, work)
+            else:
+                self._stats["coalesced"] += 1
+            try:
+                async with enforce_deadline():
+                    return await asyncio.shield(task)
+            except DeadlineExceeded:
+                if started:
+                    raise
+                # The caller that started the run had less time left than we do
+                logger.debug(f"{self.name}: shared run for {key!r} ran out of time; running it again")
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Calls, executions, calls served by a run already in flight, and runs in flight.
+        """
+        return {**self._stats, "in_flight": sum(1 for task in self._flights.values() if not task.done())}
+
+
+def singleflight_stats() -> Dict[str, Dict[str, int]]:
+    """
+    Stats of every coalescing group, by name.
+    """
+    return {group.name: group.stats() for group in _groups}
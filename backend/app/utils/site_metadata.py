@@ -1,32 +1,196 @@
 """
 Utility functions to extract website metadata and suggest categories based on site content.
 """
+import codecs
+from html.parser import HTMLParser
 import httpx
-from bs4 import BeautifulSoup
 from urllib.parse import urlparse
 import re
-from typing import Dict, Any, Optional, List, Tuple
+from typing import Dict, Any, Optional, List, Tuple, Union
 import logging
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.models.category import Category
+from app.core.config import settings
+from app.utils.deadline import DeadlineExceeded
+from app.utils.http_client import async_stream
+from app.utils.category_index import CategoryIndex, get_category_index, get_category_index_async
+from app.utils.project_classifier import ProjectClassifier, get_project_classifier, get_project_classifier_async
+from app.utils.github_metadata import (
+    GitHubGraphQLUnavailable,
+    fetch_github_metadata,
+    github_graphql_enabled,
+    github_repo_from_url,
+)
 
 logger = logging.getLogger(__name__)
 
+class HeadMetadataParser(HTMLParser):
+    """
+    Incremental scanner for the metadata in a page's head.
+
+    Fed chunk by chunk as the page streams in. Collects the title, description
+    and keywords, notes when the head is over, and afterwards remembers the
+    first substantial paragraph as a fallback description.
+    """
+
+    # Paragraphs shorter than this are navigation or boilerplate
+    MIN_PARAGRAPH_LENGTH = 50
+
+    # Any other start tag means the head is over, even without </head> or <body>
+    HEAD_TAGS = {"html", "head", "title", "meta", "link", "script", "style", "base", "noscript", "template"}
+
+    def __init__(self):
+        super().__init__()
+        self.title: Optional[str] = None
+        self.description: Optional[str] = None
+        self.og_description: Optional[str] = None
+        self.keywords: List[str] = []
+        self.paragraph: Optional[str] = None
+        self.head_done = False
+        self._title_parts: Optional[List[str]] = None
+        self._paragraph_parts: Optional[List[str]] = None
+
+    @property
+    def done(self) -> bool:
+        """
+        Whether the rest of the page cannot add anything.
+        """
+        return self.head_done and (self.best_description is not None or self.paragraph is not None)
+
+    @property
+    def best_description(self) -> Optional[str]:
+        return self.description or self.og_description
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        if tag not in self.HEAD_TAGS:
+            self.head_done = True
+
+        if tag == "title" and self.title is None and not self.head_done:
+            self._title_parts = []
+        elif tag == "meta":
+            self._handle_meta(dict(attrs))
+        elif tag == "p" and self.paragraph is None:
+            self._end_paragraph()
+            self._paragraph_parts = []
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == "title" and self._title_parts is not None:
+            self.title = "".join(self._title_parts).strip() or None
+            self._title_parts = None
+        elif tag == "head":
+            self.head_done = True
+        elif tag == "p":
+            self._end_paragraph()
+
+    def handle_data(self, data: str) -> None:
+        if self._title_parts is not None:
+            self._title_parts.append(data)
+        if self._paragraph_parts is not None:
+            self._paragraph_parts.append(data)
+
+    def _handle_meta(self, attrs: Dict[str, Optional[str]]) -> None:
+        content = (attrs.get("content") or "").strip()
+        if not content:
+            return
+        name = (attrs.get("name") or "").lower()
+        if name == "description" and self.description is None:
+            self.description = content
+        elif name == "keywords" and not self.keywords:
+            self.keywords = [k.strip() for k in content.split(",")]
+        elif (attrs.get("property") or "").lower() == "og:description" and self.og_description is None:
+            self.og_description = content
+
+    def _end_paragraph(self) -> None:
+        if self._paragraph_parts is None:
+            return
+        text = "".join(self._paragraph_parts).strip()
+        self._paragraph_parts = None
+        if len(text) > self.MIN_PARAGRAPH_LENGTH:
+            self.paragraph = text
+
+
+def parse_head_metadata(html: str) -> Dict[str, Any]:
+    """
+    Extract metadata from an HTML document or document prefix.
+
+    Args:
+        html: HTML text
+
+    Returns:
+        A dictionary with title, description and keywords
+    """
+    parser = HeadMetadataParser()
+    parser.feed(html)
+    parser.close()
+    return _parser_metadata(parser)
+
+
+def _parser_metadata(parser: HeadMetadataParser) -> Dict[str, Any]:
+    description = parser.best_description
+    if not description and parser.paragraph:
+        text = parser.paragraph
+        description = text[:300] + "..." if len(text) > 300 else text
+    return {
+        "title": parser.title,
+        "description": description,
+        "keywords": parser.keywords,
+    }
+
+
+def classify_fetch_error(error: Exception) -> str:
+    """
+    Classify a fetch failure, so retries can be scheduled per kind of failure.
+
+    Args:
+        error: Exception raised while fetching
+
+    Returns:
+        One of "timeout", "connect", "http_<status>", "redirect", "transport" or "other"
+    """
+    if isinstance(error, httpx.TimeoutException):
+        return "timeout"
+    if isinstance(error, httpx.ConnectError):
+        return "connect"
+    if isinstance(error, httpx.HTTPStatusError):
+        return f"http_{error.response.status_code}"
+    if isinstance(error, httpx.TooManyRedirects):
+        return "redirect"
+    if isinstance(error, httpx.HTTPError):
+        return "transport"
+    return "other"
+
+
 async def fetch_site_metadata(url: str) -> Dict[str, Any]:
     """
     Fetch metadata from a website including title, description, and keywords.
 
+    The page is streamed and scanned as it arrives. Reading stops once the head
+    is over and a description was found, or after METADATA_MAX_BYTES, so large
+    pages are never downloaded in full.
+
+    GitHub repository URLs are answered by the GraphQL API instead, batched
+    with concurrent lookups, and fall back to the page when the API is unavailable.
+
     Args:
         url: The URL to fetch metadata from
 
     Returns:
         A dictionary containing metadata fields
     """
+    repo = github_repo_from_url(url)
+    if repo and github_graphql_enabled():
+        try:
+            return await fetch_github_metadata(*repo)
+        except GitHubGraphQLUnavailable as e:
+            logger.warning(f"Scraping {url} instead: {str(e)}")
+
     metadata = {
         "title": None,
         "description": None,
         "keywords": [],
-        "error": None
+        "error": None,
+        "error_class": None
     }
 
     try:
@@ -34,45 +198,29 @@ async def fetch_site_metadata(url: str) -> Dict[str, Any]:
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
         }
 
-        # Use an asynchronous approach
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers, timeout=10.0)
+        parser = HeadMetadataParser()
+        async with async_stream("GET", url, headers=headers) as response:
             response.raise_for_status()
 
-            # Get the response text
-            text = response.text
-
-            # Create BeautifulSoup object from response text
-            soup = BeautifulSoup(text, 'html.parser')
-
-            # Try to get title
-            if soup.title:
-                metadata["title"] = soup.title.string.strip()
-
-            # Try to get description from meta tags
-            description_meta = soup.find("meta", attrs={"name": "description"}) or soup.find("meta", attrs={"property": "og:description"})
-            if description_meta and description_meta.get("content"):
-                metadata["description"] = description_meta["content"].strip()
-
-            # Try to get keywords from meta tags
-            keywords_meta = soup.find("meta", attrs={"name": "keywords"})
-            if keywords_meta and keywords_meta.get("content"):
-                keywords = [k.strip() for k in keywords_meta["content"].split(",")]
-                metadata["keywords"] = keywords
-
-            # If no metadata found, try to extract some content
-            if not metadata["description"]:
-                # Try to get first paragraph with meaningful content
-                paragraphs = soup.find_all('p')
-                for p in paragraphs:
-                    text = p.text.strip()
-                    if len(text) > 50:  # Only consider paragraphs with substantial content
-                        metadata["description"] = text[:300] + "..." if len(text) > 300 else text
-                        break
+            decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+            received = 0
+            async for chunk in response.aiter_bytes():
+                chunk = chunk[:settings.METADATA_MAX_BYTES - received]
+                received += len(chunk)
+                parser.feed(decoder.decode(chunk))
+                if parser.done or received >= settings.METADATA_MAX_BYTES:
+                    break
+
+        metadata.update(_parser_metadata(parser))
 
+    except DeadlineExceeded:
+        # Not the site's fault; the caller reports the URL as not attempted
+        raise
     except Exception as e:
         logger.error(f"Error fetching metadata for {url}: {str(e)}")
-        metadata["error"] = str(e)
+        # Timeouts stringify to an empty message
+        metadata["error"] = str(e) or e.__class__.__name__
+        metadata["error_class"] = classify_fetch_error(e)
 
         # Try to get at least a title from the URL
         if not metadata["title"]:
@@ -87,6 +235,36 @@ async def fetch_site_metadata(url: str) -> Dict[str, Any]:
     return metadata
 
 
+def get_category_suggester(db: Session, list_id: int) -> Union[ProjectClassifier, CategoryIndex]:
+    """
+    Get the model suggesting categories for a list.
+
+    Lists with enough projects use the naive Bayes model trained on them;
+    smaller lists match against category names.
+
+    Args:
+        db: Database session
+        list_id: The awesome list ID
+
+    Returns:
+        A model with score(url, description) and score_batch(items)
+    """
+    model = get_project_classifier(db, list_id)
+    if model.projects >= settings.CLASSIFIER_MIN_PROJECTS:
+        return model
+    return get_category_index(db, list_id)
+
+
+async def get_category_suggester_async(db: AsyncSession, list_id: int) -> Union[ProjectClassifier, CategoryIndex]:
+    """
+    Async variant of get_category_suggester for use inside async handlers.
+    """
+    model = await get_project_classifier_async(db, list_id)
+    if model.projects >= settings.CLASSIFIER_MIN_PROJECTS:
+        return model
+    return await get_category_index_async(db, list_id)
+
+
 def suggest_category(db: Session, list_id: int, url: str, description: Optional[str] = None) -> Tuple[Optional[int], float]:
     """
     Suggest a category for a new link based on the URL and description.
@@ -100,58 +278,40 @@ def suggest_category(db: Session, list_id: int, url: str, description: Optional[
     Returns:
         A tuple containing (suggested_category_id, confidence_score)
     """
-    # Get all categories for this list
-    categories = db.query(Category).filter(Category.list_id == list_id).all()
-    if not categories:
-        return None, 0.0
-
-    # Extract domain and path components from URL
-    parsed_url = urlparse(url)
-    domain = parsed_url.netloc.lower()
-    path_components = [p.lower() for p in parsed_url.path.split('/') if p]
-
-    # Keywords to match from the URL and description
-    keywords = set()
-
-    # Add domain keywords
-    domain_parts = domain.split('.')
-    keywords.update(domain_parts)
-
-    # Add path keywords
-    for component in path_components:
-        # Split on non-alphanumeric chars and add as keywords
-        parts = re.split(r'[^a-zA-Z0-9]', component)
-        keywords.update([p.lower() for p in parts if p])
-
-    # Add description keywords if available
-    if description:
-        # Extract meaningful words (longer than 3 chars)
-        desc_words = re.findall(r'\b[a-zA-Z]{4,}\b', description.lower())
-        keywords.update(desc_words)
-
-    # Score each category
-    best_category_id = None
-    best_score = 0.0
-
-    for category in categories:
-        score = 0.0
-
-        # Split category name into keywords
-        category_keywords = set(re.split(r'[^a-zA-Z0-9]', category.name.lower()))
-        category_keywords = {k for k in category_keywords if len(k) > 2}  # Only meaningful words
-
-        # Calculate match score
-        for keyword in keywords:
-            if keyword in category.name.lower():
-                score += 1.0
-            elif any(keyword in ck for ck in category_keywords):
-                score += 0.5
-
-        # Normalize score based on number of keywords
-        normalized_score = score / max(1, len(keywords))
-
-        if normalized_score > best_score:
-            best_score = normalized_score
-            best_category_id = category.id
-
-    return best_category_id, min(best_score, 1.0)  # Cap confidence at 1.0
+    return get_category_suggester(db, list_id).score(url, description)
+
+
+async def suggest_category_async(db: AsyncSession, list_id: int, url: str, description: Optional[str] = None) -> Tuple[Optional[int], float]:
+    """
+    Async variant of suggest_category for use inside async handlers.
+
+    Args:
+        db: Async database session
+        list_id: The awesome list ID
+        url: The URL of the project
+        description: Optional description of the project
+
+    Returns:
+        A tuple containing (suggested_category_id, confidence_score)
+    """
+    suggester = await get_category_suggester_async(db, list_id)
+    return suggester.score(url, description)
+
+
+def score_categories(categories: List[Category], url: str, description: Optional[str] = None) -> Tuple[Optional[int], float]:
+    """
+    Score already loaded categories against a URL and description.
+
+    Builds a throwaway index; callers scoring many URLs should keep the
+    list's cached index from get_category_index instead.
+
+    Args:
+        categories: Categories of the awesome list
+        url: The URL of the project
+        description: Optional description of the project
+
+    Returns:
+        A tuple containing (suggested_category_id, confidence_score)
+    """
+    index = CategoryIndex((category.id, category.name) for category in categories)
+    return index.score(url, description)
@@ -1,14 +1,64 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.api import api_router
 from app.core.config import settings
+from app.db.session import engine, async_engine, async_read_engine, get_shard_registry, get_write_queue
+from app.db.sqlite import is_sqlite_url, sqlite_maintenance_loop
+from app.services import job_handlers  # noqa: F401 - registers the job kinds
+from app.services.job_queue import JobWorker
+from app.utils.http_client import close_http_clients, open_http_clients
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Outbound HTTP shares pooled keep-alive connections for the app's lifetime
+    await open_http_clients()
+
+    # Periodic ANALYZE / PRAGMA optimize keeps SQLite query plans current
+    maintenance_task = None
+    if is_sqlite_url(settings.DATABASE_URL):
+        maintenance_task = asyncio.create_task(sqlite_maintenance_loop(engine))
+
+    # Queued jobs run here too unless dedicated worker processes handle them
+    job_worker = None
+    job_worker_task = None
+    if settings.JOB_WORKER_IN_PROCESS:
+        job_worker = JobWorker()
+        job_worker_task = asyncio.create_task(job_worker.run())
+
+    yield
+
+    if maintenance_task is not None:
+        maintenance_task.cancel()
+
+    # Running jobs go back to the queue before the connections close
+    if job_worker is not None:
+        job_worker.stop()
+        await job_worker_task
+
+    # Commit whatever is still queued before the process exits
+    get_write_queue().close()
+    shard_registry = get_shard_registry()
+    if shard_registry is not None:
+        await shard_registry.aclose()
+
+    await close_http_clients()
+
+    await async_engine.dispose()
+    if async_read_engine is not None:
+        await async_read_engine.dispose()
+
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     description="API for Awesome List Manager",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # Configure CORS
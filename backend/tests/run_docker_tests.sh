@@ -12,4 +12,25 @@ docker-compose exec -e API_TEST_URL=http://localhost:8000/api/v1 backend pytest
 echo "Running URL rate limiting tests..."
 docker-compose exec -e API_TEST_URL=http://localhost:8000/api/v1 backend pytest -xvs /app/tests/test_url_rate_limiting.py
 
+echo "Running query plan tests..."
+docker-compose exec backend pytest -xvs /app/tests/test_query_plans.py
+
+echo "Running site metadata parser tests..."
+docker-compose exec backend pytest -xvs /app/tests/test_site_metadata_parser.py
+
+echo "Running category index tests..."
+docker-compose exec backend pytest -xvs /app/tests/test_category_index.py
+
+echo "Running job progress tests..."
+docker-compose exec backend pytest -xvs /app/tests/test_job_progress.py
+
+echo "Running deadline tests..."
+docker-compose exec backend pytest -xvs /app/tests/test_deadline.py
+
+echo "Running request coalescing tests..."
+docker-compose exec backend pytest -xvs /app/tests/test_singleflight.py
+
+echo "Running host scheduler tests..."
+docker-compose exec backend pytest -xvs /app/tests/test_host_scheduler.py
+
 echo "Tests completed!"
@@ -15,4 +15,25 @@ API_TEST_URL=http://localhost:8000/api/v1 pytest -xvs tests/test_batch_url_chara
 echo "Running URL rate limiting tests..."
 API_TEST_URL=http://localhost:8000/api/v1 pytest -xvs tests/test_url_rate_limiting.py
 
+echo "Running query plan tests..."
+pytest -xvs tests/test_query_plans.py
+
+echo "Running site metadata parser tests..."
+pytest -xvs tests/test_site_metadata_parser.py
+
+echo "Running category index tests..."
+pytest -xvs tests/test_category_index.py
+
+echo "Running job progress tests..."
+pytest -xvs tests/test_job_progress.py
+
+echo "Running deadline tests..."
+pytest -xvs tests/test_deadline.py
+
+echo "Running request coalescing tests..."
+pytest -xvs tests/test_singleflight.py
+
+echo "Running host scheduler tests..."
+pytest -xvs tests/test_host_scheduler.py
+
 echo "Tests completed!"
@@ -0,0 +1,258 @@
+"""
+Tests for the category suggestion models.
+
+Checks that batch scoring gives exactly the per-URL results, with NumPy and
+with the pure Python fallback, that the cached index follows category changes
+made through the ORM and through bulk deletes, and that the naive Bayes model
+stays equal to a retrained one as projects are added, moved and deleted.
+
+Run this test using pytest:
+    pytest -xvs tests/test_category_index.py
+"""
+
+import random
+import unittest
+from unittest import mock
+
+from sqlalchemy import create_engine, delete
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.db.base import Base
+from app.db.write_queue import WriteQueue
+from app.models.awesome_list import AwesomeList
+from app.models.category import Category
+from app.models.project import Project
+from app.schemas.project import ProjectUpdate
+from app.services.category_service import delete_category
+from app.services.project_service import delete_project, update_project
+from app.utils import category_index
+from app.utils.category_index import LIST_ID_OPTION, CategoryIndex
+from app.utils.project_classifier import ProjectClassifier, get_project_classifier, project_classifier_cache
+from app.utils.site_metadata import suggest_category
+
+CATEGORY_NAMES = [
+    "Web Frameworks", "Databases", "Database Drivers", "Testing", "Machine Learning",
+    "Command-line Tools", "Python", "Game Development", "Data Visualization",
+    "Web Crawling", "Python Web Servers", "Audio", "Video", "Testing Tools",
+]
+
+WORDS = [
+    "python", "web", "framework", "testing", "database", "machine", "learning",
+    "game", "data", "crawler", "server", "audio", "video", "tool", "library", "fast",
+]
+
+
+def sample_urls(count: int):
+    rng = random.Random(42)
+    items = []
+    for i in range(count):
+        path = "-".join(rng.sample(WORDS, 2))
+        description = " ".join(rng.sample(WORDS, rng.randint(0, 5))) or None
+        items.append((f"https://github.com/owner{i}/{path}", description))
+    # URLs sharing nothing with any category
+    items.append(("https://example.org/zzz", "qqqq"))
+    items.append(("https://example.org/", None))
+    return items
+
+
+class TestBatchScoring(unittest.TestCase):
+    """score_batch must agree with score for every URL."""
+
+    def setUp(self):
+        self.index = CategoryIndex(enumerate(CATEGORY_NAMES, start=1))
+        self.items = sample_urls(200)
+
+    def assert_batch_matches(self):
+        expected = [self.index.score(url, description) for url, description in self.items]
+        self.assertEqual(self.index.score_batch(self.items), expected)
+
+    @unittest.skipUnless(category_index.NUMPY_AVAILABLE, "NumPy is not installed")
+    def test_numpy_batch_matches_per_url(self):
+        self.assert_batch_matches()
+
+    def test_fallback_batch_matches_per_url(self):
+        with mock.patch.object(category_index, "NUMPY_AVAILABLE", False):
+            self.assert_batch_matches()
+
+    def test_empty_index_and_batch(self):
+        self.assertEqual(CategoryIndex([]).score_batch(self.items[:3]), [(None, 0.0)] * 3)
+        self.assertEqual(self.index.score_batch([]), [])
+
+    def test_substring_matches_count_half(self):
+        index = CategoryIndex([(1, "Web Frameworks")])
+        category_id, confidence = index.score("https://example.org/", "framework")
+        self.assertEqual(category_id, 1)
+        self.assertAlmostEqual(confidence, 0.25)
+
+
+class TestIndexInvalidation(unittest.TestCase):
+    """The cached index is rebuilt after categories change."""
+
+    def setUp(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=engine)
+        self.db = sessionmaker(bind=engine)()
+        self.awesome_list = AwesomeList(title="Awesome Test", repository_url="https://github.com/test/awesome")
+        self.db.add(self.awesome_list)
+        self.db.flush()
+        self.db.add(Category(list_id=self.awesome_list.id, name="Testing"))
+        self.db.commit()
+
+    def suggest(self, description):
+        return suggest_category(self.db, self.awesome_list.id, "https://example.org/", description)[0]
+
+    def test_follows_inserts_and_deletes(self):
+        self.assertIsNone(self.suggest("flask"))
+
+        category = Category(list_id=self.awesome_list.id, name="Flask Extensions")
+        self.db.add(category)
+        self.db.commit()
+        self.assertEqual(self.suggest("flask"), category.id)
+
+        delete_category(self.db, category.id)
+        self.assertIsNone(self.suggest("flask"))
+
+    def test_bulk_delete_keeps_other_lists(self):
+        other_list = AwesomeList(title="Awesome Other", repository_url="https://github.com/test/other")
+        self.db.add(other_list)
+        self.db.flush()
+        category = Category(list_id=other_list.id, name="Flask")
+        self.db.add(category)
+        self.db.commit()
+
+        self.suggest("testing")
+        builds = category_index.category_index_cache.stats["builds"]
+        delete_category(self.db, category.id)
+        self.suggest("testing")
+        self.assertEqual(category_index.category_index_cache.stats["builds"], builds)
+
+    def test_rollback_keeps_index(self):
+        self.suggest("testing")
+        builds = category_index.category_index_cache.stats["builds"]
+        self.db.add(Category(list_id=self.awesome_list.id, name="Flask"))
+        self.db.flush()
+        self.db.rollback()
+        self.suggest("testing")
+        self.assertEqual(category_index.category_index_cache.stats["builds"], builds)
+
+
+class TestProjectClassifier(unittest.TestCase):
+    """The naive Bayes model learns from projects and follows their changes."""
+
+    def setUp(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=engine)
+        self.db = sessionmaker(bind=engine)()
+        self.awesome_list = AwesomeList(title="Awesome Test", repository_url="https://github.com/test/awesome")
+        self.db.add(self.awesome_list)
+        self.db.flush()
+        self.web = Category(list_id=self.awesome_list.id, name="Web Frameworks")
+        self.ml = Category(list_id=self.awesome_list.id, name="Machine Learning")
+        self.db.add_all([self.web, self.ml])
+        self.db.flush()
+        for i in range(10):
+            self.add_project(self.web.id, f"router{i}", "HTTP routing and middleware for servers")
+            self.add_project(self.ml.id, f"tensor{i}", "Neural network training on tensors")
+        self.db.commit()
+
+    def add_project(self, category_id, title, description):
+        project = Project(list_id=self.awesome_list.id, category_id=category_id, title=title,
+                          url=f"https://github.com/test/{title}", description=description)
+        self.db.add(project)
+        return project
+
+    def retrained(self):
+        categories = [(self.web.id, self.web.name), (self.ml.id, self.ml.name)]
+        projects = [(p.category_id, p.title, p.description) for p in self.db.query(Project).order_by(Project.id)]
+        return ProjectClassifier.build(categories, projects)
+
+    def test_predicts_with_probability(self):
+        model = get_project_classifier(self.db, self.awesome_list.id)
+        category_id, probability = model.score("https://github.com/someone/tiny", "Fast routing middleware")
+        self.assertEqual(category_id, self.web.id)
+        self.assertGreater(probability, 0.5)
+        self.assertLessEqual(probability, 1.0)
+        self.assertEqual(model.score("https://github.com/someone/x", "zzzz"), (None, 0.0))
+
+    def test_incremental_updates_match_retraining(self):
+        model = get_project_classifier(self.db, self.awesome_list.id)
+        builds = project_classifier_cache.stats["builds"]
+
+        moved = self.db.query(Project).filter(Project.title == "router0").one()
+        update_project(self.db, moved, ProjectUpdate(category_id=self.ml.id, description="GPU tensors"))
+        delete_project(self.db, self.db.query(Project).filter(Project.title == "tensor1").one().id)
+        self.add_project(self.web.id, "gateway", "API gateway routing")
+        self.db.commit()
+
+        self.assertIs(get_project_classifier(self.db, self.awesome_list.id), model)
+        self.assertEqual(project_classifier_cache.stats["builds"], builds)
+        expected = self.retrained()
+        self.assertEqual(model.token_counts, expected.token_counts)
+        self.assertEqual(model.category_tokens, expected.category_tokens)
+        self.assertEqual(model.category_documents, expected.category_documents)
+        self.assertEqual(model.projects, expected.projects)
+
+    def test_bulk_delete_rebuilds_only_its_list(self):
+        other_list = AwesomeList(title="Awesome Other", repository_url="https://github.com/test/other")
+        self.db.add(other_list)
+        self.db.flush()
+        other_category = Category(list_id=other_list.id, name="Audio")
+        self.db.add(other_category)
+        self.db.flush()
+        self.db.add(Project(list_id=other_list.id, category_id=other_category.id, title="synth",
+                            url="https://github.com/test/synth", description="Audio synthesis"))
+        self.db.commit()
+
+        model = get_project_classifier(self.db, self.awesome_list.id)
+        other_model = get_project_classifier(self.db, other_list.id)
+        self.db.execute(
+            delete(Project).where(Project.list_id == other_list.id)
+            .execution_options(**{LIST_ID_OPTION: other_list.id})
+        )
+        self.db.commit()
+
+        self.assertIs(get_project_classifier(self.db, self.awesome_list.id), model)
+        self.assertIsNot(get_project_classifier(self.db, other_list.id), other_model)
+        self.assertEqual(get_project_classifier(self.db, other_list.id).projects, 0)
+
+    def test_failed_write_queue_job_leaves_model_unchanged(self):
+        model = get_project_classifier(self.db, self.awesome_list.id)
+        projects = model.projects
+        queue = WriteQueue(sessionmaker(bind=self.db.get_bind()), max_wait_ms=200)
+
+        def failing_job(session):
+            # A savepoint released inside the job is undone with the job's own savepoint
+            with session.begin_nested():
+                session.add(Project(list_id=self.awesome_list.id, category_id=self.web.id, title="phantom",
+                                    url="https://github.com/test/phantom", description="HTTP routing"))
+            raise ValueError("import failed")
+
+        def good_job(title):
+            def job(session):
+                session.add(Project(list_id=self.awesome_list.id, category_id=self.ml.id, title=title,
+                                    url=f"https://github.com/test/{title}", description="Tensor training"))
+                session.flush()
+            return job
+
+        # One batch: the failed job must drop only its own changes
+        try:
+            futures = [queue.submit(good_job("kept1")), queue.submit(failing_job), queue.submit(good_job("kept2"))]
+            futures[0].result(5)
+            with self.assertRaises(ValueError):
+                futures[1].result(5)
+            futures[2].result(5)
+        finally:
+            queue.close()
+
+        self.assertIs(get_project_classifier(self.db, self.awesome_list.id), model)
+        self.assertEqual(model.projects, projects + 2)
+        self.db.expire_all()
+        expected = self.retrained()
+        self.assertEqual(model.token_counts, expected.token_counts)
+        self.assertEqual(model.category_documents, expected.category_documents)
+        self.assertEqual(model.projects, expected.projects)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+"""
+Tests for batch time budgets.
+
+Checks that call timeouts are capped at the time left, that calls past the
+deadline raise DeadlineExceeded, and that a batch returns the URLs that
+finished in time while marking the rest as not attempted. Requests cut off
+at the caller's deadline must not count against the host.
+
+Run this test using pytest:
+    pytest -xvs tests/test_deadline.py
+"""
+
+import asyncio
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import httpx
+
+from app.core.config import settings
+from app.services.url_characterization import characterize_urls
+from app.utils.deadline import (
+    DeadlineExceeded,
+    capped_timeout,
+    deadline_at,
+    deadline_in,
+    enforce_deadline,
+    no_deadline,
+    remaining,
+)
+from app.utils.host_scheduler import host_scheduler
+from app.utils.http_client import async_request, close_http_clients, sync_request
+
+
+async def fake_metadata(url, force_refresh=False):
+    await asyncio.sleep(5 if "slow" in url else 0.01)
+    return {"title": url, "description": None, "error": None}
+
+
+class SlowHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        time.sleep(1)
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestDeadline(unittest.TestCase):
+    def test_timeouts_are_capped(self):
+        self.assertEqual(capped_timeout(10), 10)
+        with deadline_at(deadline_in(2)):
+            self.assertLessEqual(capped_timeout(10), 2)
+            self.assertEqual(capped_timeout(1), 1)
+            timeout = capped_timeout(httpx.Timeout(10, connect=5))
+            self.assertLessEqual(timeout.read, 2)
+            self.assertLessEqual(timeout.connect, 2)
+            # A later deadline does not extend the current one
+            with deadline_at(deadline_in(60)):
+                self.assertLessEqual(remaining(), 2)
+            with no_deadline():
+                self.assertIsNone(remaining())
+        self.assertIsNone(remaining())
+
+    def test_calls_past_the_deadline_raise(self):
+        with deadline_at(time.monotonic() - 1):
+            with self.assertRaises(DeadlineExceeded):
+                capped_timeout(10)
+
+        async def wait_too_long():
+            with deadline_at(deadline_in(0.05)):
+                async with enforce_deadline():
+                    await asyncio.sleep(1)
+
+        with self.assertRaises(DeadlineExceeded):
+            asyncio.run(wait_too_long())
+
+    def test_batch_returns_partial_results(self):
+        urls = ["https://example.com/fast1", "https://example.com/slow", "https://example.com/fast2"]
+
+        async def run():
+            return [item async for item in characterize_urls(urls, budget_seconds=0.3)]
+
+        started = time.monotonic()
+        with mock.patch("app.services.url_characterization.get_cached_site_metadata", fake_metadata):
+            results = dict(asyncio.run(run()))
+        self.assertLess(time.monotonic() - started, 2)
+
+        self.assertEqual(sorted(results), [0, 1, 2])
+        self.assertEqual(results[0].status, "completed")
+        self.assertEqual(results[2].status, "completed")
+        self.assertEqual(results[1].status, "not_attempted")
+        self.assertEqual(results[1].url, urls[1])
+
+    def test_deadline_is_not_a_host_failure(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), SlowHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_port}/"
+        host = f"127.0.0.1:{server.server_port}"
+
+        async def fetch():
+            try:
+                with deadline_at(deadline_in(0.2)):
+                    await async_request("GET", url)
+            finally:
+                await close_http_clients()
+
+        try:
+            with deadline_at(deadline_in(0.2)):
+                with self.assertRaises(DeadlineExceeded):
+                    sync_request("GET", url)
+            with self.assertRaises(DeadlineExceeded):
+                asyncio.run(fetch())
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        stats = host_scheduler.stats()[host]
+        self.assertEqual(stats["errors"], 0)
+        self.assertEqual(stats["in_flight"], 0)
+        self.assertEqual(stats["concurrency_limit"], settings.HTTP_HOST_INITIAL_CONCURRENCY)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+"""
+Tests for the per-host request scheduler.
+
+Checks that callers waiting for a host's concurrency slot are woken when a
+slot is freed, from both coroutines and threads, instead of polling, that
+threads stop waiting at their deadline, and that requests sent by SDKs
+through the scheduled transport are throttled.
+
+Run this test using pytest:
+    pytest -xvs tests/test_host_scheduler.py
+"""
+
+import asyncio
+import threading
+import time
+import unittest
+from unittest import mock
+
+import httpx
+
+from app.utils.deadline import DeadlineExceeded, deadline_at, deadline_in
+from app.utils.host_scheduler import HostScheduler, HostState, host_scheduler
+from app.utils.http_client import ScheduledAsyncTransport
+
+URL = "https://example.com/page"
+
+
+class CountingState(HostState):
+    attempts = 0
+
+    def try_acquire(self, now):
+        CountingState.attempts += 1
+        return super().try_acquire(now)
+
+
+class TestHostScheduler(unittest.TestCase):
+    def setUp(self):
+        CountingState.attempts = 0
+        patches = [
+            mock.patch("app.utils.host_scheduler.HostState", CountingState),
+            mock.patch("app.utils.host_scheduler.settings.HTTP_HOST_INITIAL_CONCURRENCY", 1),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.scheduler = HostScheduler()
+
+    def test_async_waiters_wake_on_release(self):
+        order = []
+
+        async def request(name, seconds):
+            async with self.scheduler.async_slot(URL) as slot:
+                order.append(name)
+                await asyncio.sleep(seconds)
+                slot.abandon()
+
+        async def run():
+            await asyncio.gather(request("first", 0.2), request("second", 0), request("third", 0))
+
+        asyncio.run(run())
+        self.assertEqual(order, ["first", "second", "third"])
+        # One attempt per wake-up, not one every few milliseconds
+        self.assertLess(CountingState.attempts, 10)
+        self.assertEqual(self.scheduler.stats()["example.com"]["in_flight"], 0)
+
+    def test_threads_wake_on_release(self):
+        acquired = threading.Event()
+        waited = []
+
+        def hold():
+            with self.scheduler.sync_slot(URL) as slot:
+                acquired.set()
+                time.sleep(0.2)
+                slot.abandon()
+
+        def wait():
+            started = time.monotonic()
+            with self.scheduler.sync_slot(URL) as slot:
+                waited.append(time.monotonic() - started)
+                slot.abandon()
+
+        holder = threading.Thread(target=hold)
+        holder.start()
+        acquired.wait(5)
+        waiter = threading.Thread(target=wait)
+        waiter.start()
+        holder.join(5)
+        waiter.join(5)
+
+        self.assertEqual(len(waited), 1)
+        self.assertGreater(waited[0], 0.1)
+        self.assertLess(CountingState.attempts, 10)
+
+    def test_thread_wait_stops_at_deadline(self):
+        with self.scheduler.sync_slot(URL) as slot:
+            started = time.monotonic()
+            with deadline_at(deadline_in(0.1)):
+                with self.assertRaises(DeadlineExceeded):
+                    with self.scheduler.sync_slot(URL):
+                        pass
+            self.assertLess(time.monotonic() - started, 1)
+            slot.abandon()
+        self.assertEqual(self.scheduler.stats()["example.com"]["in_flight"], 0)
+
+
+class TestScheduledTransport(unittest.TestCase):
+    def test_sdk_requests_are_scheduled(self):
+        def throttle(request):
+            return httpx.Response(429, headers={"Retry-After": "5"}, json={"error": "slow down"})
+
+        async def send():
+            transport = ScheduledAsyncTransport(httpx.MockTransport(throttle))
+            async with httpx.AsyncClient(transport=transport) as client:
+                return await client.post("https://sdk.example.com/v1/chat/completions", json={})
+
+        response = asyncio.run(send())
+        self.assertEqual(response.status_code, 429)
+        stats = host_scheduler.stats()["sdk.example.com"]
+        self.assertEqual(stats["requests"], 1)
+        self.assertEqual(stats["throttled"], 1)
+        self.assertEqual(stats["in_flight"], 0)
+        self.assertGreater(stats["paused_for_seconds"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+"""
+Tests for background job progress events.
+
+Checks that a client reattaching with Last-Event-ID gets exactly the events it
+missed, that it is sent a snapshot when those events are no longer buffered,
+and that events emitted from a worker thread reach a waiting stream.
+
+Run this test using pytest:
+    pytest -xvs tests/test_job_progress.py
+"""
+
+import asyncio
+import json
+import threading
+import unittest
+from unittest import mock
+
+from app.services.job_progress import (
+    CATEGORIZED,
+    FAILED,
+    FETCHED,
+    SNAPSHOT_EVENT,
+    create_job,
+    job_event_stream,
+)
+
+
+def parse_messages(messages):
+    """Turn SSE messages into (id, event, data) tuples, skipping comments."""
+    parsed = []
+    for message in messages:
+        if message.startswith(":"):
+            continue
+        fields = dict(line.split(": ", 1) for line in message.strip().split("\n"))
+        parsed.append((
+            int(fields["id"]) if "id" in fields else None,
+            fields["event"],
+            json.loads(fields["data"]),
+        ))
+    return parsed
+
+
+async def collect(job, last_event_id=0):
+    return parse_messages([message async for message in job_event_stream(job, last_event_id)])
+
+
+class TestJobProgress(unittest.TestCase):
+    def run_job(self, job, items=4):
+        job.start()
+        for index in range(items):
+            job.emit(FETCHED, url=f"https://example.com/{index}")
+            if index == items - 1:
+                job.emit(FAILED, url=f"https://example.com/{index}", error="boom")
+            else:
+                job.emit(CATEGORIZED, url=f"https://example.com/{index}")
+        job.succeed(["done"])
+
+    def test_counts_and_completion(self):
+        job = create_job("test", CATEGORIZED, total=4)
+        self.run_job(job)
+        snapshot = job.snapshot()
+        self.assertEqual(snapshot["status"], "succeeded")
+        self.assertEqual(snapshot["completed"], 4)
+        self.assertEqual(snapshot["counts"][FETCHED], 4)
+        self.assertEqual(snapshot["counts"][FAILED], 1)
+        self.assertEqual(snapshot["result"], ["done"])
+
+    def test_resume_after_last_event_id(self):
+        job = create_job("test", CATEGORIZED, total=4)
+        self.run_job(job)
+        events = asyncio.run(collect(job))
+        resumed = asyncio.run(collect(job, last_event_id=5))
+        self.assertEqual(resumed, events[5:])
+        self.assertEqual(events[-1][1], "status")
+        self.assertEqual(events[-1][2]["status"], "succeeded")
+
+    def test_snapshot_when_events_were_dropped(self):
+        with mock.patch("app.services.job_progress.settings.JOB_EVENT_HISTORY", 3):
+            job = create_job("test", CATEGORIZED, total=4)
+        self.run_job(job)
+        events = asyncio.run(collect(job, last_event_id=2))
+        self.assertEqual(events[0][1], SNAPSHOT_EVENT)
+        self.assertEqual(events[0][2]["completed"], 4)
+        self.assertEqual(len(events), 4)
+
+    def test_live_events_from_a_worker_thread(self):
+        job = create_job("test", CATEGORIZED, total=4)
+        job.start()
+
+        async def follow():
+            stream = asyncio.create_task(collect(job))
+            # Let the stream drain the buffer and start waiting
+            await asyncio.sleep(0.05)
+            worker = threading.Thread(target=self.run_job, args=(job,))
+            worker.start()
+            events = await asyncio.wait_for(stream, 5)
+            worker.join()
+            return events
+
+        events = asyncio.run(follow())
+        self.assertEqual(events[-1][2]["status"], "succeeded")
+        self.assertEqual(events[-1][2]["completed"], 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+"""
+Query plan checks for the hot service queries.
+
+Runs the service functions against an in-memory SQLite database, records every
+SELECT they issue and fails if EXPLAIN QUERY PLAN reports a full table scan.
+This guards the composite indexes on category and project.
+
+Run this test using pytest:
+    pytest -xvs tests/test_query_plans.py
+"""
+
+import re
+import unittest
+from datetime import datetime, timezone
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.db.base import Base
+from app.models.awesome_list import AwesomeList
+from app.models.category import Category
+from app.models.project import Project
+from app.services.awesome_list_service import get_awesome_list
+from app.services.job_queue import next_job_query
+from app.services.category_service import get_categories, get_categories_with_subcategories
+from app.services.markdown_generator import generate_readme
+from app.services.project_service import get_projects
+from app.utils.site_metadata import suggest_category
+
+# "SCAN project" / "SCAN TABLE project" without an index is a full scan
+FULL_SCAN = re.compile(r"^SCAN (TABLE )?\w+$")
+
+
+class TestQueryPlans(unittest.TestCase):
+    """Every service query must be answered through an index."""
+
+    def setUp(self):
+        self.engine = create_engine(
+            "sqlite://",
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool,
+        )
+        Base.metadata.create_all(bind=self.engine)
+        self.db = sessionmaker(bind=self.engine)()
+
+        self.awesome_list = AwesomeList(title="Awesome Test", repository_url="https://github.com/test/awesome")
+        self.db.add(self.awesome_list)
+        self.db.flush()
+        parent = Category(list_id=self.awesome_list.id, name="Web Frameworks")
+        self.db.add(parent)
+        self.db.flush()
+        child = Category(list_id=self.awesome_list.id, name="Python", parent_category_id=parent.id)
+        self.db.add(child)
+        self.db.flush()
+        self.db.add(Project(list_id=self.awesome_list.id, category_id=child.id,
+                            title="Django", url="https://github.com/django/django"))
+        self.db.commit()
+        self.parent_id = parent.id
+        self.child_id = child.id
+
+        self.statements = []
+        event.listen(self.engine, "before_cursor_execute", self._record)
+
+    def tearDown(self):
+        event.remove(self.engine, "before_cursor_execute", self._record)
+        self.db.close()
+        self.engine.dispose()
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            self.statements.append((statement, parameters))
+
+    def assert_no_full_scans(self):
+        self.assertTrue(self.statements, "No queries were recorded")
+        event.remove(self.engine, "before_cursor_execute", self._record)
+        try:
+            with self.engine.connect() as conn:
+                for statement, parameters in self.statements:
+                    plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+                    scans = [row[-1] for row in plan if FULL_SCAN.match(row[-1])]
+                    self.assertFalse(scans, f"Full scan {scans} in query:\n{statement}")
+        finally:
+            event.listen(self.engine, "before_cursor_execute", self._record)
+
+    def test_get_projects(self):
+        list_id = self.awesome_list.id
+        get_projects(self.db, list_id=list_id)
+        get_projects(self.db, list_id=list_id, category_id=self.child_id)
+        get_projects(self.db, category_id=self.child_id)
+        self.assert_no_full_scans()
+
+    def test_get_categories(self):
+        get_categories(self.db, list_id=self.awesome_list.id)
+        get_categories(self.db, list_id=self.awesome_list.id, parent_id=self.parent_id)
+        get_categories_with_subcategories(self.db, list_id=self.awesome_list.id)
+        self.assert_no_full_scans()
+
+    def test_get_awesome_list_counts(self):
+        get_awesome_list(self.db, self.awesome_list.id)
+        self.assert_no_full_scans()
+
+    def test_generate_readme(self):
+        generate_readme(self.db, self.awesome_list)
+        self.assert_no_full_scans()
+
+    def test_suggest_category(self):
+        suggest_category(self.db, self.awesome_list.id, "https://github.com/pallets/flask", "Python web framework")
+        self.assert_no_full_scans()
+
+    def test_claim_next_job(self):
+        self.db.execute(next_job_query(datetime.now(timezone.utc))).scalar_one_or_none()
+        self.assert_no_full_scans()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+"""
+Tests for in-flight request coalescing.
+
+Checks that concurrent calls with one key share a single execution, that a
+caller giving up does not cancel the run for the others, and that callers
+with time left run the work again when it was cut short by a shorter deadline.
+
+Run this test using pytest:
+    pytest -xvs tests/test_singleflight.py
+"""
+
+import asyncio
+import unittest
+
+from app.utils.deadline import DeadlineExceeded, deadline_at, deadline_in, enforce_deadline
+from app.utils.singleflight import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    def setUp(self):
+        self.flight = SingleFlight("test")
+        self.executions = 0
+
+    async def work(self, result="done", seconds=0.1):
+        self.executions += 1
+        await asyncio.sleep(seconds)
+        return result
+
+    def test_concurrent_calls_share_one_execution(self):
+        async def run():
+            same = [self.flight.do("a", self.work) for _ in range(5)]
+            other = self.flight.do("b", lambda: self.work("other"))
+            return await asyncio.gather(*same, other)
+
+        results = asyncio.run(run())
+        self.assertEqual(results, ["done"] * 5 + ["other"])
+        self.assertEqual(self.executions, 2)
+        stats = self.flight.stats()
+        self.assertEqual((stats["calls"], stats["executions"], stats["coalesced"]), (6, 2, 4))
+        self.assertEqual(stats["in_flight"], 0)
+
+        # Once finished, the key runs again
+        asyncio.run(self.flight.do("a", self.work))
+        self.assertEqual(self.executions, 3)
+
+    def test_cancelled_caller_does_not_cancel_the_run(self):
+        async def run():
+            first = asyncio.create_task(self.flight.do("a", self.work))
+            await asyncio.sleep(0)
+            second = asyncio.create_task(self.flight.do("a", self.work))
+            await asyncio.sleep(0.02)
+            first.cancel()
+            return await second
+
+        self.assertEqual(asyncio.run(run()), "done")
+        self.assertEqual(self.executions, 1)
+
+    async def call_with_budget(self, seconds):
+        async def work():
+            # Stands in for outbound calls, which inherit the starting caller's deadline
+            async with enforce_deadline():
+                return await self.work(seconds=0.2)
+
+        with deadline_at(deadline_in(seconds)):
+            return await self.flight.do("a", work)
+
+    def test_run_cut_short_by_a_shorter_deadline(self):
+        async def run():
+            hurried = asyncio.create_task(self.call_with_budget(0.05))
+            await asyncio.sleep(0)
+            patient = asyncio.create_task(self.call_with_budget(None))
+            return await asyncio.gather(hurried, patient, return_exceptions=True)
+
+        hurried, patient = asyncio.run(run())
+        self.assertIsInstance(hurried, DeadlineExceeded)
+        self.assertEqual(patient, "done")
+        self.assertEqual(self.executions, 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+"""
+Tests for the streaming head metadata scanner.
+
+Covers metadata extraction from the head, the first-paragraph fallback, and
+that fetch_site_metadata stops reading a large page once it has what it needs.
+A local HTTP server stands in for the remote site.
+
+Run this test using pytest:
+    pytest -xvs tests/test_site_metadata_parser.py
+"""
+
+import asyncio
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.utils.http_client import close_http_clients
+from app.utils.site_metadata import HeadMetadataParser, fetch_site_metadata, parse_head_metadata
+
+HEAD = (
+    "<!DOCTYPE html><html><head>"
+    "<title> Awesome &amp; Fast </title>"
+    '<meta name="keywords" content="python, web ,api">'
+    '<meta property="og:description" content="From Open Graph">'
+    '<meta name="description" content="A fast web framework">'
+    "</head>"
+)
+
+LONG_PARAGRAPH = "This project is a library for building fast asynchronous web services in Python."
+
+
+class TestHeadMetadataParser(unittest.TestCase):
+    """The scanner reads the same fields the BeautifulSoup version did."""
+
+    def test_reads_head_metadata(self):
+        metadata = parse_head_metadata(HEAD + "<body><p>" + LONG_PARAGRAPH + "</p></body></html>")
+        self.assertEqual(metadata["title"], "Awesome & Fast")
+        self.assertEqual(metadata["description"], "A fast web framework")
+        self.assertEqual(metadata["keywords"], ["python", "web", "api"])
+
+    def test_falls_back_to_open_graph_description(self):
+        metadata = parse_head_metadata('<head><meta property="og:description" content="OG only"></head>')
+        self.assertEqual(metadata["description"], "OG only")
+
+    def test_falls_back_to_first_long_paragraph(self):
+        html = "<head><title>T</title></head><body><p>Short</p><p>" + LONG_PARAGRAPH + " <b>Bold</b></p></body>"
+        metadata = parse_head_metadata(html)
+        self.assertEqual(metadata["description"], LONG_PARAGRAPH + " Bold")
+
+    def test_truncates_long_paragraph(self):
+        metadata = parse_head_metadata("<body><p>" + "x" * 400 + "</p></body>")
+        self.assertEqual(metadata["description"], "x" * 300 + "...")
+
+    def test_head_ends_without_explicit_tags(self):
+        parser = HeadMetadataParser()
+        parser.feed('<title>T</title><meta name="description" content="D"><div>')
+        self.assertTrue(parser.head_done)
+        self.assertTrue(parser.done)
+
+    def test_ignores_titles_outside_head(self):
+        metadata = parse_head_metadata("<head></head><body><svg><title>Icon</title></svg></body>")
+        self.assertIsNone(metadata["title"])
+
+    def test_handles_tags_split_across_chunks(self):
+        parser = HeadMetadataParser()
+        html = HEAD + "<body>"
+        for i in range(0, len(html), 7):
+            parser.feed(html[i:i + 7])
+        self.assertEqual(parser.title, "Awesome & Fast")
+        self.assertEqual(parser.best_description, "A fast web framework")
+        self.assertTrue(parser.done)
+
+
+class LargePageHandler(BaseHTTPRequestHandler):
+    """Serves a small head followed by a body far larger than the socket buffers."""
+
+    body_size = 32 * 1024 * 1024
+    bytes_sent = 0
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(HEAD) + 6 + self.body_size))
+        self.end_headers()
+        try:
+            self.wfile.write((HEAD + "<body>").encode())
+            chunk = b"<div>" + b"x" * 8186 + b"</div>"
+            for _ in range(self.body_size // len(chunk)):
+                self.wfile.write(chunk)
+                LargePageHandler.bytes_sent += len(chunk)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+class TestStreamingFetch(unittest.TestCase):
+    """fetch_site_metadata stops reading once the head is complete."""
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), LargePageHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_stops_after_head(self):
+        async def fetch():
+            try:
+                return await fetch_site_metadata(self.url)
+            finally:
+                await close_http_clients()
+
+        metadata = asyncio.run(fetch())
+        self.assertIsNone(metadata["error"])
+        self.assertEqual(metadata["title"], "Awesome & Fast")
+        self.assertEqual(metadata["description"], "A fast web framework")
+        # The server is cut off long before the whole body is sent
+        self.assertLess(LargePageHandler.bytes_sent, LargePageHandler.body_size // 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
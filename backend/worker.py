@@ -0,0 +1,56 @@
+"""
+Background job worker.
+
+Claims jobs queued by the API (imports, batch categorizations, link checks)
+from the database and runs them. Start as many as needed, on any host that
+can reach the database:
+
+    python worker.py [--concurrency N]
+
+When workers run separately, set JOB_WORKER_IN_PROCESS=false for the API.
+"""
+import argparse
+import asyncio
+import logging
+import signal
+
+from app.core.config import settings
+from app.db.session import async_engine, async_read_engine, get_shard_registry, get_write_queue
+from app.services import job_handlers  # noqa: F401 - registers the job kinds
+from app.services.job_queue import JobWorker
+from app.utils.http_client import close_http_clients, open_http_clients
+
+
+async def run(concurrency: int) -> None:
+    await open_http_clients()
+    worker = JobWorker(concurrency=concurrency)
+
+    # Finish cleanly on Ctrl-C or SIGTERM: running jobs go back to the queue
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, worker.stop)
+
+    try:
+        await worker.run()
+    finally:
+        get_write_queue().close()
+        shard_registry = get_shard_registry()
+        if shard_registry is not None:
+            await shard_registry.aclose()
+
+        await close_http_clients()
+
+        await async_engine.dispose()
+        if async_read_engine is not None:
+            await async_read_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run background jobs queued by the API")
+    parser.add_argument(
+        "--concurrency", type=int, default=settings.JOB_WORKER_CONCURRENCY,
+        help="Jobs run at once (default JOB_WORKER_CONCURRENCY)",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(run(args.concurrency))
@@ -9,6 +9,7 @@ import re
 import sys
 import logging
 from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
 
 try:
     import jsonschema
@@ -17,6 +18,14 @@ except ImportError:
     print("jsonschema module not found. Please install it via pip install jsonschema")
     sys.exit(1)
 
+# -------------------------------------------------------------------
+# One keep-alive session for every request this script makes, so repeated
+# GitHub and Ollama calls reuse connections. This script runs standalone,
+# outside the backend package, so it cannot use app.utils.http_client.
+HTTP_SESSION = requests.Session()
+HTTP_SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=10))
+HTTP_SESSION.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=10))
+
 # -------------------------------------------------------------------
 # Hard-coded finite artifact (your categories, header, title, etc.)
 HARDCODED_DATA = {
@@ -285,7 +294,7 @@ def fetch_readme(repo_url):
     owner, repo = path_parts[0], path_parts[1]
     api_url = f"https://api.github.com/repos/{owner}/{repo}/readme"
     headers = {"Accept": "application/vnd.github.v3+json"}
-    response = requests.get(api_url, headers=headers)
+    response = HTTP_SESSION.get(api_url, headers=headers)
     logging.debug(f"GitHub API URL: {api_url} | Status code: {response.status_code}")
     if response.status_code == 200:
         data = response.json()
@@ -318,7 +327,7 @@ def call_ollama_completion(prompt, model, ollama_url, temperature=0.5, max_token
         "max_tokens": max_tokens
     }
     try:
-        response = requests.post(url, json=payload)
+        response = HTTP_SESSION.post(url, json=payload)
         if response.status_code == 200:
             result = response.json()
             return result.get("completion", "")